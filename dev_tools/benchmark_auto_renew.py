@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+
+"""Compare the threads used to auto-renew many subscriptions, made at the
+same time, by the RenewalScheduler with those used by the thread per
+subscription which Subscription used to start, which is reproduced here.
+Also reports the spread of the times of the first renewals, which all
+happened at once with a thread per subscription"""
+
+import argparse
+import threading
+import time
+import tracemalloc
+from unittest import mock
+
+from soco import config
+from soco.events import RenewalScheduler
+
+
+class AutoRenewThread(threading.Thread):
+    """The thread which used to renew each subscription"""
+
+    def __init__(self, interval, stop_flag, sub):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.subscription = sub
+        self.stop_flag = stop_flag
+
+    def run(self):
+        while not self.stop_flag.wait(self.interval):
+            self.subscription.renew(is_autorenew=True, strict=False)
+
+
+def subscriptions(number):
+    """Return mock subscriptions, which record when they are renewed"""
+    result = []
+    for _ in range(number):
+        renewals = []
+        result.append(
+            mock.Mock(
+                renew=lambda renewals=renewals, **_: renewals.append(time.monotonic())
+            )
+        )
+        result[-1].renewals = renewals
+    return result
+
+
+def first_renewals(subs, interval):
+    """Wait for every subscription to be renewed, and return the spread of
+    the times of their first renewals"""
+    while not all(sub.renewals for sub in subs):
+        time.sleep(interval / 20)
+    times = [sub.renewals[0] for sub in subs]
+    return max(times) - min(times)
+
+
+def report(name, threads, memory, spread):
+    """Print the results for one way of renewing"""
+    print(
+        "{:<26}{:>5} threads, {:>6.0f} KiB, first renewals over {:.2f} s".format(
+            name, threads, memory / 1024, spread
+        )
+    )
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Benchmark the auto-renewal of subscriptions"
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=300, help="The number of subscriptions"
+    )
+    parser.add_argument(
+        "-i", "--interval", type=float, default=2.0, help="The renewal interval"
+    )
+    args = parser.parse_args()
+
+    baseline = threading.active_count()
+    subs = subscriptions(args.number)
+    stop_flag = threading.Event()
+    tracemalloc.start()
+    for sub in subs:
+        AutoRenewThread(args.interval, stop_flag, sub).start()
+    threads = threading.active_count() - baseline
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    spread = first_renewals(subs, args.interval)
+    stop_flag.set()
+    report("Thread per subscription:", threads, memory, spread)
+
+    while threading.active_count() > baseline:
+        time.sleep(0.01)
+    subs = subscriptions(args.number)
+    scheduler = RenewalScheduler()
+    tracemalloc.start()
+    for sub in subs:
+        scheduler.schedule(sub, args.interval)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    spread = first_renewals(subs, args.interval)
+    threads = threading.active_count() - baseline
+    for sub in subs:
+        scheduler.cancel(sub)
+    report("RenewalScheduler:", threads, memory, spread)
+    print(
+        "(The scheduler used {} pool threads and a jitter of {})".format(
+            config.AUTO_RENEW_WORKERS, config.AUTO_RENEW_JITTER
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
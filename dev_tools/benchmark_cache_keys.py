@@ -0,0 +1,67 @@
+#! /usr/bin/env python
+
+"""Compare the cost of deriving cache keys on the fast path, which builds a
+tuple for typical send_command arguments, with pickling the arguments, as
+was done before, both for make_key alone and for a send_command cache hit"""
+
+import argparse
+from pickle import dumps
+from timeit import repeat
+from unittest import mock
+
+from soco.cache import TimedCache
+from soco.services import RenderingControl
+
+ARGS = [("InstanceID", 0), ("Channel", "Master")]
+
+
+def pickle_key(*args, **kwargs):
+    """The key derivation used before the fast path was added"""
+    return dumps((args, kwargs))
+
+
+def best(function, number):
+    """Return the best time in µs of a call to function"""
+    return min(repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def time_cache_hit(service, number):
+    """Return the best time in µs of a send_command cache hit"""
+    service.cache.put({"CurrentVolume": "25"}, "GetVolume", ARGS, timeout=600)
+    return best(lambda: service.send_command("GetVolume", ARGS), number)
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Benchmark SoCo cache key derivation"
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=20000, help="The number of calls to time"
+    )
+    args = parser.parse_args()
+
+    call = (("GetVolume", ARGS), {})
+    fast = best(lambda: TimedCache.make_key(*call), args.number)
+    pickled = best(lambda: pickle_key(*call), args.number)
+    print(
+        "make_key:                fast {:.3f} µs, pickled {:.3f} µs".format(
+            fast, pickled
+        )
+    )
+
+    soco = mock.MagicMock()
+    soco.ip_address = "192.168.1.101"
+    service = RenderingControl(soco)
+    fast = time_cache_hit(service, args.number)
+    with mock.patch.object(TimedCache, "make_key", staticmethod(pickle_key)):
+        pickled = time_cache_hit(service, args.number)
+    print(
+        "send_command cache hit:  fast {:.3f} µs, pickled {:.3f} µs".format(
+            fast, pickled
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#! /usr/bin/env python
+
+"""Compare the cost of parsing recorded event bodies with parse_event_xml
+against the ElementTree implementation which it replaced, which is
+reproduced here. parse_event_xml is timed both alone, which leaves any
+DIDL-Lite metadata unparsed, and with every variable read. The lru_cache
+of parse_event_xml is bypassed, since repeated bodies are not what is being
+measured"""
+
+import argparse
+import glob
+import os
+import timeit
+import xml.etree.ElementTree as XML
+
+from soco.data_structures_entry import from_didl_string
+from soco.events_base import parse_event_xml
+from soco.exceptions import SoCoException, SoCoFault
+from soco.utils import camel_to_underscore
+
+EVENTS_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "events")
+
+
+def reference_parse_event_xml(xml_event):
+    """Parse the body of an event as parse_event_xml used to"""
+    # pylint: disable=too-many-nested-blocks
+    result = {}
+    tree = XML.fromstring(xml_event)
+    properties = tree.findall("{urn:schemas-upnp-org:event-1-0}property")
+    for prop in properties:
+        for variable in prop:
+            if variable.tag == "LastChange":
+                last_change_tree = XML.fromstring(variable.text.encode("utf-8"))
+                instance = last_change_tree.find(
+                    "{urn:schemas-upnp-org:metadata-1-0/AVT/}InstanceID"
+                )
+                if instance is None:
+                    instance = last_change_tree.find(
+                        "{urn:schemas-upnp-org:metadata-1-0/RCS/}InstanceID"
+                    )
+                if instance is None:
+                    instance = last_change_tree.find(
+                        "{urn:schemas-sonos-com:metadata-1-0/Queue/}QueueID"
+                    )
+                for last_change_var in instance:
+                    tag = last_change_var.tag
+                    if tag.startswith("{"):
+                        tag = tag.split("}", 1)[1]
+                    tag = camel_to_underscore(tag)
+                    value = last_change_var.get("val")
+                    if value is None:
+                        value = last_change_var.text
+                    if value is not None and value.startswith("<DIDL-Lite"):
+                        try:
+                            value = from_didl_string(value)[0]
+                        except SoCoException as original_exception:
+                            value = SoCoFault(original_exception)
+                    channel = last_change_var.get("channel")
+                    if channel is not None:
+                        if result.get(tag) is None:
+                            result[tag] = {}
+                        result[tag][channel] = value
+                    else:
+                        result[tag] = value
+            else:
+                result[camel_to_underscore(variable.tag)] = variable.text
+    return result
+
+
+def parse_and_read(xml_event):
+    """Parse the body of an event, and read all its variables"""
+    return dict(parse_event_xml.__wrapped__(xml_event))
+
+
+def time_call(function, body, number):
+    """Return the mean time in µs of a call. The cache of from_didl_string is
+    cleared before each call, as if the metadata was for a new track"""
+
+    def call():
+        from_didl_string.cache_clear()
+        function(body)
+
+    return timeit.timeit(call, number=number) / number * 1e6
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Benchmark the parsing of event bodies"
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=2000, help="The number of calls to time"
+    )
+    args = parser.parse_args()
+
+    print(
+        "{:<28}{:>12}{:>12}{:>12}".format(
+            "Event body", "Reference", "lxml", "lxml+read"
+        )
+    )
+    totals = [0, 0, 0]
+    for path in sorted(glob.glob(os.path.join(EVENTS_PATH, "*.xml"))):
+        with open(path, "rb") as file_:
+            body = file_.read()
+        times = [
+            time_call(function, body, args.number)
+            for function in (
+                reference_parse_event_xml,
+                parse_event_xml.__wrapped__,
+                parse_and_read,
+            )
+        ]
+        totals = [total + time for total, time in zip(totals, times)]
+        print(
+            "{:<28}{:>9.1f} µs{:>9.1f} µs{:>9.1f} µs".format(
+                os.path.basename(path), *times
+            )
+        )
+    print("{:<28}{:>9.1f} µs{:>9.1f} µs{:>9.1f} µs".format("Total", *totals))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#! /usr/bin/env python
+
+"""Compare the throughput of the event server which handles each connection
+on a new thread with that of the pooled event server, for a burst of
+NOTIFY requests from several simulated speakers, each sending its events in
+order, either on a new connection per event, as Sonos devices usually do,
+or over one kept-alive connection"""
+
+import argparse
+import http.client
+import threading
+import time
+from unittest import mock
+
+from soco import events
+
+BODY = (
+    '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">'
+    "<e:property><LastChange>&lt;Event "
+    'xmlns="urn:schemas-upnp-org:metadata-1-0/RCS/"&gt;&lt;InstanceID '
+    'val="0"&gt;&lt;Volume channel="Master" val="{}"/&gt;&lt;/InstanceID&gt;'
+    "&lt;/Event&gt;</LastChange></e:property></e:propertyset>"
+)
+
+
+def speaker(address, sid, number, keep_alive, failures):
+    """Send events, waiting for each response as a Sonos device does, and
+    appending any which failed to failures"""
+    connection = None
+    for seq in range(number):
+        if connection is None:
+            connection = http.client.HTTPConnection(*address, timeout=10)
+        try:
+            connection.request(
+                "NOTIFY",
+                "/",
+                body=BODY.format(seq % 100).encode(),
+                headers={"SID": sid, "SEQ": str(seq)},
+            )
+            connection.getresponse().read()
+        except OSError:
+            failures.append(seq)
+            connection.close()
+            connection = None
+            continue
+        if not keep_alive:
+            connection.close()
+            connection = None
+    if connection is not None:
+        connection.close()
+
+
+def run(server, speakers, number, keep_alive):
+    """Return the events handled per second, and the number which failed"""
+    failures = []
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+    clients = [
+        threading.Thread(
+            target=speaker,
+            args=(server.server_address, f"uuid:{n}", number, keep_alive, failures),
+        )
+        for n in range(speakers)
+    ]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    return (speakers * number - len(failures)) / elapsed, len(failures)
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(prog="", description="Benchmark the event servers")
+    parser.add_argument(
+        "-s", "--speakers", type=int, default=40, help="The number of speakers"
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=50, help="The events per speaker"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=8, help="The pooled server's workers"
+    )
+    args = parser.parse_args()
+
+    subscription = mock.Mock()
+    subscription.service.service_id = "RenderingControl"
+    with mock.patch.object(
+        events.subscriptions_map, "get_subscription", return_value=subscription
+    ):
+        for keep_alive in (False, True):
+            threaded = run(
+                events.EventServer(("127.0.0.1", 0), events.EventNotifyHandler),
+                args.speakers,
+                args.number,
+                keep_alive,
+            )
+            pooled = run(
+                events.PooledEventServer(
+                    ("127.0.0.1", 0),
+                    events.PooledEventNotifyHandler,
+                    workers=args.workers,
+                    backlog=args.speakers,
+                ),
+                args.speakers,
+                args.number,
+                keep_alive,
+            )
+            print(
+                "{:<24}thread per connection {:>6.0f}/s ({} failed), "
+                "pooled {:>6.0f}/s ({} failed)".format(
+                    "Kept-alive connections:" if keep_alive else "New connections:",
+                    *threaded,
+                    *pooled,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
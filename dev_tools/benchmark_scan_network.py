@@ -0,0 +1,194 @@
+#! /usr/bin/env python
+
+"""Compare the threaded soco.discovery.scan_network with the asyncio
+soco.discovery_asyncio.scan_network, using stub Sonos devices listening on a
+range of loopback addresses"""
+
+import argparse
+import asyncio
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Import aiohttp up front, as requests is, so that it is not timed
+import aiohttp  # pylint: disable=unused-import  # noqa: F401
+
+from soco import discovery, discovery_asyncio
+
+DESCRIPTION = (
+    '<?xml version="1.0" encoding="utf-8" ?>'
+    '<root xmlns="urn:schemas-upnp-org:device-1-0"><device>'
+    "<deviceType>urn:schemas-upnp-org:device:ZonePlayer:1</deviceType>"
+    "<manufacturer>Sonos, Inc.</manufacturer>"
+    "</device></root>"
+).encode("utf-8")
+
+# Describes the actions of both DeviceProperties and ZoneGroupTopology, which
+# the threaded scan looks up before calling them
+SCPD = (
+    '<?xml version="1.0" encoding="utf-8" ?>'
+    '<scpd xmlns="urn:schemas-upnp-org:service-1-0"><actionList>'
+    "<action><name>GetHouseholdID</name><argumentList/></action>"
+    "<action><name>GetZoneGroupState</name><argumentList/></action>"
+    "</actionList></scpd>"
+).encode("utf-8")
+
+SOAP_RESPONSE = (
+    '<?xml version="1.0"?>'
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"'
+    ' s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+    '<s:Body><u:{action}Response xmlns:u="urn:schemas-upnp-org:service:'
+    '{service}:1">{body}</u:{action}Response></s:Body></s:Envelope>'
+)
+
+MEMBER = (
+    '&lt;ZoneGroupMember UUID="RINCON_{n}" ZoneName="Zone {n}"'
+    ' Location="http://{ip}:1400/xml/device_description.xml"/&gt;'
+)
+
+
+class StubSonosHandler(BaseHTTPRequestHandler):
+    """Answer the requests which scanning makes"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    zone_group_state = ""
+
+    def send_body(self, body):
+        """Send a 200 response"""
+        self.send_response(200)
+        self.send_header("Content-Type", 'text/xml; charset="utf-8"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve the device description, or a service description"""
+        if self.path.endswith("device_description.xml"):
+            self.send_body(DESCRIPTION)
+        else:
+            self.send_body(SCPD)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Serve a SOAP request"""
+        self.rfile.read(int(self.headers["Content-Length"]))
+        action = self.headers["SOAPACTION"].strip('"').split("#")[1]
+        if action == "GetHouseholdID":
+            service = "DeviceProperties"
+            body = "<CurrentHouseholdID>Sonos_Benchmark</CurrentHouseholdID>"
+        else:
+            service = "ZoneGroupTopology"
+            body = f"<ZoneGroupState>{self.zone_group_state}</ZoneGroupState>"
+        self.send_body(
+            SOAP_RESPONSE.format(action=action, service=service, body=body).encode(
+                "utf-8"
+            )
+        )
+
+    def log_message(self, fmt, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def start_stub_devices(ip_addresses):
+    """Start a stub device on port 1400 of each address"""
+    members = "".join(
+        MEMBER.format(n=n, ip=ip_address) for n, ip_address in enumerate(ip_addresses)
+    )
+    StubSonosHandler.zone_group_state = (
+        "&lt;ZoneGroupState&gt;&lt;ZoneGroups&gt;"
+        '&lt;ZoneGroup Coordinator="RINCON_0" ID="RINCON_0:1"&gt;'
+        f"{members}&lt;/ZoneGroup&gt;&lt;/ZoneGroups&gt;&lt;/ZoneGroupState&gt;"
+    )
+    servers = []
+    for ip_address in ip_addresses:
+        server = ThreadingHTTPServer((ip_address, 1400), StubSonosHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def start_silent_hosts(ip_addresses):
+    """Make connections to port 1400 of each address time out, as they would
+    to an address with no host, by filling the accept queue of a listening
+    socket which never accepts"""
+    sockets = []
+    for ip_address in ip_addresses:
+        listener = socket.socket()
+        listener.bind((ip_address, 1400))
+        listener.listen(0)
+        sockets.append(listener)
+        for _ in range(2):
+            filler = socket.socket()
+            filler.setblocking(False)
+            filler.connect_ex((ip_address, 1400))
+            sockets.append(filler)
+    return sockets
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Benchmark threaded and asyncio network scans"
+    )
+    parser.add_argument(
+        "-d", "--devices", type=int, default=8, help="The number of stub devices"
+    )
+    parser.add_argument(
+        "-n",
+        "--network",
+        default="127.0.0.0/22",
+        help="The (loopback) network to scan",
+    )
+    parser.add_argument(
+        "-s",
+        "--silent",
+        type=int,
+        default=512,
+        help="The number of addresses at which connections time out",
+    )
+    parser.add_argument(
+        "-c",
+        "--max-concurrency",
+        type=int,
+        default=1024,
+        help="The concurrency of the second asyncio scan",
+    )
+    args = parser.parse_args()
+
+    ip_addresses = [f"127.0.1.{n}" for n in range(10, 10 + args.devices)]
+    servers = start_stub_devices(ip_addresses)
+    silent = start_silent_hosts(
+        [f"127.0.{4 + n // 256}.{n % 256}" for n in range(args.silent)]
+    )
+    kwargs = {"networks_to_scan": [args.network], "multi_household": True}
+
+    start = time.perf_counter()
+    threaded = discovery.scan_network(**kwargs)
+    threaded_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    asynchronous = asyncio.run(discovery_asyncio.scan_network(**kwargs))
+    async_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    wide = asyncio.run(
+        discovery_asyncio.scan_network(max_concurrency=args.max_concurrency, **kwargs)
+    )
+    wide_time = time.perf_counter() - start
+
+    print("Network:               {}".format(args.network))
+    print("Stub devices:          {}".format(args.devices))
+    print("Silent addresses:      {}".format(args.silent))
+    print("Threaded scan (256):   {:.3f} s".format(threaded_time))
+    print("Asyncio scan (256):    {:.3f} s".format(async_time))
+    print("Asyncio scan ({}):   {:.3f} s".format(args.max_concurrency, wide_time))
+    print("Same results:          {}".format(threaded == asynchronous == wide))
+    for server in servers:
+        server.shutdown()
+    for sock in silent:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+
+"""Compare the per-call overhead of a dynamically dispatched action with that
+of a generated service stub, with the network request replaced by a stub
+which returns at once"""
+
+import argparse
+import timeit
+import types
+from unittest import mock
+
+from soco import SoCo
+from soco.service_stubs import generate_module
+from soco.services import Action, Argument, RenderingControl, Service, Vartype
+
+UI4 = Vartype("ui4", None, None, None)
+CHANNEL = Vartype("string", None, ["Master", "LF", "RF"], None)
+
+GET_VOLUME = Action(
+    "GetVolume",
+    [Argument("InstanceID", UI4), Argument("Channel", CHANNEL)],
+    [Argument("CurrentVolume", UI4)],
+)
+
+# A typical number of actions for a Sonos service, so that compose_args has a
+# realistic list to search
+ACTIONS = [Action(f"Action{n}", [], []) for n in range(40)] + [GET_VOLUME]
+
+
+# pylint: disable=unused-argument
+def post_command(self, action, args, cache, cache_timeout, timeout, prepared=None):
+    """Build the request as usual, but don't send it"""
+    if prepared is None:
+        self.build_command(action, args)
+    else:
+        prepared.build_command(args)
+    return {"CurrentVolume": "25"}
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Benchmark generated service stubs"
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=20000, help="The number of calls"
+    )
+    args = parser.parse_args()
+
+    generic = RenderingControl(SoCo("10.9.0.1"))
+    generic._actions = ACTIONS  # pylint: disable=protected-access
+    stubs = types.ModuleType("stubs")
+    exec(generate_module([generic]), stubs.__dict__)  # pylint: disable=exec-used
+    stub = stubs.RenderingControl(SoCo("10.9.0.1"))  # pylint: disable=no-member
+
+    with mock.patch.object(Service, "_post_command", post_command):
+        dynamic = timeit.timeit(
+            lambda: generic.GetVolume(Channel="Master"), number=args.number
+        )
+        static = timeit.timeit(
+            lambda: stub.GetVolume(Channel="Master"), number=args.number
+        )
+
+    print("Calls:                {}".format(args.number))
+    print("Dynamic dispatch:     {:.2f} us/call".format(dynamic / args.number * 1e6))
+    print("Generated stub:       {:.2f} us/call".format(static / args.number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
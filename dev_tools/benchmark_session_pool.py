@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+
+"""Compare the per-call cost of Service.send_command with and without
+connection pooling, using a local stub SOAP server"""
+
+import argparse
+import threading
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import soco
+from soco import config
+
+RESPONSE = (
+    '<?xml version="1.0"?>'
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"'
+    ' s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+    "<s:Body>"
+    '<u:GetVolumeResponse xmlns:u="urn:schemas-upnp-org:service:'
+    'RenderingControl:1">'
+    "<CurrentVolume>25</CurrentVolume>"
+    "</u:GetVolumeResponse>"
+    "</s:Body>"
+    "</s:Envelope>"
+).encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer every POST with the same SOAP response, keeping the connection
+    alive"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, so avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Serve a SOAP request"""
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", 'text/xml; charset="utf-8"')
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, fmt, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def time_calls(service, number):
+    """Return the mean time in ms of a GetVolume call"""
+    args = [("InstanceID", 0), ("Channel", "Master")]
+    # Warm up, so that the pooled connection is already open
+    service.send_command("GetVolume", args)
+    total = timeit.timeit(
+        lambda: service.send_command("GetVolume", args), number=number
+    )
+    return total / number * 1000
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Benchmark SoCo connection pooling"
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=500, help="The number of calls to time"
+    )
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    device = soco.SoCo("127.0.0.1")
+    service = device.renderingControl
+    service.base_url = "http://127.0.0.1:{}".format(server.server_address[1])
+
+    config.SESSION_POOL_ENABLED = False
+    unpooled = time_calls(service, args.number)
+    config.SESSION_POOL_ENABLED = True
+    pooled = time_calls(service, args.number)
+
+    print("Calls per run:  {}".format(args.number))
+    print("Without pool:   {:.3f} ms/call".format(unpooled))
+    print("With pool:      {:.3f} ms/call".format(pooled))
+    print("Saving:         {:.3f} ms/call".format(unpooled - pooled))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+
+"""Measure the time and memory taken to create SoCo instances, as happens
+for every member of a household when its zone group state is processed,
+with the services created on first use, and with all of them created as
+SoCo.__init__ used to do"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from soco import SoCo
+
+SERVICES = (
+    "avTransport",
+    "contentDirectory",
+    "deviceProperties",
+    "renderingControl",
+    "groupRenderingControl",
+    "zoneGroupTopology",
+    "alarmClock",
+    "systemProperties",
+    "musicServices",
+    "audioIn",
+    "music_library",
+)
+
+
+def create(number, subnet, touch_services):
+    """Create instances on new addresses, returning them with the time taken
+    and the memory allocated"""
+    ip_addresses = [f"10.{subnet}.{n // 256}.{n % 256}" for n in range(number)]
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    instances = []
+    for ip_address in ip_addresses:
+        instance = SoCo(ip_address)
+        if touch_services:
+            for service in SERVICES:
+                getattr(instance, service)
+        instances.append(instance)
+    elapsed = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return instances, elapsed, allocated
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Benchmark the creation of SoCo instances"
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=500, help="The number of instances"
+    )
+    args = parser.parse_args()
+
+    _, lazy_time, lazy_memory = create(args.number, 1, False)
+    _, eager_time, eager_memory = create(args.number, 2, True)
+
+    print("Instances:                  {}".format(args.number))
+    print(
+        "Services on first use:      {:.2f} ms, {:.0f} KiB".format(
+            lazy_time * 1e3, lazy_memory / 1024
+        )
+    )
+    print(
+        "All services created:       {:.2f} ms, {:.0f} KiB".format(
+            eager_time * 1e3, eager_memory / 1024
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
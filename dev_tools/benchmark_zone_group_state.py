@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+
+"""Compare the cost of processing a duplicate ZoneGroupState payload with the
+digest pre-check against normalizing it with the XSLT, using a large
+household payload from the test data"""
+
+import argparse
+import os
+import timeit
+
+from lxml import etree
+
+from soco.zonegroupstate import ZoneGroupState, normalize_zgs_xml
+
+PAYLOAD_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "tests",
+    "data",
+    "zone_group_state",
+    "large_household.xml",
+)
+
+
+def reordered(payload):
+    """Return the payload with its groups in reverse order, as another
+    speaker might send it"""
+    tree = etree.fromstring(payload.encode("utf-8"))
+    zone_groups = tree.find("ZoneGroups")
+    groups = list(zone_groups)
+    for group in groups:
+        zone_groups.remove(group)
+    for group in reversed(groups):
+        zone_groups.append(group)
+    return etree.tostring(tree, encoding="unicode")
+
+
+def time_call(function, number):
+    """Return the mean time in µs of a call"""
+    return timeit.timeit(function, number=number) / number * 1e6
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Benchmark ZoneGroupState duplicate detection"
+    )
+    parser.add_argument(
+        "-n", "--number", type=int, default=2000, help="The number of calls to time"
+    )
+    args = parser.parse_args()
+
+    with open(PAYLOAD_PATH, encoding="utf-8") as file_:
+        payload = file_.read()
+    variant = reordered(payload)
+
+    zgs = ZoneGroupState()
+    zgs.process_payload(payload, "benchmark", "127.0.0.1")
+    zgs.process_payload(variant, "benchmark", "127.0.0.1")
+
+    def normalize_and_compare():
+        # The work done for every duplicate before the pre-check
+        return str(normalize_zgs_xml(payload)) == zgs._last_zgs  # pylint: disable=W0212
+
+    full = time_call(normalize_and_compare, args.number)
+    fast = time_call(
+        lambda: zgs.process_payload(payload, "benchmark", "127.0.0.1"), args.number
+    )
+    fast_variant = time_call(
+        lambda: zgs.process_payload(variant, "benchmark", "127.0.0.1"), args.number
+    )
+
+    print("Payload size:            {} bytes".format(len(payload)))
+    print("Zones in payload:        {}".format(len(zgs.all_zones)))
+    print("Normalize and compare:   {:.1f} µs/payload".format(full))
+    print("Digest pre-check:        {:.1f} µs/payload".format(fast))
+    print("Reordered, pre-check:    {:.1f} µs/payload".format(fast_variant))
+    print("Processed payloads:      {}".format(zgs.processed_count))
+
+
+if __name__ == "__main__":
+    main()
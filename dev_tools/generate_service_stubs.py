@@ -0,0 +1,31 @@
+#! /usr/bin/env python
+
+"""Generate a module of service stubs from the service descriptions of a
+speaker, for use as soco.config.SERVICE_STUBS"""
+
+import argparse
+
+import soco
+from soco.service_stubs import soco_services, write_module
+
+
+def main():
+    """Generate the stubs"""
+    parser = argparse.ArgumentParser(
+        prog="", description="Generate service stubs from a speaker"
+    )
+    parser.add_argument("ip_address", help="The IP address of the speaker")
+    parser.add_argument("output", help="The path of the module to write")
+    args = parser.parse_args()
+
+    device = soco.SoCo(args.ip_address)
+    info = device.get_speaker_info()
+    description = "a {} with software version {}".format(
+        info["model_name"], info["software_version"]
+    )
+    write_module(args.output, soco_services(device), description)
+    print("Wrote {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
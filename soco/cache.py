@@ -7,12 +7,17 @@
 
 """This module contains the classes underlying SoCo's caching system."""
 
+import logging
+import sys
 import threading
+from collections import OrderedDict
 from pickle import dumps
 from time import time
 
 from . import config
 
+log = logging.getLogger(__name__)  # pylint: disable=C0103
+
 
 class _BaseCache:
     """An abstract base class for the cache."""
@@ -89,9 +94,8 @@ class TimedCache(_BaseCache):
         are not automatically purged, though in practice this is unlikely
         since there are not that many different combinations of arguments in
         the places where it is used in SoCo, so not that many different
-        cache entries will be created. If this becomes a problem,
-        use a thread and timer to purge the cache, or rewrite this to use
-        LRU logic!
+        cache entries will be created. If this becomes a problem, use a
+        `BoundedTimedCache` instead.
     """
 
     def __init__(self, default_timeout=0):
@@ -185,29 +189,332 @@ class TimedCache(_BaseCache):
             **kwargs: any keyword arguments.
 
         Returns:
-            str: the key.
+            tuple or bytes: the key.
         """
-        # This is not entirely straightforward, since args and kwargs may
-        # contain mutable items and unicode. Possibilities include using
-        # __repr__, frozensets, and code from Py3's LRU cache. But pickle
-        # works, and although it is not as fast as some methods, it is good
-        # enough at the moment
+        # SoCo's own lookups, made by `soco.services.Service.send_command`,
+        # always look like make_key((action, [(name, value), ...]), {}),
+        # where the names are strings and the values are strings or ints.
+        # For those, a tuple makes a cheap key which is still unique, since
+        # str and int values never compare equal to each other. Anything
+        # else falls back to pickling, which copes with mutable items and
+        # arbitrary types. The two kinds of key never collide, since pickled
+        # keys are bytes. Exact type checks are used deliberately, since eg
+        # True == 1 but they must not share a key.
+        # pylint: disable=unidiomatic-typecheck
+        if not kwargs and len(args) == 2 and not args[1]:
+            call_args = args[0]
+            if type(call_args) is tuple and len(call_args) == 2:
+                action, arg_list = call_args
+                if type(action) is str and type(arg_list) is list:
+                    for pair in arg_list:
+                        if type(pair) is not tuple or len(pair) != 2:
+                            break
+                        name, value = pair
+                        if type(name) is not str or (
+                            type(value) is not str and type(value) is not int
+                        ):
+                            break
+                    else:
+                        return (action, tuple(arg_list))
         cache_key = dumps((args, kwargs))
         return cache_key
 
 
+class BoundedTimedCache(TimedCache):
+    """A thread-safe cache, like `TimedCache`, with a bounded size.
+
+    When the cache is full, the least recently used items are evicted to
+    make room for new ones. The cache is full when it holds ``max_entries``
+    items, or when the approximate size of the items it holds exceeds
+    ``max_bytes``. Expired items are removed when they are looked up, and
+    all expired items are swept out from time to time as new items are put
+    into the cache.
+
+    Items put with a timeout of 0 are not stored at all.
+
+    Example:
+        >>> cache = BoundedTimedCache(default_timeout=10, max_entries=2)
+        >>> cache.put("one", 1)
+        >>> cache.put("two", 2)
+        >>> cache.get(1)
+        'one'
+        >>> cache.put("three", 3)  # Evicts "two", the least recently used
+        >>> cache.get(2) is None
+        True
+        >>> cache.stats["evictions"]
+        1
+    """
+
+    def __init__(
+        self, default_timeout=0, max_entries=1000, max_bytes=None, sweep_interval=60
+    ):
+        """
+        Args:
+            default_timeout (int): The default number of seconds after
+                which items will be expired.
+            max_entries (int): The maximum number of items to hold, or
+                `None` for no limit.
+            max_bytes (int): The maximum approximate size in bytes of the
+                items to hold, or `None` for no limit.
+            sweep_interval (int): The minimum number of seconds between
+                sweeps for expired items.
+        """
+        super().__init__(default_timeout=default_timeout)
+        self._cache = OrderedDict()
+        #: `int`: The maximum number of items in the cache.
+        self.max_entries = max_entries
+        #: `int`: The maximum approximate size of the cache in bytes.
+        self.max_bytes = max_bytes
+        #: `int`: The minimum interval between sweeps for expired items.
+        self.sweep_interval = sweep_interval
+        self._bytes = 0
+        self._next_sweep = time() + sweep_interval
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, *args, **kwargs):
+        """Get an item from the cache for this combination of args and kwargs.
+
+        See `TimedCache.get`. The item becomes the most recently used.
+        """
+        if not self.enabled:
+            return None
+        cache_key = self.make_key(args, kwargs)
+        with self._cache_lock:
+            entry = self._cache.get(cache_key)
+            if entry is not None:
+                if entry[0] >= time():
+                    self._cache.move_to_end(cache_key)
+                    self._hits += 1
+                    return entry[1]
+                self._remove(cache_key)
+                self._expirations += 1
+            self._misses += 1
+        return None
+
+    def put(self, item, *args, **kwargs):
+        """Put an item into the cache, for this combination of args and kwargs.
+
+        See `TimedCache.put`. Least recently used items are evicted if
+        necessary to make room for it.
+        """
+        if not self.enabled:
+            return
+        timeout = kwargs.pop("timeout", None)
+        if timeout is None:
+            timeout = self.default_timeout
+        cache_key = self.make_key(args, kwargs)
+        now = time()
+        with self._cache_lock:
+            if cache_key in self._cache:
+                self._remove(cache_key)
+            if timeout <= 0:
+                return
+            if now >= self._next_sweep:
+                self._sweep(now)
+            size = _approximate_size(cache_key) + _approximate_size(item)
+            self._cache[cache_key] = (now + timeout, item, size)
+            self._bytes += size
+            while self._cache and self._is_full():
+                self._remove(next(iter(self._cache)))
+                self._evictions += 1
+
+    def delete(self, *args, **kwargs):
+        """Delete an item from the cache for this combination of args and
+        kwargs."""
+        cache_key = self.make_key(args, kwargs)
+        with self._cache_lock:
+            if cache_key in self._cache:
+                self._remove(cache_key)
+
+    def clear(self):
+        """Empty the whole cache."""
+        with self._cache_lock:
+            self._cache.clear()
+            self._bytes = 0
+
+    def purge_expired(self):
+        """Remove all expired items from the cache now."""
+        with self._cache_lock:
+            self._sweep(time())
+
+    @property
+    def stats(self):
+        """dict: Cache statistics: the number of ``entries`` and approximate
+        ``bytes`` held, and the numbers of ``hits``, ``misses``,
+        ``evictions`` (to make room for new items) and ``expirations``."""
+        with self._cache_lock:
+            return {
+                "entries": len(self._cache),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+    def _is_full(self):
+        """Is the cache over its limits? Must be called with the lock held."""
+        if self.max_entries is not None and len(self._cache) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def _remove(self, cache_key):
+        """Remove an item. Must be called with the lock held."""
+        self._bytes -= self._cache.pop(cache_key)[2]
+
+    def _sweep(self, now):
+        """Remove expired items. Must be called with the lock held."""
+        expired = [key for key, entry in self._cache.items() if entry[0] < now]
+        for cache_key in expired:
+            self._remove(cache_key)
+        self._expirations += len(expired)
+        self._next_sweep = now + self.sweep_interval
+
+
+def _approximate_size(obj):
+    """Estimate the memory used by an object, looking one level into
+    containers."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(sys.getsizeof(i) for i in obj)
+    return size
+
+
+class _Flight:
+    """A call in progress, on which other callers may wait."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into a single call.
+
+    While a call for a given key is in progress, any other thread making a
+    call with the same key waits for it to finish, and shares its result (or
+    its exception) rather than making the call again.
+
+    Example:
+        >>> in_flight = SingleFlight()
+        >>> result, shared = in_flight.do("key", expensive_function, arg)
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        #: `int`: The number of calls which have actually been made.
+        self.calls = 0
+        #: `int`: The number of calls which shared the result of another.
+        self.coalesced = 0
+        #: `int`: The number of calls which gave up waiting for another, and
+        #: were made themselves.
+        self.timed_out = 0
+
+    def do(self, key, function, *args, wait_timeout=None, **kwargs):
+        """Call ``function(*args, **kwargs)``, unless a call with the same
+        key is already in progress, in which case wait for its result.
+
+        Args:
+            key: a hashable key identifying the call.
+            function (callable): the function to call.
+            *args: positional arguments for ``function``.
+            wait_timeout (float, optional): the number of seconds to wait
+                for a call in progress. If it has not finished by then, the
+                function is called directly instead. If `None`, wait for as
+                long as the call takes.
+            **kwargs: keyword arguments for ``function``.
+
+        Returns:
+            tuple: ``(result, shared)``, where ``shared`` is `True` if the
+            result came from a call made by another thread.
+
+        Raises:
+            Exception: any exception raised by the call, including one
+                raised in another thread whose result is shared.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            if not flight.done.wait(wait_timeout):
+                log.debug("Gave up waiting for in-flight call %s", key)
+                with self._lock:
+                    self.timed_out += 1
+                    self.calls += 1
+                return function(*args, **kwargs), False
+            with self._lock:
+                self.coalesced += 1
+            if flight.exception is not None:
+                raise flight.exception
+            return flight.result, True
+
+        try:
+            flight.result = function(*args, **kwargs)
+        except BaseException as exc:
+            flight.exception = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    @property
+    def stats(self):
+        """dict: The number of ``calls`` made, the number of calls which
+        were ``coalesced``, and the number which ``timed_out`` waiting for
+        another and were made themselves."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "timed_out": self.timed_out,
+            }
+
+    def reset_stats(self):
+        """Reset the counters to zero."""
+        with self._lock:
+            self.calls = 0
+            self.coalesced = 0
+            self.timed_out = 0
+
+
 class Cache(NullCache):
     """A factory class which returns an instance of a cache subclass.
 
     A `TimedCache` is returned, unless `config.CACHE_ENABLED` is `False`,
-    in which case a `NullCache` will be returned.
+    in which case a `NullCache` will be returned. A `BoundedTimedCache` is
+    returned instead of a `TimedCache` if `config.CACHE_MAX_ENTRIES` or
+    `config.CACHE_MAX_BYTES` is set, or if ``max_entries`` or ``max_bytes``
+    is passed as a keyword argument.
     """
 
     def __new__(cls, *args, **kwargs):
-        if config.CACHE_ENABLED:
-            new_cls = TimedCache
-        else:
+        if not config.CACHE_ENABLED:
             new_cls = NullCache
+        elif "max_entries" in kwargs or "max_bytes" in kwargs:
+            new_cls = BoundedTimedCache
+        elif config.CACHE_MAX_ENTRIES is not None or config.CACHE_MAX_BYTES is not None:
+            new_cls = BoundedTimedCache
+            kwargs.setdefault("max_entries", config.CACHE_MAX_ENTRIES)
+            kwargs.setdefault("max_bytes", config.CACHE_MAX_BYTES)
+        else:
+            new_cls = TimedCache
         instance = super().__new__(new_cls)
         instance.__init__(*args, **kwargs)
         return instance
@@ -25,6 +25,24 @@ See also:
     The :mod:`soco.cache` module.
 """
 
+CACHE_MAX_ENTRIES = None
+"""The maximum number of items held by each cache.
+
+If this or `CACHE_MAX_BYTES` is set, caches created after that will be
+instances of `soco.cache.BoundedTimedCache`, which evict the least recently
+used items when full. The default of `None` means that caches are not
+bounded.
+
+See also:
+    The :mod:`soco.cache` module.
+"""
+
+CACHE_MAX_BYTES = None
+"""The maximum approximate size in bytes of the items held by each cache.
+
+See `CACHE_MAX_ENTRIES`.
+"""
+
 
 EVENT_ADVERTISE_IP = None
 """The IP on which to advertise to Sonos.
@@ -65,6 +83,68 @@ See also:
     The :mod:`soco.events` and :mod:`soco.events_twisted` modules.
 """
 
+EVENT_SERVER_WORKERS = None
+"""The number of worker threads which handle event connections.
+
+The default of `None` means that the event listener of :mod:`soco.events`
+handles each connection from a Sonos device on a new thread. If set to a
+number, that many worker threads are started instead, and connections wait
+for a free one. Must be set before the event listener is started.
+
+See also:
+    `soco.events.PooledEventServer`.
+"""
+
+EVENT_SERVER_BACKLOG = 16
+"""The number of connections which may wait for a free worker thread.
+
+Only used if `EVENT_SERVER_WORKERS` is set. When this many connections are
+waiting, further ones are left in the operating system's listen queue,
+which is the same size.
+"""
+
+EVENT_SERVER_KEEPALIVE_TIMEOUT = 5.0
+"""The time (in seconds) for which an idle event connection is kept open.
+
+Only used if `EVENT_SERVER_WORKERS` is set. Sonos devices may send several
+events over one HTTP/1.1 connection. Between requests, the connection is
+watched without tying up a worker thread, and it is closed if no request
+arrives for this long. If `None`, connections are kept open until the
+device closes them.
+"""
+
+EVENT_ORDER_TIMEOUT = 0.5
+"""The time (in seconds) for which an event may be held back for an earlier
+one.
+
+Only used if `EVENT_SERVER_WORKERS` is set. If the events of a subscription
+arrive on different connections, and so on different threads, an event is
+held back for up to this long until the event with the previous sequence
+number has been delivered, so that they are delivered in order. Set to 0
+to deliver events in the order they are received.
+"""
+
+AUTO_RENEW_WORKERS = 4
+"""The number of subscriptions which may be auto-renewed at the same time.
+
+Subscriptions of :mod:`soco.events` with ``auto_renew=True`` are renewed by
+one scheduler thread, which hands each renewal that falls due to a pool of
+this many threads. Must be set before the first subscription with
+``auto_renew=True`` is made.
+
+See also:
+    `soco.events.RenewalScheduler`.
+"""
+
+AUTO_RENEW_JITTER = 0.1
+"""The fraction of the renewal interval over which auto-renewals are spread.
+
+Each auto-renewal of a subscription of :mod:`soco.events` is brought
+forward by a random amount, up to this fraction of the interval, so that
+subscriptions made at the same time are not all renewed at the same time.
+Set to 0 to renew each subscription at exactly 85% of its timeout.
+"""
+
 REQUEST_TIMEOUT = 20.0
 """The timeout (in seconds) to be used when sending commands to a Sonos device.
 
@@ -78,6 +158,18 @@ timeout at runtime. It can also be overridden for specific calls by using the
 'timeout' kwarg in the relevant calling functions.
 """
 
+REQUEST_COALESCING_ENABLED = True
+"""Should identical concurrent requests to a Sonos device be coalesced?
+
+If `True` (the default), when several threads send the same read-only UPnP
+action (one whose name starts with ``Get``, or ``Browse``) with the same
+arguments to the same device at the same time, only one request is sent and
+its result is shared by all of them.
+
+See also:
+    `soco.services.in_flight_requests`, which counts coalesced requests.
+"""
+
 ZGT_EVENT_FALLBACK = True
 """
 For large Sonos systems (about 20+ players) the standard method of querying a
@@ -88,3 +180,55 @@ you wish to disable this behaviour, set 'ZGT_EVENT_FALLBACK' to 'False'. Your
 code should then be prepared to catch `NotSupportedException` errors when
 using functions that interrogate system state.
 """
+
+SESSION_POOL_ENABLED = False
+"""Should HTTP connections to Sonos devices be kept alive and re-used?
+
+If `True`, UPnP actions sent by `soco.services.Service` will use a pooled
+`requests.Session` per speaker, shared by all the services of a `SoCo`
+instance, rather than opening a new connection for every request. The
+default is `False`.
+
+See also:
+    The :mod:`soco.sessions` module.
+"""
+
+SESSION_POOL_SIZE = 4
+"""The maximum number of idle keep-alive connections kept for each speaker.
+
+Only used if `SESSION_POOL_ENABLED` is `True`. Must be set before the first
+request to a speaker is made, since it is applied when the speaker's session
+is created.
+"""
+
+SESSION_POOL_IDLE_TIMEOUT = 30.0
+"""The period (in seconds) after which an unused speaker session is closed.
+
+Only used if `SESSION_POOL_ENABLED` is `True`. If set to `None`, sessions are
+never closed automatically.
+"""
+
+DISCOVERY_CACHE = None
+"""The `soco.discovery_cache.DiscoveryCache` to be used by discovery.
+
+If set, `soco.discovery.discover`, `soco.discovery.any_soco` and
+`soco.discovery.by_name` answer from the speakers recorded in the cache,
+when it has any, instead of searching the network, and record the speakers
+which they find. The default of `None` means that no cache is used.
+
+See also:
+    The :mod:`soco.discovery_cache` module.
+"""
+
+SERVICE_STUBS = None
+"""A module of generated service stubs to be used by `SoCo` instances.
+
+If set, the services of `SoCo` instances are created from the classes of the
+same name in this module, when it has them, instead of from the classes in
+:mod:`soco.services`. Such a module is written by
+`soco.service_stubs.write_module`. Must be set before the services of any
+instances are used.
+
+See also:
+    The :mod:`soco.service_stubs` module.
+"""
@@ -34,8 +34,13 @@ from .exceptions import (
     NotSupportedException,
     SoCoNotVisibleException,
 )
-from .music_library import MusicLibrary
-from .services import (
+from .mirror import StateMirror
+
+# These are looked up by name when first used by a SoCo instance, see
+# _CreatedOnFirstUse
+# pylint: disable=unused-import
+from .music_library import MusicLibrary  # noqa: F401
+from .services import (  # noqa: F401
     DeviceProperties,
     ContentDirectory,
     RenderingControl,
@@ -47,6 +52,8 @@ from .services import (
     AudioIn,
     GroupRenderingControl,
 )
+
+# pylint: enable=unused-import
 from .utils import (
     camel_to_underscore,
     deprecated,
@@ -135,6 +142,35 @@ class _SocoSingletonBase(  # pylint: disable=no-init
     """
 
 
+class _CreatedOnFirstUse:
+    """A descriptor for an attribute of a `SoCo` instance, such as a service,
+    which is created the first time it is accessed.
+
+    The attribute is created by calling the class named ``class_name`` in
+    this module with the instance, and is then stored in the instance's
+    ``__dict__``, which takes precedence over this descriptor from then on.
+    The class is looked up on each creation, so that it can be patched, and
+    a class of the same name in `config.SERVICE_STUBS` is preferred.
+    """
+
+    def __init__(self, class_name):
+        self.class_name = class_name
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        cls = getattr(config.SERVICE_STUBS, self.class_name, None)
+        if cls is None:
+            cls = globals()[self.class_name]
+        attribute = cls(instance)
+        # If two threads get here at once, both get the first one stored
+        return instance.__dict__.setdefault(self.name, attribute)
+
+
 def only_on_master(function):
     """Decorator that raises SoCoSlaveException on master call on slave."""
 
@@ -324,6 +360,22 @@ class SoCo(_SocoSingletonBase):
     _class_group = "SoCo"
     zone_group_states = {}
 
+    # The services which we use. They are created on first use, since many
+    # instances are created for zone group members which are never used.
+    # pylint: disable=invalid-name
+    avTransport = _CreatedOnFirstUse("AVTransport")
+    contentDirectory = _CreatedOnFirstUse("ContentDirectory")
+    deviceProperties = _CreatedOnFirstUse("DeviceProperties")
+    renderingControl = _CreatedOnFirstUse("RenderingControl")
+    groupRenderingControl = _CreatedOnFirstUse("GroupRenderingControl")
+    zoneGroupTopology = _CreatedOnFirstUse("ZoneGroupTopology")
+    alarmClock = _CreatedOnFirstUse("AlarmClock")
+    systemProperties = _CreatedOnFirstUse("SystemProperties")
+    musicServices = _CreatedOnFirstUse("MusicServices")
+    audioIn = _CreatedOnFirstUse("AudioIn")
+
+    music_library = _CreatedOnFirstUse("MusicLibrary")
+
     # pylint: disable=super-on-old-class
     def __init__(self, ip_address):
         # Note: Creation of a SoCo instance should be as cheap and quick as
@@ -339,21 +391,6 @@ class SoCo(_SocoSingletonBase):
         self.ip_address = ip_address
         self.speaker_info = {}  # Stores information about the current speaker
 
-        # The services which we use
-        # pylint: disable=invalid-name
-        self.avTransport = AVTransport(self)
-        self.contentDirectory = ContentDirectory(self)
-        self.deviceProperties = DeviceProperties(self)
-        self.renderingControl = RenderingControl(self)
-        self.groupRenderingControl = GroupRenderingControl(self)
-        self.zoneGroupTopology = ZoneGroupTopology(self)
-        self.alarmClock = AlarmClock(self)
-        self.systemProperties = SystemProperties(self)
-        self.musicServices = MusicServices(self)
-        self.audioIn = AudioIn(self)
-
-        self.music_library = MusicLibrary(self)
-
         # Some private attributes
         self._boot_seqnum = None
         self._channel_map = None
@@ -370,6 +407,7 @@ class SoCo(_SocoSingletonBase):
         self._player_name = None
         self._uid = None
         self._household_id = None
+        self._mirror = None
 
         _LOG.debug("Created SoCo instance for ip: %s", ip_address)
 
@@ -2220,6 +2258,48 @@ class SoCo(_SocoSingletonBase):
             return self.speaker_info
         return None
 
+    @property
+    def mirror(self):
+        """StateMirror: The mirror of this speaker's state, or `None` if the
+        speaker is not mirrored. See `start_mirror`."""
+        return self._mirror
+
+    def start_mirror(self, requested_timeout=None):
+        """Keep a local model of this speaker's state up to date from events.
+
+        While the speaker is mirrored, `volume`, `mute`, `bass`, `treble`,
+        `loudness`, `play_mode`, `cross_fade` and
+        `get_current_transport_info` are answered without network calls,
+        and the returned `StateMirror` also offers the current track and
+        queue update id. If the events stop, reads fall back to polling.
+
+        Calling this again while the speaker is mirrored has no effect.
+
+        Args:
+            requested_timeout (int, optional): The subscription timeout to
+                request, in seconds.
+
+        Returns:
+            `StateMirror`: The mirror. With `soco.events_asyncio`, await its
+            `StateMirror.async_start` method.
+        """
+        if self._mirror is None:
+            self._mirror = StateMirror(self, requested_timeout=requested_timeout)
+        return self._mirror.start()
+
+    def stop_mirror(self):
+        """Stop mirroring this speaker's state, and unsubscribe.
+
+        Returns:
+            `StateMirror`: The mirror which was stopped, or `None`. With
+            `soco.events_asyncio`, await its `StateMirror.async_stop`
+            method.
+        """
+        mirror, self._mirror = self._mirror, None
+        if mirror is not None:
+            mirror.stop()
+        return mirror
+
     def get_current_transport_info(self):
         """Get the current playback state.
 
@@ -4,18 +4,55 @@ network."""
 import logging
 import socket
 import select
-from textwrap import dedent
+import queue
 import time
-import struct
 import ipaddress
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import closing
 import ifaddr
+import requests
 
 from . import config
+from .sessions import session_pool
+from .ssdp import (
+    create_search_socket,
+    parse_ssdp_message,
+    send_search,
+)
 from .utils import really_utf8
 
 _LOG = logging.getLogger(__name__)
 
+#: The path of the neighbour (ARP) table, used to order network scans.
+NEIGHBOUR_TABLE = "/proc/net/arp"
+
+#: The hardware address prefixes (OUIs) registered to Sonos, Inc.
+SONOS_OUIS = frozenset(
+    (
+        "00:0e:58",
+        "34:7e:5c",
+        "38:42:0b",
+        "48:a6:b8",
+        "54:2a:1b",
+        "5c:aa:fd",
+        "74:ca:60",
+        "78:28:ca",
+        "80:4a:f2",
+        "94:9f:3e",
+        "b8:e9:37",
+        "c4:38:75",
+        "f0:f6:c1",
+    )
+)
+
+#: The number of threads in the pool shared by calls to `contactable`.
+CONTACTABLE_MAX_WORKERS = 32
+
+_contactable_pool = None  # pylint: disable=invalid-name
+_contactable_pool_lock = threading.Lock()
+
 
 def discover(
     timeout=5,
@@ -39,6 +76,11 @@ def discover(
     data can lag the actual state of the system, e.g., if a speaker has been
     recently switched off.
 
+    If `config.DISCOVERY_CACHE <soco.config.DISCOVERY_CACHE>` is set, and it
+    holds any zones in the household, they are returned without searching the
+    network, and the cache is validated in the background. Otherwise, the
+    zones found are recorded in the cache.
+
     Args:
         timeout (int, optional): block for this many seconds, at most.
             Defaults to 5.
@@ -65,33 +107,77 @@ def discover(
         `None`.
     """
 
-    def create_socket(interface_addr):
-        """A helper function for creating a socket for discovery purposes.
-
-        Create and return a socket with appropriate options set for multicast.
-        """
-
-        _sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        # UPnP v1.0 requires a TTL of 4
-        _sock.setsockopt(
-            socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, struct.pack("B", 4)
+    cache = config.DISCOVERY_CACHE
+    if cache is not None:
+        # "Sonos" is in every household ID, so means any household
+        zones = cache.zones(
+            household_id=None if household_id == "Sonos" else household_id,
+            include_invisible=include_invisible,
         )
-        _sock.setsockopt(
-            socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface_addr)
+        if zones:
+            _LOG.debug("Returning zones from the discovery cache")
+            cache.validate_in_background()
+            return zones
+
+    with closing(
+        discover_iter(
+            timeout=timeout, interface_addr=interface_addr, household_id=household_id
         )
-        return _sock
-
-    # pylint: disable=invalid-name
-    PLAYER_SEARCH = dedent("""\
-        M-SEARCH * HTTP/1.1
-        HOST: 239.255.255.250:1900
-        MAN: "ssdp:discover"
-        MX: 1
-        ST: urn:schemas-upnp-org:device:ZonePlayer:1
-        """).encode("utf-8")
-    MCAST_GRP = "239.255.255.250"
-    MCAST_PORT = 1900
+    ) as responses:
+        zone = next(responses, None)
+    if zone is not None:
+        # Now we have an IP, we can build a SoCo instance and query
+        # that player for the topology to find the other players.
+        # It is much more efficient to rely upon the Zone
+        # Player's ability to find the others, than to wait for
+        # query responses from them ourselves.
+        if cache is not None:
+            # pylint: disable=protected-access
+            cache.record(zone.all_zones, zone.visible_zones, zone._household_id)
+        if include_invisible:
+            return zone.all_zones
+        else:
+            return zone.visible_zones
+
+    if allow_network_scan:
+        _LOG.debug("Falling back to network scan discovery")
+        if household_id == "Sonos":
+            return scan_network(
+                include_invisible=include_invisible,
+                **network_scan_kwargs,
+            )
+        else:
+            return scan_network_by_household_id(
+                household_id,
+                include_invisible=include_invisible,
+                **network_scan_kwargs,
+            )
+    return None
+
+
+def discover_iter(timeout=5, interface_addr=None, household_id="Sonos"):
+    """Discover Sonos devices on the local network, yielding each as soon as
+    it responds.
 
+    Unlike `discover`, which asks the first device to respond for the zones
+    it knows about, this yields a `SoCo` instance for every device which
+    responds to the search, including invisible ones, so that work can start
+    on the first devices while discovery continues. Each device is yielded
+    once, with its household ID set from the response. Iteration stops after
+    ``timeout`` seconds, or when the generator is closed.
+
+    Args:
+        timeout (int, optional): search for this many seconds, at most.
+            Defaults to 5.
+        interface_addr (str or None): The network interface address to use
+            as the source of the search. See `discover`.
+        household_id (str): Only yield devices whose responses contain this
+            string, e.g. a Sonos Household ID. Defaults to any household.
+
+    Yields:
+        SoCo: A `SoCo` instance (or subclass if `config.SOCO_CLASS` is set)
+        for each device which responds.
+    """
     if interface_addr is not None:  # Use the specified interface, if any
         try:
             _ = socket.inet_aton(interface_addr)
@@ -107,14 +193,14 @@ def discover(
         addresses = _find_ipv4_addresses()
         if len(addresses) == 0:
             _LOG.debug("No interfaces available for discovery")
-            return None
+            return
         _LOG.debug("Sending discovery packets on discovered interface(s) %s", addresses)
 
     # Create sockets
     _sockets = []
     for address in addresses:
         try:
-            _sock = create_socket(address)
+            _sock = create_search_socket(address)
             _sockets.append(_sock)
             _LOG.debug("Created socket %s for %s", _sock, address)
         except OSError as e:
@@ -126,27 +212,103 @@ def discover(
             )
 
     # Send a few times to each socket. UDP is unreliable
-    for _ in range(0, 3):
-        for _sock in _sockets[:]:  # Copy the list, because items may be removed
-            _LOG.debug("Sending discovery packet on %s", _sock)
-            try:
-                _sock.sendto(really_utf8(PLAYER_SEARCH), (MCAST_GRP, MCAST_PORT))
-            except OSError as e:
-                _LOG.debug("Sending failed %s: removing %s from sockets list", e, _sock)
-                _sockets.remove(_sock)
-                _LOG.debug("Closing socket %s", _sock)
-                _sock.close()
+    for _sock in send_search(_sockets):
+        _LOG.debug("Removing %s from sockets list", _sock)
+        _sockets.remove(_sock)
+        _LOG.debug("Closing socket %s", _sock)
+        _sock.close()
 
     if len(_sockets) == 0:
         _LOG.debug("Sending failed on all interfaces")
-        return None
+        return
 
-    def close_sockets():
-        """Helper function to close all remaining open sockets"""
+    try:
+        yield from _receive_search_responses(_sockets, timeout, household_id)
+    finally:
         for _sock in _sockets:
             _LOG.debug("Closing socket %s", _sock)
             _sock.close()
 
+
+def discover_households(
+    timeout=2,
+    include_invisible=False,
+    interface_addr=None,
+    network_scan=False,
+    **network_scan_kwargs,
+):
+    """Discover all the Sonos households on the local network in one pass.
+
+    Unlike `discover`, which stops at the first response, this waits for
+    every device to respond to one multicast search, groups the responses
+    by the household ID in their ``X-RINCON-HOUSEHOLD`` header, and asks
+    one device in each household for its zones. Optionally, the attached
+    networks are then scanned once, to find households whose devices don't
+    answer multicast searches. Only devices which aren't already known to
+    be in a household found are asked for their household ID and zones.
+
+    The zones found are recorded in `config.DISCOVERY_CACHE
+    <soco.config.DISCOVERY_CACHE>`, if it is set, but it isn't consulted.
+
+    Args:
+        timeout (int, optional): how long to wait for responses to the
+            search, in seconds. Sonos devices respond within a second.
+            Defaults to 2.
+        include_invisible (bool, optional): include invisible zones in the
+            returned sets. Defaults to `False`.
+        interface_addr (str or None): The network interface address to use
+            as the source of the search. See `discover`.
+        network_scan (bool, optional): Whether to scan the attached networks
+            as well. Defaults to `False`.
+        **network_scan_kwargs: Arguments for the `scan_network_iter`
+            function. See its docstring for details.
+
+    Returns:
+        dict: A dict mapping each household ID to a set of `SoCo` instances,
+        one for each zone found in the household. The dict is empty if no
+        zones are found.
+    """
+    # pylint: disable=protected-access
+    households = {}
+    all_zones = set()
+
+    def add_household(zone):
+        """Add the household of a responding device."""
+        household_id = zone.household_id
+        zones = zone.all_zones
+        visible_zones = zone.visible_zones
+        for member in zones:
+            if member._household_id is None:
+                member._household_id = household_id
+        all_zones.update(zones)
+        households.setdefault(household_id, set()).update(
+            zones if include_invisible else visible_zones
+        )
+        if config.DISCOVERY_CACHE is not None:
+            config.DISCOVERY_CACHE.record(zones, visible_zones, household_id)
+
+    # The first device to respond in each household
+    responders = {}
+    for zone in discover_iter(timeout=timeout, interface_addr=interface_addr):
+        responders.setdefault(zone._household_id or zone.ip_address, zone)
+    for zone in responders.values():
+        if zone not in all_zones:
+            add_household(zone)
+
+    if network_scan:
+        _LOG.debug("Scanning for households which did not respond")
+        for zone in scan_network_iter(**network_scan_kwargs):
+            if zone not in all_zones:
+                add_household(zone)
+
+    _LOG.debug("Returning households: %s", households)
+    return households
+
+
+def _receive_search_responses(sockets, timeout, household_id):
+    """Yield a `SoCo` instance for each device which responds to a search,
+    until the timeout expires."""
+    seen = set()
     t0 = time.time()
     while True:
         # Check if the timeout is exceeded. We could do this check just
@@ -158,13 +320,12 @@ def discover(
         t1 = time.time()
         if t1 - t0 > timeout:
             _LOG.debug("Discovery timeout")
-            close_sockets()
-            break
+            return
 
         # The timeout of the select call is set to be no greater than
         # 100ms, so as not to exceed (too much) the required timeout
         # in case the loop is executed more than once.
-        response, _, _ = select.select(_sockets, [], [], min(timeout, 0.1))
+        response, _, _ = select.select(sockets, [], [], min(timeout, 0.1))
 
         # Only Zone Players should respond, given the value of ST in the
         # PLAYER_SEARCH message. However, to prevent misbehaved devices
@@ -189,40 +350,23 @@ def discover(
             for _sock in response:
                 data, addr = _sock.recvfrom(1024)
                 _LOG.debug('Received discovery response from %s: "%s"', addr, data)
-                if really_utf8(household_id) in data:
-                    # Now we have an IP, we can build a SoCo instance and query
-                    # that player for the topology to find the other players.
-                    # It is much more efficient to rely upon the Zone
-                    # Player's ability to find the others, than to wait for
-                    # query responses from them ourselves.
+                if really_utf8(household_id) in data and addr[0] not in seen:
+                    seen.add(addr[0])
                     zone = config.SOCO_CLASS(addr[0])
-                    close_sockets()
-                    if include_invisible:
-                        return zone.all_zones
-                    else:
-                        return zone.visible_zones
-
-    if allow_network_scan:
-        _LOG.debug("Falling back to network scan discovery")
-        if household_id == "Sonos":
-            return scan_network(
-                include_invisible=include_invisible,
-                **network_scan_kwargs,
-            )
-        else:
-            return scan_network_by_household_id(
-                household_id,
-                include_invisible=include_invisible,
-                **network_scan_kwargs,
-            )
+                    _, headers = parse_ssdp_message(data)
+                    # pylint: disable=protected-access
+                    if zone._household_id is None:
+                        zone._household_id = headers.get("X-RINCON-HOUSEHOLD")
+                    yield zone
 
 
 def any_soco(allow_network_scan=False, **network_scan_kwargs):
     """Return any visible soco device, for when it doesn't matter which.
 
-    Try to obtain an existing instance, or use `discover` if necessary.
-    Note that this assumes that the existing instance has not left
-    the network.
+    Try to obtain an existing instance, or use `discover` if necessary,
+    which answers from `config.DISCOVERY_CACHE <soco.config.DISCOVERY_CACHE>`
+    if it is set. Note that this assumes that the existing instance has not
+    left the network.
 
     Args:
         allow_network_scan (bool, optional): If normal discovery fails, fall
@@ -256,6 +400,10 @@ def any_soco(allow_network_scan=False, **network_scan_kwargs):
 def by_name(name, allow_network_scan=False, **network_scan_kwargs):
     """Return a device by name.
 
+    If `config.DISCOVERY_CACHE <soco.config.DISCOVERY_CACHE>` is set, and a
+    visible device with the name is cached, it is returned without searching
+    the network.
+
     Args:
         name (str): The name of the device to return.
         allow_network_scan (bool, optional): If normal discovery fails, fall
@@ -268,6 +416,13 @@ def by_name(name, allow_network_scan=False, **network_scan_kwargs):
         SoCo: A `SoCo` instance (or subclass if `config.SOCO_CLASS` is set),
         or `None` if no instances are found.
     """
+    cache = config.DISCOVERY_CACHE
+    if cache is not None:
+        device = cache.by_name(name)
+        if device is not None:
+            cache.validate_in_background()
+            return device
+
     devices = discover(allow_network_scan=allow_network_scan, **network_scan_kwargs)
     if devices is None:
         return None
@@ -342,19 +497,9 @@ def scan_network(
     """
 
     # Generate the set of IPs to check
-    ip_set = set()
-    if networks_to_scan:
-        for network_to_scan in networks_to_scan:
-            try:
-                network = ipaddress.IPv4Network(network_to_scan, False)
-            except ValueError:
-                _LOG.debug("'%s' is not a valid IPv4 network", network_to_scan)
-                # Ignore the error and continue processing the list
-                continue
-            ip_set.update(set(network))
-    else:
-        for network in _find_ipv4_networks(min_netmask):
-            ip_set.update(set(network))
+    ip_set = _order_ip_addresses_to_scan(
+        _find_ip_addresses_to_scan(networks_to_scan, min_netmask)
+    )
 
     # Find Sonos devices on the list of IPs
     # Use threading to scan the list efficiently
@@ -414,6 +559,74 @@ def scan_network(
     return zones
 
 
+def scan_network_iter(
+    max_threads=256, scan_timeout=0.5, min_netmask=24, networks_to_scan=None
+):
+    """Scan all attached networks for Sonos devices, yielding each as soon as
+    it is found.
+
+    Unlike `scan_network`, which returns after every address has been
+    checked, this yields a `SoCo` instance for each Sonos device as soon as
+    it is confirmed, so that work can start on the first devices while the
+    scan continues. Every address is checked, as with
+    ``multi_household=True``, and the zones known to each device are not
+    looked up. Closing the generator stops the scan.
+
+    Args:
+        max_threads (int, optional): The maximum number of threads to use when
+            scanning the network.
+        scan_timeout (float, optional): The network timeout in seconds to use when
+            checking each IP address for a Sonos device.
+        min_netmask (int, optional): The minimum number of netmask bits. Used to
+            constrain the network search space.
+        networks_to_scan (list, optional): A `list` of IPv4 networks to search,
+            each a `str` of form "192.168.0.1/24". Only the specified networks will
+            be searched. The 'min_netmask' option (if supplied) is ignored.
+
+    Yields:
+        SoCo: A `SoCo` instance (or subclass if `config.SOCO_CLASS` is set)
+        for each Sonos device found.
+    """
+    ip_set = _order_ip_addresses_to_scan(
+        _find_ip_addresses_to_scan(networks_to_scan, min_netmask)
+    )
+    found = _FoundQueue()
+    thread_list = []
+    for _ in range(min(max_threads, len(ip_set))):
+        thread = threading.Thread(
+            target=_sonos_scan_worker_thread,
+            args=(ip_set, scan_timeout, found, True),
+            daemon=True,
+        )
+        try:
+            thread.start()
+        except RuntimeError:
+            _LOG.warning(
+                "Runtime error starting thread number %d ... continue",
+                len(thread_list) + 1,
+            )
+            break
+        thread_list.append(thread)
+    _LOG.debug("Created %d scanner threads", len(thread_list))
+
+    try:
+        while True:
+            # Check whether the threads have finished before emptying the
+            # queue, so that nothing they add is missed
+            finished = not any(thread.is_alive() for thread in thread_list)
+            try:
+                ip_address = found.get(timeout=0.1)
+            except queue.Empty:
+                if finished:
+                    break
+                continue
+            yield config.SOCO_CLASS(ip_address)
+    finally:
+        # Stop the threads taking any more addresses
+        ip_set.clear()
+    _LOG.debug("All %d scanner threads terminated", len(thread_list))
+
+
 def scan_network_by_household_id(
     household_id, include_invisible=False, **network_scan_kwargs
 ):
@@ -545,67 +758,234 @@ def scan_network_any_soco(household_id=None, **network_scan_kwargs):
     return any_zone
 
 
-def contactable(speakers):
+def contactable(speakers, timeout=None, use_session_pool=False, latency=False):
     """Find only contactable players in a set of `SoCo` objects.
 
     This function checks a set of `SoCo` objects to ensure that each
-    associated Sonos player is currently contactable. A new set
-    is returned containing only contactable players.
+    associated Sonos player is currently contactable, by fetching its device
+    description. A new set is returned containing only contactable players.
 
-    If there are non-contactable players, the function return will
-    be delayed until at least one network timeout has expired (several
-    seconds). Contact attempts run in parallel threads to minimise
-    delays.
+    The checks run in parallel on a bounded pool of threads, which is shared
+    by all calls, so calling this often does not create threads each time.
+    If there are non-contactable players, the function return will be
+    delayed until the network timeout has expired, unless an overall
+    ``timeout`` is given.
 
     Args:
-        speakers(set): A set of `SoCo` objects.
+        speakers(set): A set of `SoCo` objects. It is not modified.
+        timeout(float, optional): The overall deadline in seconds. Players
+            which are not confirmed as contactable within this time are
+            treated as not contactable. If `None` (the default), each check
+            may take up to `config.REQUEST_TIMEOUT <soco.config.REQUEST_TIMEOUT>`.
+        use_session_pool(bool, optional): Whether to make the checks on the
+            keep-alive connections of `soco.sessions.session_pool`, which is
+            only used if `config.SESSION_POOL_ENABLED
+            <soco.config.SESSION_POOL_ENABLED>` is `True`. Defaults to
+            `False`, so that each check opens a new connection.
+        latency(bool, optional): If `True`, return the round trip time of
+            each check instead of a set. Defaults to `False`.
 
     Returns:
         set: A set of `SoCo` objects, all of which have been
         confirmed to be currently contactable. An empty set
-        is returned if no speakers are contactable.
+        is returned if no speakers are contactable. If ``latency`` is
+        `True`, a dict is returned instead, which maps each of the
+        ``speakers`` to the round trip time of its check in seconds, or to
+        `None` if it is not contactable.
     """
+    speakers = list(dict.fromkeys(speakers or ()))
+    latencies = dict.fromkeys(speakers)
+    if speakers:
+        probe_timeout = config.REQUEST_TIMEOUT if timeout is None else timeout
+        pool = _get_contactable_pool()
+        futures = {}
+        for speaker in speakers:
+            future = pool.submit(
+                _probe_speaker, speaker, probe_timeout, use_session_pool
+            )
+            futures[future] = speaker
+        done, not_done = wait(futures, timeout=timeout)
+        for future in not_done:
+            # Don't start checks which are no longer waited for
+            future.cancel()
+            _LOG.debug("%s did not respond in time", futures[future].ip_address)
+        for future in done:
+            latencies[futures[future]] = future.result()
+
+    if latency:
+        return latencies
+    return {speaker for speaker, rtt in latencies.items() if rtt is not None}
+
+
+def _get_contactable_pool():
+    """Return the thread pool used by `contactable`, creating it if
+    necessary."""
+    global _contactable_pool  # pylint: disable=global-statement
+    with _contactable_pool_lock:
+        if _contactable_pool is None:
+            _contactable_pool = ThreadPoolExecutor(
+                max_workers=CONTACTABLE_MAX_WORKERS,
+                thread_name_prefix="soco-contactable",
+            )
+        return _contactable_pool
 
-    def contactable_worker():
-        """Worker thread helper function to check whether
-        speakers are contactable and, if so, to add them to
-        the set of contactable speakers.
-        """
-        while True:
-            try:
-                speaker = speakers.pop()
-            except KeyError:
-                break
+
+def _probe_speaker(speaker, timeout, use_session_pool):
+    """Check whether a speaker is contactable.
+
+    Returns:
+        float: The round trip time in seconds, or `None` if the speaker is
+        not contactable.
+    """
+    http = session_pool.get(speaker.ip_address) if use_session_pool else requests
+    start = time.monotonic()
+    try:
+        response = http.get(
+            "http://" + speaker.ip_address + ":1400/xml/device_description.xml",
+            timeout=timeout,
+        )
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        _LOG.debug("%s is not contactable", speaker.ip_address)
+        return None
+    rtt = time.monotonic() - start
+    _LOG.debug("%s is contactable (%.3fs)", speaker.ip_address, rtt)
+    return rtt
+
+
+def _find_ip_addresses_to_scan(networks_to_scan, min_netmask):
+    """Return the set of IP addresses to scan for Sonos devices.
+
+    Args:
+        networks_to_scan (list): A `list` of IPv4 networks to search, each a
+            `str` of form "192.168.0.1/24", or `None` to search the attached
+            networks.
+        min_netmask (int): The minimum netmask to be used for the attached
+            networks.
+
+    Returns:
+        set: A set of `ipaddress.IPv4Address` instances.
+    """
+    ip_set = set()
+    if networks_to_scan:
+        for network_to_scan in networks_to_scan:
             try:
-                # Try getting a device property
-                _ = speaker.is_visible
-                _LOG.debug("%s is contactable", speaker.ip_address)
-                contactable_speakers.add(speaker)
-            # The exception is unimportant
-            # pylint: disable=bare-except
-            except:  # noqa: E722
-                _LOG.debug("%s is not contactable", speaker.ip_address)
-
-    contactable_speakers = set()
-    if speakers is None:
-        return contactable_speakers
-
-    # Attempt to create one thread per speaker
-    thread_list = []
-    for _ in range(len(speakers)):
-        thread = threading.Thread(target=contactable_worker)
+                network = ipaddress.IPv4Network(network_to_scan, False)
+            except ValueError:
+                _LOG.debug("'%s' is not a valid IPv4 network", network_to_scan)
+                # Ignore the error and continue processing the list
+                continue
+            ip_set.update(set(network))
+    else:
+        for network in _find_ipv4_networks(min_netmask):
+            ip_set.update(set(network))
+    return ip_set
+
+
+def _read_neighbour_table(path=None):
+    """Read the IPv4 neighbour (ARP) table.
+
+    Args:
+        path (str, optional): The path of the table, in the format of
+            Linux's ``/proc/net/arp``. Defaults to `NEIGHBOUR_TABLE`.
+
+    Returns:
+        dict: A dict mapping each IP address (`str`) with a known hardware
+        address to that address, in lower case. Empty if the table can't
+        be read, e.g. on other operating systems.
+    """
+    neighbours = {}
+    try:
+        with open(path or NEIGHBOUR_TABLE, encoding="ascii") as table:
+            lines = table.readlines()[1:]
+    except (OSError, ValueError):
+        return neighbours
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
         try:
-            thread.start()
-            thread_list.append(thread)
-        except RuntimeError:
-            # Can't create any more threads
-            _LOG.warning("Failed to create a new thread")
-            break
+            flags = int(fields[2], 16)
+        except ValueError:
+            _LOG.debug("Skipping unexpected neighbour table line: %r", line)
+            continue
+        # Flags of 0x0 mark incomplete entries
+        if flags == 0:
+            continue
+        ip_address, mac_address = fields[0], fields[3].lower()
+        if mac_address != "00:00:00:00:00:00":
+            neighbours[ip_address] = mac_address
+    return neighbours
+
+
+def _order_ip_addresses_to_scan(ip_set, neighbours=None):
+    """Order a set of IP addresses so that those most likely to belong to
+    Sonos devices are scanned first.
+
+    Addresses in the neighbour table whose hardware addresses have a Sonos
+    prefix come first, then the other addresses in the neighbour table, which
+    have recently been active, then the rest.
 
-    for thread in thread_list:
-        thread.join()
+    Args:
+        ip_set (set): The `ipaddress.IPv4Address` instances to scan.
+        neighbours (dict, optional): The neighbour table, as returned by
+            `_read_neighbour_table`, which is read if this is `None`.
+
+    Returns:
+        _AddressQueue: The addresses, in order.
+    """
+    if neighbours is None:
+        neighbours = _read_neighbour_table()
+
+    def priority(ip_addr):
+        mac_address = neighbours.get(str(ip_addr))
+        if mac_address is None:
+            return 2
+        return 0 if mac_address[:8] in SONOS_OUIS else 1
+
+    ordered = sorted(ip_set, key=lambda ip_addr: (priority(ip_addr), ip_addr))
+    _LOG.debug(
+        "Scanning %d neighbours first",
+        sum(1 for ip_addr in ip_set if str(ip_addr) in neighbours),
+    )
+    return _AddressQueue(ordered)
+
+
+class _AddressQueue:
+    """The IP addresses to be scanned, in the order in which to scan them.
+
+    This offers the ``pop``, ``add`` and ``clear`` methods of a set, which
+    `_sonos_scan_worker_thread` uses, but ``pop`` returns the addresses in
+    order, and ``add`` returns an address to the front of the queue.
+    """
 
-    return contactable_speakers
+    def __init__(self, addresses):
+        self._addresses = deque(addresses)
+
+    def pop(self):
+        """Remove and return the next address.
+
+        Raises:
+            KeyError: if there are no addresses left.
+        """
+        try:
+            return self._addresses.popleft()
+        except IndexError:
+            raise KeyError("pop from an empty address queue") from None
+
+    def add(self, address):
+        """Return an address to the front of the queue."""
+        self._addresses.appendleft(address)
+
+    def clear(self):
+        """Remove all the addresses."""
+        self._addresses.clear()
+
+    def __len__(self):
+        return len(self._addresses)
+
+    def __iter__(self):
+        return iter(self._addresses)
 
 
 def _find_ipv4_networks(min_netmask):
@@ -724,6 +1104,15 @@ def _is_sonos(ip_address):
         return False
 
 
+class _FoundQueue(queue.Queue):
+    """A queue to which `_sonos_scan_worker_thread` can add the addresses it
+    finds, as it does to a list."""
+
+    def append(self, item):
+        """Put an item into the queue."""
+        self.put(item)
+
+
 def _sonos_scan_worker_thread(
     ip_set, socket_timeout, sonos_ip_addresses, multi_household
 ):
@@ -0,0 +1,535 @@
+"""This module contains asyncio versions of functions in `soco.discovery`.
+
+It requires the `aiohttp` package, like `soco.events_asyncio`. The
+functions make no blocking calls and start no threads: searches use an
+`asyncio.DatagramProtocol`, and devices are probed and queried over
+non-blocking connections.
+
+Example:
+
+    Find the zones in the household of the first speaker to respond, and
+    scan the attached networks for Sonos devices::
+
+        import asyncio
+        from soco import discovery_asyncio
+
+        async def main():
+            zones = await discovery_asyncio.discover()
+            kitchen = await discovery_asyncio.by_name("Kitchen")
+            scanned = await discovery_asyncio.scan_network()
+
+        asyncio.run(main())
+"""
+
+import asyncio
+import logging
+import socket
+
+from . import config
+from .discovery import (
+    _find_ip_addresses_to_scan,
+    _find_ipv4_addresses,
+    _order_ip_addresses_to_scan,
+)
+from .ssdp import (
+    MCAST_GRP,
+    MCAST_PORT,
+    PLAYER_SEARCH,
+    SEARCH_REPEATS,
+    create_search_socket,
+    parse_ssdp_message,
+)
+from .utils import really_utf8
+
+_LOG = logging.getLogger(__name__)
+
+#: The default maximum number of addresses probed at the same time.
+DEFAULT_MAX_CONCURRENCY = 256
+
+
+class _SearchProtocol(asyncio.DatagramProtocol):
+    """Put the responses to a search which contain a string into a queue."""
+
+    def __init__(self, household_id, responses):
+        self.household_id = really_utf8(household_id)
+        self.responses = responses
+
+    def datagram_received(self, data, addr):
+        _LOG.debug('Received discovery response from %s: "%s"', addr, data)
+        if self.household_id in data:
+            self.responses.put_nowait((data, addr))
+
+    def error_received(self, exc):
+        _LOG.debug("Discovery socket error: %s", exc)
+
+
+async def discover(
+    timeout=5,
+    include_invisible=False,
+    interface_addr=None,
+    household_id="Sonos",
+    allow_network_scan=False,
+    **network_scan_kwargs,
+):
+    """Discover Sonos zones on the local network.
+
+    This is the `asyncio` counterpart of `soco.discovery.discover`, and
+    returns the same results, except that `config.DISCOVERY_CACHE
+    <soco.config.DISCOVERY_CACHE>` is not used.
+
+    Args:
+        timeout (int, optional): wait for this many seconds, at most.
+            Defaults to 5.
+        include_invisible (bool, optional): include invisible zones in the
+            return set. Defaults to `False`.
+        interface_addr (str or None): The network interface address to use
+            as the source of the search. See `soco.discovery.discover`.
+        household_id (str): Supply a Sonos Household ID to restrict discovery
+            to a specific household. In the default case the first player to
+            respond will be used.
+        allow_network_scan (bool, optional): If normal discovery fails, fall
+            back to a scan of the attached network(s) to detect Sonos
+            devices.
+        **network_scan_kwargs: Arguments for the `scan_network` function.
+            See its docstring for details.
+
+    Returns:
+        set: a set of `SoCo` instances, one for each zone found, or else
+        `None`.
+    """
+    # pylint: disable=import-outside-toplevel,protected-access
+    from aiohttp import ClientSession
+
+    zone = await _search(timeout, interface_addr, household_id)
+    if zone is not None:
+        async with ClientSession() as session:
+            zone_group_state = await _fetch_zone_group_state(zone, session)
+        if include_invisible:
+            return zone_group_state.all_zones.copy()
+        return zone_group_state.visible_zones.copy()
+
+    if allow_network_scan:
+        _LOG.debug("Falling back to network scan discovery")
+        if household_id == "Sonos":
+            return await scan_network(
+                include_invisible=include_invisible, **network_scan_kwargs
+            )
+        network_scan_kwargs["multi_household"] = True
+        zones = await scan_network(
+            include_invisible=include_invisible, **network_scan_kwargs
+        )
+        if zones:
+            zones = {
+                zone for zone in zones if household_id in (zone._household_id or "")
+            }
+        return zones
+    return None
+
+
+async def any_soco(allow_network_scan=False, **network_scan_kwargs):
+    """Return any visible soco device, for when it doesn't matter which.
+
+    This is the `asyncio` counterpart of `soco.discovery.any_soco`. An
+    existing instance is returned if it is known to be visible without
+    contacting it, otherwise `discover` is used.
+
+    Args:
+        allow_network_scan (bool, optional): If normal discovery fails, fall
+            back to a scan of the attached network(s) to detect Sonos
+            devices.
+        **network_scan_kwargs: Arguments for the `scan_network` function.
+            See its docstring for details.
+
+    Returns:
+        SoCo: A `SoCo` instance (or subclass if `config.SOCO_CLASS` is set),
+        or `None` if no instances are found.
+    """
+    cls = config.SOCO_CLASS
+    # pylint: disable=no-member, protected-access
+    for device in cls._instances.get(cls._class_group, {}).values():
+        zone_group_state = cls.zone_group_states.get(device._household_id)
+        if zone_group_state is not None and device in zone_group_state.visible_zones:
+            return device
+
+    devices = await discover(
+        allow_network_scan=allow_network_scan, **network_scan_kwargs
+    )
+    return None if devices is None else devices.pop()
+
+
+async def by_name(name, allow_network_scan=False, **network_scan_kwargs):
+    """Return a device by name.
+
+    This is the `asyncio` counterpart of `soco.discovery.by_name`.
+
+    Args:
+        name (str): The name of the device to return.
+        allow_network_scan (bool, optional): If normal discovery fails, fall
+            back to a scan of the attached network(s) to detect Sonos
+            devices.
+        **network_scan_kwargs: Arguments for the `scan_network` function.
+            See its docstring for details.
+
+    Returns:
+        SoCo: A `SoCo` instance (or subclass if `config.SOCO_CLASS` is set),
+        or `None` if no instances are found.
+    """
+    devices = await discover(
+        allow_network_scan=allow_network_scan, **network_scan_kwargs
+    )
+    if devices is None:
+        return None
+
+    for device in devices:
+        # The name was set from the zone group state by discover
+        if device._player_name == name:  # pylint: disable=protected-access
+            return device
+    return None
+
+
+async def _search(timeout, interface_addr, household_id):
+    """Search for Sonos devices, and return the first to respond.
+
+    Returns:
+        SoCo: A `SoCo` instance for the device, with its household ID set
+        from the response, or `None` if none responds within the timeout.
+    """
+    if interface_addr is not None:
+        try:
+            _ = socket.inet_aton(interface_addr)
+        except OSError as e:
+            raise ValueError(
+                f"{interface_addr} is not a valid IP address string"
+            ) from e
+        addresses = {interface_addr}
+    else:
+        addresses = _find_ipv4_addresses()
+        if len(addresses) == 0:
+            _LOG.debug("No interfaces available for discovery")
+            return None
+    _LOG.debug("Sending discovery packets on interface(s) %s", addresses)
+
+    loop = asyncio.get_running_loop()
+    responses = asyncio.Queue()
+    transports = []
+    try:
+        for address in addresses:
+            try:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _SearchProtocol(household_id, responses),
+                    sock=create_search_socket(address),
+                )
+            except OSError as e:
+                _LOG.warning(
+                    "Can't make a discovery socket for %s: %s: %s",
+                    address,
+                    e.__class__.__name__,
+                    e,
+                )
+                continue
+            transports.append(transport)
+
+        # Send a few times to each socket. UDP is unreliable
+        for _ in range(SEARCH_REPEATS):
+            for transport in transports:
+                transport.sendto(really_utf8(PLAYER_SEARCH), (MCAST_GRP, MCAST_PORT))
+        if not transports:
+            _LOG.debug("Sending failed on all interfaces")
+            return None
+
+        try:
+            data, addr = await asyncio.wait_for(responses.get(), timeout)
+        except asyncio.TimeoutError:
+            _LOG.debug("Discovery timeout")
+            return None
+    finally:
+        for transport in transports:
+            transport.close()
+
+    zone = config.SOCO_CLASS(addr[0])
+    _, headers = parse_ssdp_message(data)
+    # pylint: disable=protected-access
+    if zone._household_id is None:
+        zone._household_id = headers.get("X-RINCON-HOUSEHOLD")
+    return zone
+
+
+async def scan_network(
+    include_invisible=False,
+    multi_household=False,
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    scan_timeout=0.5,
+    min_netmask=24,
+    networks_to_scan=None,
+):
+    """Scan all attached networks for Sonos devices.
+
+    This is the `asyncio` counterpart of `soco.discovery.scan_network`, and
+    returns the same results. Instead of threads, up to ``max_concurrency``
+    addresses are probed at once with non-blocking connections, and the
+    zone group topology of the devices found is fetched without blocking.
+
+    Args:
+        include_invisible (bool, optional): Whether to include invisible Sonos
+            devices in the set of devices returned.
+        multi_household (bool, optional): Whether to find all the speakers on
+            the network exhaustively. If `False`, scanning stops as soon as a
+            speaker is found.
+        max_concurrency (int, optional): The maximum number of addresses to
+            probe at the same time. Each probe needs a file handle, but no
+            thread, so this can be much higher than ``max_threads`` if the
+            file handle limit allows.
+        scan_timeout (float, optional): The network timeout in seconds to use
+            when checking each IP address for a Sonos device.
+        min_netmask (int, optional): The minimum number of netmask bits. Used
+            to constrain the network search space.
+        networks_to_scan (list, optional): A `list` of IPv4 networks to
+            search, each a `str` of form "192.168.0.1/24". Only the specified
+            networks will be searched. The 'min_netmask' option (if supplied)
+            is ignored.
+
+    Returns:
+        set: A set of `SoCo` instances, one for each zone found, or else
+        `None`.
+    """
+    # aiohttp is an optional dependency, so only import it when needed
+    # pylint: disable=import-outside-toplevel
+    from aiohttp import ClientSession
+
+    ip_set = _order_ip_addresses_to_scan(
+        _find_ip_addresses_to_scan(networks_to_scan, min_netmask)
+    )
+    async with ClientSession() as session:
+        sonos_ip_addresses = await _scan_ip_addresses(
+            ip_set, session, max_concurrency, scan_timeout, multi_household
+        )
+        if not sonos_ip_addresses:
+            _LOG.debug("No Sonos zones discovered")
+            return None
+
+        zones = set()
+        seen = set()
+        for ip_address in sonos_ip_addresses:
+            zone = config.SOCO_CLASS(ip_address)
+            # Any other device in a household which has already been
+            # queried would return the same topology
+            if zone not in seen:
+                zone_group_state = await _fetch_zone_group_state(zone, session)
+                seen.update(zone_group_state.all_zones)
+                if include_invisible:
+                    zones.update(zone_group_state.all_zones)
+                else:
+                    zones.update(zone_group_state.visible_zones)
+            if not multi_household:
+                break
+
+    _LOG.debug(
+        "Include_invisible: %s | multi_household: %s | %d Zones: %s",
+        include_invisible,
+        multi_household,
+        len(zones),
+        zones,
+    )
+    return zones
+
+
+async def scan_network_iter(
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    scan_timeout=0.5,
+    min_netmask=24,
+    networks_to_scan=None,
+):
+    """Scan all attached networks for Sonos devices, yielding each as soon as
+    it is found.
+
+    This is the `asyncio` counterpart of `soco.discovery.scan_network_iter`.
+    Every address is checked, and a `SoCo` instance is yielded for each Sonos
+    device as soon as it is confirmed. Closing the iterator, e.g. by
+    breaking out of an ``async for`` loop, stops the scan.
+
+    Args:
+        max_concurrency (int, optional): The maximum number of addresses to
+            probe at the same time.
+        scan_timeout (float, optional): The network timeout in seconds to use
+            when checking each IP address for a Sonos device.
+        min_netmask (int, optional): The minimum number of netmask bits. Used
+            to constrain the network search space.
+        networks_to_scan (list, optional): A `list` of IPv4 networks to
+            search, each a `str` of form "192.168.0.1/24". Only the specified
+            networks will be searched.
+
+    Yields:
+        SoCo: A `SoCo` instance for each Sonos device found.
+    """
+    # pylint: disable=import-outside-toplevel
+    from aiohttp import ClientSession
+
+    ip_set = _order_ip_addresses_to_scan(
+        _find_ip_addresses_to_scan(networks_to_scan, min_netmask)
+    )
+    found = asyncio.Queue()
+    async with ClientSession() as session:
+        scan = asyncio.ensure_future(
+            _scan_ip_addresses(
+                ip_set,
+                session,
+                max_concurrency,
+                scan_timeout,
+                True,
+                on_found=found.put_nowait,
+            )
+        )
+        # Mark the end of the results
+        scan.add_done_callback(lambda _: found.put_nowait(None))
+        try:
+            while True:
+                ip_address = await found.get()
+                if ip_address is None:
+                    break
+                yield config.SOCO_CLASS(ip_address)
+            # Raise any exception from the scan
+            await scan
+        finally:
+            if not scan.done():
+                scan.cancel()
+                try:
+                    await scan
+                except asyncio.CancelledError:
+                    pass
+
+
+async def _scan_ip_addresses(
+    ip_set, session, max_concurrency, scan_timeout, multi_household, on_found=None
+):
+    """Probe a set of addresses for Sonos devices.
+
+    If ``on_found`` is given, it is called with each IP address as soon as a
+    Sonos device is confirmed there.
+
+    Returns:
+        list: The IP addresses (`str`) at which Sonos devices were found, in
+        the order in which they were found.
+    """
+    sonos_ip_addresses = []
+    ip_addresses = iter(ip_set)
+    tasks = []
+
+    async def worker():
+        # The iterator is shared by all the workers, which is safe because
+        # they all run in the same thread
+        for ip_addr in ip_addresses:
+            ip_address = str(ip_addr)
+            while True:
+                try:
+                    check = await _check_ip_and_port(ip_address, 1400, scan_timeout)
+                    break
+                except OSError:
+                    # With high concurrency, we can exceed the file handle
+                    # limit. Wait for other probes to release theirs.
+                    await asyncio.sleep(0.1)
+            if not check:
+                continue
+            _LOG.debug("Found open port 1400 at IP '%s'", ip_address)
+            if not await _is_sonos(ip_address, session):
+                _LOG.debug("'%s' is not a Sonos device", ip_address)
+                continue
+            _LOG.debug("Confirmed Sonos device at IP '%s'", ip_address)
+            sonos_ip_addresses.append(ip_address)
+            if on_found is not None:
+                on_found(ip_address)
+            if not multi_household:
+                # Stop all the other workers
+                for task in tasks:
+                    if task is not asyncio.current_task():
+                        task.cancel()
+                return
+
+    tasks.extend(
+        asyncio.ensure_future(worker())
+        for _ in range(min(max_concurrency, len(ip_set)))
+    )
+    _LOG.debug("Created %d scanner tasks", len(tasks))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return sonos_ip_addresses
+
+
+async def _check_ip_and_port(ip_address, port, timeout):
+    """Check whether a TCP port is open, without blocking.
+
+    Args:
+        ip_address(str): The IP address to be checked.
+        port(int): The port to be checked.
+        timeout(float): The timeout to use.
+
+    Returns:
+        bool: True if a connection can be made.
+
+    Raises:
+        OSError: if a socket cannot be created.
+    """
+    loop = asyncio.get_running_loop()
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as socket_:
+        socket_.setblocking(False)
+        try:
+            await asyncio.wait_for(
+                loop.sock_connect(socket_, (ip_address, port)), timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        return True
+
+
+async def _is_sonos(ip_address, session):
+    """Check whether a Sonos device is at an address, by fetching its device
+    description.
+
+    Args:
+        ip_address(str): The IP address to be checked.
+        session(`aiohttp.ClientSession`): The session to use.
+
+    Returns:
+        bool: True if there is a Sonos device at the address.
+    """
+    # pylint: disable=import-outside-toplevel
+    from aiohttp import ClientError, ClientTimeout
+
+    url = f"http://{ip_address}:1400/xml/device_description.xml"
+    try:
+        async with session.get(
+            url, timeout=ClientTimeout(total=config.REQUEST_TIMEOUT)
+        ) as response:
+            if response.status != 200:
+                return False
+            description = await response.text()
+    except (ClientError, asyncio.TimeoutError, UnicodeDecodeError):
+        return False
+    return "<manufacturer>Sonos, Inc.</manufacturer>" in description
+
+
+async def _fetch_zone_group_state(zone, session):
+    """Fetch and process the zone group topology known to a device.
+
+    Returns:
+        ZoneGroupState: The zone group state of the device's household.
+    """
+    # pylint: disable=protected-access
+    if zone._household_id is None:
+        response = await zone.deviceProperties.async_.GetHouseholdID(
+            [], session=session
+        )
+        zone._household_id = response["CurrentHouseholdID"]
+    response = await zone.zoneGroupTopology.async_.GetZoneGroupState(
+        [], session=session
+    )
+    zone_group_state = zone.zone_group_state
+    zone_group_state.process_payload(
+        payload=response["ZoneGroupState"], source="poll", source_ip=zone.ip_address
+    )
+    # Fetching the household ID of each zone would block
+    for member in zone_group_state.all_zones:
+        if member._household_id is None:
+            member._household_id = zone._household_id
+    return zone_group_state
@@ -0,0 +1,305 @@
+"""This module contains a persistent cache of the Sonos devices found by
+discovery.
+
+`soco.discovery.discover` searches the network every time it is called, which
+takes at least a second, and the process starts from nothing each time.
+A `DiscoveryCache` records the speakers found, in a JSON file, so that the
+next process can start from a file read. The speakers returned from the cache
+are checked in the background, and the ones which are no longer where they
+were recorded are dropped, so that the following discovery searches the
+network again.
+
+Example:
+
+    Use the cache in the default location for all discovery::
+
+        from soco import config, discovery
+        from soco.discovery_cache import DiscoveryCache
+
+        config.DISCOVERY_CACHE = DiscoveryCache.from_config_file()
+        zones = discovery.discover()
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from os import path, makedirs
+
+import appdirs
+import requests
+
+from . import config
+from .xml import XML
+
+_LOG = logging.getLogger(__name__)
+
+#: The version of the cache file format.
+CACHE_VERSION = 1
+
+DEVICE_NS = "{urn:schemas-upnp-org:device-1-0}"
+
+
+class DiscoveryCache:
+    """A cache of the speakers found by discovery, persisted in a JSON file.
+
+    Each entry is a dict, keyed by the speaker's UID, with the keys
+    ``ip_address``, ``uid``, ``household_id``, ``player_name``,
+    ``model_name``, ``is_visible`` and ``last_seen`` (seconds since the
+    epoch). Any value except ``ip_address`` and ``uid`` may be `None` if it
+    is not known.
+    """
+
+    def __init__(self, filepath, validation_timeout=2.0):
+        """
+        Args:
+            filepath (str): The path of the cache file. It need not exist.
+            validation_timeout (float): The timeout in seconds for each
+                request made when validating the entries.
+        """
+        self.filepath = filepath
+        self.validation_timeout = validation_timeout
+        self._lock = threading.Lock()
+        self._validator = None
+        self._entries = self._load()
+
+    @classmethod
+    def from_config_file(cls, **kwargs):
+        """Load from the file in the config directory location used by
+        `soco.music_services.token_store.JsonFileTokenStore`.
+
+        Args:
+            **kwargs: Other arguments for `DiscoveryCache`.
+        """
+        config_dir = appdirs.user_config_dir("SoCo", "SoCoGroup")
+        config_file = path.join(config_dir, "discovery_cache.json")
+        return cls(config_file, **kwargs)
+
+    @property
+    def entries(self):
+        """dict: A copy of the entries, keyed by UID."""
+        with self._lock:
+            return {uid: dict(entry) for uid, entry in self._entries.items()}
+
+    def _load(self):
+        """Read the entries from the cache file."""
+        try:
+            with open(self.filepath, encoding="UTF-8") as file_:
+                content = json.load(file_)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as error:
+            _LOG.warning("Ignoring discovery cache %s: %s", self.filepath, error)
+            return {}
+        if not isinstance(content, dict) or content.get("version") != CACHE_VERSION:
+            _LOG.debug("Ignoring discovery cache %s of another version", self.filepath)
+            return {}
+        return content.get("zones", {})
+
+    def save(self):
+        """Write the entries to the cache file.
+
+        The file is replaced atomically, so that other processes never read
+        a partly written file. Failures are logged rather than raised, since
+        the cache is only an optimisation.
+        """
+        with self._lock:
+            content = {"version": CACHE_VERSION, "zones": self._entries}
+            folder = path.dirname(self.filepath)
+            temp_file = f"{self.filepath}.{os.getpid()}.tmp"
+            try:
+                if folder and not path.exists(folder):
+                    makedirs(folder)
+                with open(temp_file, "w", encoding="UTF-8") as file_:
+                    json.dump(content, file_, indent=4)
+                os.replace(temp_file, self.filepath)
+            except OSError as error:
+                _LOG.warning("Can't save discovery cache %s: %s", self.filepath, error)
+
+    def clear(self):
+        """Remove all the entries, and the cache file."""
+        with self._lock:
+            self._entries = {}
+            try:
+                os.remove(self.filepath)
+            except FileNotFoundError:
+                pass
+
+    def record(self, zones, visible_zones=None, household_id=None):
+        """Record the speakers in a household, and save the cache.
+
+        Only the information which the `SoCo` instances already hold is
+        recorded, so this makes no network requests.
+
+        Args:
+            zones (set): The `SoCo` instances for all the speakers in the
+                household.
+            visible_zones (set, optional): Those of ``zones`` which are
+                visible. If `None`, all of them are taken to be visible.
+            household_id (str, optional): The household's ID. If given,
+                any other entries for the household are removed, since
+                ``zones`` is all of it.
+        """
+        # pylint: disable=protected-access
+        now = time.time()
+        with self._lock:
+            if household_id is not None:
+                self._entries = {
+                    uid: entry
+                    for uid, entry in self._entries.items()
+                    if entry["household_id"] != household_id
+                }
+            for zone in zones:
+                if zone._uid is None:
+                    continue
+                previous = self._entries.get(zone._uid, {})
+                self._entries[zone._uid] = {
+                    "ip_address": zone.ip_address,
+                    "uid": zone._uid,
+                    "household_id": household_id
+                    or zone._household_id
+                    or previous.get("household_id"),
+                    "player_name": zone._player_name,
+                    "model_name": zone.speaker_info.get("model_name")
+                    or previous.get("model_name"),
+                    "is_visible": visible_zones is None or zone in visible_zones,
+                    "last_seen": now,
+                }
+        self.save()
+
+    def zones(self, household_id=None, include_invisible=False):
+        """Return the cached speakers in a household.
+
+        Args:
+            household_id (str, optional): The household to return, which is
+                matched as a substring of the household ID, as in
+                `soco.discovery.discover`. If `None`, the household of the
+                speaker seen most recently is returned.
+            include_invisible (bool, optional): Whether to include invisible
+                speakers.
+
+        Returns:
+            set: A set of `SoCo` instances, which is empty if no speakers
+            are cached for the household.
+        """
+        entries = list(self.entries.values())
+        if not entries:
+            return set()
+        if household_id is None:
+            household = max(entries, key=lambda entry: entry["last_seen"])[
+                "household_id"
+            ]
+            entries = [entry for entry in entries if entry["household_id"] == household]
+        else:
+            entries = [
+                entry
+                for entry in entries
+                if household_id in (entry["household_id"] or "")
+            ]
+        return {
+            self._zone(entry)
+            for entry in entries
+            if include_invisible or entry["is_visible"]
+        }
+
+    def by_name(self, name, household_id=None):
+        """Return the cached visible speaker with a name.
+
+        Args:
+            name (str): The name of the speaker.
+            household_id (str, optional): Only return a speaker in this
+                household, matched as in `zones`.
+
+        Returns:
+            SoCo: A `SoCo` instance, or `None` if no such speaker is cached.
+        """
+        for entry in self.entries.values():
+            if entry["player_name"] != name or not entry["is_visible"]:
+                continue
+            if household_id is None or household_id in (entry["household_id"] or ""):
+                return self._zone(entry)
+        return None
+
+    @staticmethod
+    def _zone(entry):
+        """Return the `SoCo` instance for an entry, and give it the cached
+        attributes which it does not already have."""
+        # pylint: disable=protected-access
+        zone = config.SOCO_CLASS(entry["ip_address"])
+        if zone._uid is None:
+            zone._uid = entry["uid"]
+        if zone._household_id is None:
+            zone._household_id = entry["household_id"]
+        if zone._player_name is None:
+            zone._player_name = entry["player_name"]
+        return zone
+
+    def validate(self):
+        """Check that each cached speaker is still at its address.
+
+        The device description of each speaker is fetched. Entries for
+        speakers which don't answer, or for which another speaker answers,
+        are removed, and the others are brought up to date. The cache is
+        then saved.
+
+        Returns:
+            set: The UIDs of the entries removed.
+        """
+        removed = set()
+        for uid, entry in self.entries.items():
+            description = self._fetch_description(entry["ip_address"])
+            with self._lock:
+                if uid not in self._entries:
+                    continue
+                if description is None or description["uid"] != uid:
+                    _LOG.debug(
+                        "Dropping %s at %s from the discovery cache",
+                        uid,
+                        entry["ip_address"],
+                    )
+                    del self._entries[uid]
+                    removed.add(uid)
+                else:
+                    self._entries[uid].update(
+                        player_name=description["player_name"],
+                        model_name=description["model_name"],
+                        last_seen=time.time(),
+                    )
+        self.save()
+        return removed
+
+    def validate_in_background(self):
+        """Run `validate` in a daemon thread, unless it is already running."""
+        with self._lock:
+            if self._validator is not None and self._validator.is_alive():
+                return
+            self._validator = threading.Thread(
+                target=self.validate, name="DiscoveryCacheValidator", daemon=True
+            )
+            self._validator.start()
+
+    def _fetch_description(self, ip_address):
+        """Fetch the device description of a speaker.
+
+        Returns:
+            dict: The ``uid``, ``player_name`` and ``model_name`` of the
+            speaker, or `None` if it can't be fetched.
+        """
+        try:
+            response = requests.get(
+                "http://" + ip_address + ":1400/xml/device_description.xml",
+                timeout=self.validation_timeout,
+            )
+            response.raise_for_status()
+            device = XML.fromstring(response.content).find(DEVICE_NS + "device")
+        except (requests.exceptions.RequestException, XML.ParseError):
+            return None
+        if device is None:
+            return None
+        udn = device.findtext(DEVICE_NS + "UDN") or ""
+        return {
+            "uid": udn[5:] if udn.startswith("uuid:") else udn,
+            "player_name": device.findtext(DEVICE_NS + "roomName"),
+            "model_name": device.findtext(DEVICE_NS + "modelName"),
+        }
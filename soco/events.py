@@ -51,19 +51,28 @@ Example:
 """
 
 import errno
+import functools
+import heapq
+import itertools
 import logging
+import random
+import selectors
+import socket
 import socketserver
 import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
 
 from http.server import BaseHTTPRequestHandler
-from urllib.error import URLError
 from urllib.request import urlopen
 
 import requests
 
 # Event is imported so that 'from events import Events' still works
 # pylint: disable=unused-import
-from .events_base import Event  # noqa: F401
+from .events_base import Event, EventQueue  # noqa: F401
 
 from .events_base import (
     EventNotifyHandlerBase,
@@ -72,17 +81,331 @@ from .events_base import (
     SubscriptionsMap,
 )
 
+from . import config
 from .exceptions import SoCoException
 
 log = logging.getLogger(__name__)  # pylint: disable=C0103
 
 
+class SequenceBuffer:
+    """Delivers the events of each subscription in order of their sequence
+    numbers, without making the threads which receive them wait.
+
+    A Sonos device waits for the response to one event before sending the
+    next, so its events normally arrive in order. If they arrive on
+    different connections, though, and so are handled on different threads,
+    one may overtake another. An event whose sequence number is ahead of the
+    next one expected for its subscription is held back, and is delivered
+    once the events in between have been delivered, or after
+    `config.EVENT_ORDER_TIMEOUT` seconds if they do not arrive.
+
+    The events of a subscription are delivered one at a time, by whichever
+    thread added the event which allowed them to be delivered. A thread
+    which adds an event that has to be held back returns at once.
+    """
+
+    #: `int`: The number of subscriptions tracked, beyond which the one
+    #: with the oldest event is forgotten.
+    MAX_SUBSCRIPTIONS = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # The state of each subscription ID, in order of the last event
+        self._subscriptions = OrderedDict()
+        # Breaks ties between events with the same sequence number
+        self._counter = itertools.count()
+
+    def add(self, sid, seq, deliver, timeout=None):
+        """Add an event, delivering it when its turn comes.
+
+        Args:
+            sid (str): The subscription ID of the event.
+            seq (str): The sequence number of the event.
+            deliver (callable): Called without arguments to deliver the
+                event.
+            timeout (float, optional): The time for which the event may be
+                held back for earlier ones. If `None`,
+                `config.EVENT_ORDER_TIMEOUT` is used.
+        """
+        if timeout is None:
+            timeout = config.EVENT_ORDER_TIMEOUT
+        try:
+            seq = int(seq)
+        except (TypeError, ValueError):
+            seq = None
+        if seq is None or not timeout:
+            deliver()
+            return
+        with self._lock:
+            state = self._subscriptions.get(sid)
+            if state is None:
+                state = self._subscriptions[sid] = _SequenceState()
+                if len(self._subscriptions) > self.MAX_SUBSCRIPTIONS:
+                    _, forgotten = self._subscriptions.popitem(last=False)
+                    if forgotten.timer is not None:
+                        forgotten.timer.cancel()
+            self._subscriptions.move_to_end(sid)
+            state.timeout = timeout
+            heapq.heappush(state.pending, (seq, next(self._counter), deliver))
+            if state.delivering:
+                return
+            state.delivering = True
+        self._deliver(sid, state)
+
+    def _deliver(self, sid, state):
+        """Deliver the events of a subscription which are due, in order."""
+        while True:
+            with self._lock:
+                if not state.pending or (
+                    state.next_seq is not None and state.pending[0][0] > state.next_seq
+                ):
+                    state.delivering = False
+                    if not state.pending:
+                        if state.timer is not None:
+                            state.timer.cancel()
+                            state.timer = None
+                    elif state.timer is None:
+                        state.timer = threading.Timer(
+                            state.timeout, self._skip_gap, args=(sid, state)
+                        )
+                        state.timer.daemon = True
+                        state.timer.start()
+                    return
+                seq, _, deliver = heapq.heappop(state.pending)
+                if state.next_seq is None or seq >= state.next_seq:
+                    state.next_seq = seq + 1
+            try:
+                deliver()
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Error delivering event %s of %s", seq, sid)
+
+    def _skip_gap(self, sid, state):
+        """Stop waiting for missing events, and deliver the ones after them."""
+        with self._lock:
+            state.timer = None
+            if not state.pending or state.pending[0][0] <= state.next_seq:
+                return
+            log.debug("Gave up waiting for event %s of %s", state.next_seq, sid)
+            state.next_seq = state.pending[0][0]
+            if state.delivering:
+                return
+            state.delivering = True
+        self._deliver(sid, state)
+
+
+class _SequenceState:  # pylint: disable=too-few-public-methods
+    """The events of one subscription, as tracked by `SequenceBuffer`."""
+
+    def __init__(self):
+        # The next sequence number to deliver, or None before the first
+        self.next_seq = None
+        # A heap of (seq, count, deliver) entries which have been held back
+        self.pending = []
+        # Whether a thread is delivering this subscription's events
+        self.delivering = False
+        # The threading.Timer which will stop waiting for missing events
+        self.timer = None
+        self.timeout = None
+
+
 class EventServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     """A TCP server which handles each new request in a new thread."""
 
     allow_reuse_address = True
 
 
+class PooledEventServer(socketserver.TCPServer):
+    """A TCP server which handles requests on a fixed number of worker
+    threads.
+
+    Accepted connections wait in a queue for a free worker. When ``backlog``
+    connections are waiting, the server stops accepting connections, so
+    that further ones wait in the operating system's listen queue, which is
+    also ``backlog`` long. A connection which has been accepted, but for
+    which there is still no room in the queue after `queue_timeout` seconds,
+    is answered with ``503 Service Unavailable`` and closed, so that the
+    server thread is never blocked for long and can always be stopped.
+
+    A connection which is kept alive does not hold on to a worker between
+    requests. Once its request has been handled, it is watched by a selector
+    thread, and is queued for a worker again when the next request arrives.
+    It is closed if no request arrives for
+    `config.EVENT_SERVER_KEEPALIVE_TIMEOUT` seconds.
+    """
+
+    allow_reuse_address = True
+    #: `float`: The time for which an accepted connection may wait for room
+    #: in the queue before it is refused.
+    queue_timeout = 0.5
+
+    def __init__(self, server_address, handler_class, workers=4, backlog=16):
+        """
+        Args:
+            server_address (tuple): The (ip, port) address on which to listen.
+            handler_class (type): The request handler class, normally
+                `PooledEventNotifyHandler`.
+            workers (int, optional): The number of worker threads.
+            backlog (int, optional): The number of connections which may wait
+                for a worker.
+        """
+        self.request_queue_size = backlog
+        super().__init__(server_address, handler_class)
+        #: `SequenceBuffer`: Orders the events of each subscription.
+        self.sequence_buffer = SequenceBuffer()
+        self._connections = Queue()
+        self._slots = threading.BoundedSemaphore(workers + backlog)
+        # Handlers of kept-alive connections, waiting to be watched by the
+        # selector thread, which is woken by writing to _wakeup
+        self._to_park = []
+        self._park_lock = threading.Lock()
+        self._closing = False
+        self._wakeup, self._woken = socket.socketpair()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._woken, selectors.EVENT_READ)
+        self._threads = [
+            threading.Thread(
+                target=self._work, name=f"EventServerWorker-{number}", daemon=True
+            )
+            for number in range(workers)
+        ]
+        self._threads.append(
+            threading.Thread(
+                target=self._watch, name="EventServerSelector", daemon=True
+            )
+        )
+        for thread in self._threads:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        """Queue a connection for a worker, waiting for a while if too many
+        are queued, and refusing it if there is still no room."""
+        # pylint: disable=consider-using-with
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            log.warning("Event server is busy. Refusing %s", client_address)
+            try:
+                request.sendall(
+                    b"HTTP/1.1 503 Service Unavailable\r\n"
+                    b"Content-Length: 0\r\nConnection: close\r\n\r\n"
+                )
+                # Discard the request which has arrived, since closing a
+                # socket with unread data resets the connection, and the
+                # response may be lost
+                request.setblocking(False)
+                while request.recv(65536):
+                    pass
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self._connections.put((request, client_address))
+
+    def finish_request(self, request, client_address):
+        """Handle the first request of a connection, and return the
+        handler."""
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def _work(self):
+        """Handle queued connections until the server is closed."""
+        while True:
+            connection = self._connections.get()
+            if connection is None:
+                return
+            if isinstance(connection, tuple):
+                # A new connection
+                request, client_address = connection
+                try:
+                    handler = self.finish_request(request, client_address)
+                except Exception:  # pylint: disable=broad-except
+                    self.handle_error(request, client_address)
+                    self.shutdown_request(request)
+                    continue
+                finally:
+                    self._slots.release()
+            else:
+                # The next request on a kept-alive connection
+                handler = connection
+                try:
+                    handler.handle()
+                    handler.finish()
+                except Exception:  # pylint: disable=broad-except
+                    self.handle_error(handler.request, handler.client_address)
+                    self._close(handler)
+                    continue
+            if handler.close_connection:
+                self.shutdown_request(handler.request)
+            else:
+                self._park(handler)
+
+    def _park(self, handler):
+        """Hand a kept-alive connection to the selector thread."""
+        with self._park_lock:
+            if not self._closing:
+                self._to_park.append(handler)
+                self._wakeup.send(b"\0")
+                return
+        self._close(handler)
+
+    def _close(self, handler):
+        """Close a kept-alive connection."""
+        handler.close_connection = True
+        handler.finish()
+        self.shutdown_request(handler.request)
+
+    def _watch(self):
+        """Queue kept-alive connections for a worker when their next request
+        arrives, until the server is closed."""
+        while True:
+            keepalive = config.EVENT_SERVER_KEEPALIVE_TIMEOUT
+            timeout = None
+            if keepalive is not None:
+                parked = [
+                    key.data[1]
+                    for key in self._selector.get_map().values()
+                    if key.data is not None
+                ]
+                if parked:
+                    timeout = max(0, min(parked) + keepalive - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    self._woken.recv(4096)
+                    continue
+                self._selector.unregister(key.fileobj)
+                self._connections.put(key.data[0])
+            with self._park_lock:
+                to_park, self._to_park = self._to_park, []
+                closing = self._closing
+            now = time.monotonic()
+            for handler in to_park:
+                self._selector.register(
+                    handler.connection, selectors.EVENT_READ, (handler, now)
+                )
+            for key in list(self._selector.get_map().values()):
+                if key.data is None:
+                    continue
+                handler, parked = key.data
+                if closing or (keepalive is not None and now - parked >= keepalive):
+                    self._selector.unregister(key.fileobj)
+                    self._close(handler)
+            if closing:
+                with self._park_lock:
+                    self._wakeup.close()
+                self._woken.close()
+                self._selector.close()
+                return
+
+    def server_close(self):
+        """Stop listening, close the idle connections, and stop the workers
+        once they are idle."""
+        super().server_close()
+        with self._park_lock:
+            if self._closing:
+                return
+            self._closing = True
+            self._wakeup.send(b"\0")
+        for _ in range(len(self._threads) - 1):
+            self._connections.put(None)
+
+
 class EventNotifyHandler(BaseHTTPRequestHandler, EventNotifyHandlerBase):
     """Handles HTTP ``NOTIFY`` Verbs sent to the listener server.
     Inherits from `soco.events_base.EventNotifyHandlerBase`.
@@ -122,6 +445,72 @@ class EventNotifyHandler(BaseHTTPRequestHandler, EventNotifyHandlerBase):
         log.debug(fmt, *args)
 
 
+class PooledEventNotifyHandler(EventNotifyHandler):
+    """Handles ``NOTIFY`` requests for a `PooledEventServer`.
+
+    Connections are kept alive with HTTP/1.1. Each call to `handle` handles
+    the requests which have already arrived, and then returns, so that the
+    server can watch the connection for the next one without tying up a
+    worker thread. Events are delivered through the server's
+    `SequenceBuffer`.
+    """
+
+    # Sonos devices may send several events over one connection
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, *args, **kwargs):
+        # Give up on a request which has not fully arrived after this long
+        self.timeout = config.EVENT_SERVER_KEEPALIVE_TIMEOUT
+        super().__init__(*args, **kwargs)
+
+    def handle(self):
+        """Handle the requests which have arrived on the connection."""
+        self.close_connection = True
+        try:
+            self.handle_one_request()
+            while not self.close_connection and self._request_buffered():
+                self.handle_one_request()
+        except Exception:
+            self.close_connection = True
+            raise
+
+    def finish(self):
+        """Flush the response, and close the connection's files unless it is
+        kept alive."""
+        if self.close_connection:
+            super().finish()
+        elif not self.wfile.closed:
+            self.wfile.flush()
+
+    def _request_buffered(self):
+        """Return whether the next request has already been read into the
+        buffer of `rfile`, where the selector would not see it."""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def do_NOTIFY(self):  # pylint: disable=invalid-name
+        """Serve a ``NOTIFY`` request by passing the headers and content to
+        the server's `SequenceBuffer`, which calls `handle_notification`
+        when the event's turn comes.
+        """
+        headers = requests.structures.CaseInsensitiveDict(self.headers)
+        content_length = int(headers["content-length"])
+        content = self.rfile.read(content_length)
+        self.server.sequence_buffer.add(
+            headers.get("sid"),
+            headers.get("seq"),
+            functools.partial(self.handle_notification, headers, content),
+        )
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
 class EventServerThread(threading.Thread):
     """The thread in which the event listener server will run."""
 
@@ -148,6 +537,7 @@ class EventServerThread(threading.Thread):
         # Listen for events until told to stop
         while not self.stop_flag.is_set():
             self.server.handle_request()
+        self.server.server_close()
 
     def stop(self):
         """Stop the server."""
@@ -193,7 +583,15 @@ class EventListener(EventListenerBase):
         ):
             address = (ip_address, port_number)
             try:
-                server = EventServer(address, EventNotifyHandler)
+                if config.EVENT_SERVER_WORKERS:
+                    server = PooledEventServer(
+                        address,
+                        PooledEventNotifyHandler,
+                        workers=config.EVENT_SERVER_WORKERS,
+                        backlog=config.EVENT_SERVER_BACKLOG,
+                    )
+                else:
+                    server = EventServer(address, EventNotifyHandler)
                 break
             except OSError as oserror:
                 if oserror.errno == errno.EADDRINUSE:
@@ -220,9 +618,9 @@ class EventListener(EventListenerBase):
         try:
             # pylint: disable=R1732
             urlopen(f"http://{address[0]}:{address[1]}/")
-        except URLError:
+        except OSError:
             # If the server is already shut down, we receive a socket error,
-            # which we ignore.
+            # or the connection is reset, which we ignore.
             pass
         # wait for the thread to finish, with a timeout of one second
         # to ensure the main thread does not hang
@@ -232,6 +630,129 @@ class EventListener(EventListenerBase):
             log.warning("Event Listener did not shutdown gracefully.")
 
 
+class RenewalScheduler:
+    """Renews subscriptions automatically, on one scheduler thread.
+
+    Subscriptions made with ``auto_renew=True`` are kept in a heap, ordered
+    by when they are next due to be renewed. A single thread sleeps until
+    the first is due, and hands it to a pool of up to
+    `config.AUTO_RENEW_WORKERS` threads to be renewed, so that a slow or
+    unreachable device does not hold up the renewal of the others. A
+    subscription is scheduled again once its renewal has finished.
+
+    Each renewal is brought forward by a random fraction of its interval,
+    up to `config.AUTO_RENEW_JITTER`, so that subscriptions made at the same
+    time are renewed at different times.
+
+    The threads are started when the first subscription is scheduled.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        # Entries of [due, count, subscription, interval], where due is a
+        # time.monotonic() time, and count breaks ties. The subscription of
+        # a cancelled entry is set to None, and the entry is discarded when
+        # it reaches the top of the heap.
+        self._heap = []
+        # The entry of each scheduled subscription, which is not in the heap
+        # while the subscription is being renewed
+        self._entries = {}
+        self._counter = itertools.count()
+        self._thread = None
+        self._executor = None
+
+    def __len__(self):
+        with self._condition:
+            return len(self._entries)
+
+    def schedule(self, subscription, interval):
+        """Renew a subscription every ``interval`` seconds, less jitter,
+        until it is cancelled.
+
+        Args:
+            subscription (Subscription): The subscription to renew.
+            interval (float): The time (in seconds) between renewals.
+        """
+        with self._condition:
+            self._cancel(subscription)
+            entry = [None, None, subscription, interval]
+            self._entries[subscription] = entry
+            self._push(entry)
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=config.AUTO_RENEW_WORKERS,
+                    thread_name_prefix="soco-renew",
+                )
+                self._thread = threading.Thread(
+                    target=self._run, name="SubscriptionRenewer", daemon=True
+                )
+                self._thread.start()
+
+    def cancel(self, subscription):
+        """Stop renewing a subscription.
+
+        A renewal which has already started is allowed to finish.
+
+        Args:
+            subscription (Subscription): The subscription.
+        """
+        with self._condition:
+            self._cancel(subscription)
+
+    def _cancel(self, subscription):
+        """Cancel the entry of a subscription. The lock must be held."""
+        entry = self._entries.pop(subscription, None)
+        if entry is not None:
+            entry[2] = None
+
+    def _push(self, entry):
+        """Put an entry in the heap, due one interval, less jitter, from now.
+        The lock must be held."""
+        jitter = config.AUTO_RENEW_JITTER * random.random()
+        entry[0] = time.monotonic() + entry[3] * (1 - jitter)
+        entry[1] = next(self._counter)
+        heapq.heappush(self._heap, entry)
+        self._condition.notify()
+
+    def _next_due(self):
+        """Wait for the next entry to fall due, and return it. The lock must
+        be held."""
+        while True:
+            while self._heap and self._heap[0][2] is None:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._condition.wait()
+                continue
+            delay = self._heap[0][0] - time.monotonic()
+            if delay <= 0:
+                return heapq.heappop(self._heap)
+            self._condition.wait(delay)
+
+    def _run(self):
+        """Hand renewals to the pool as they fall due."""
+        while True:
+            with self._condition:
+                entry = self._next_due()
+            try:
+                self._executor.submit(self._renew, entry)
+            except RuntimeError:
+                # The interpreter is shutting down
+                return
+
+    def _renew(self, entry):
+        """Renew the subscription of an entry, and schedule it again."""
+        subscription = entry[2]
+        if subscription is None:
+            return
+        try:
+            subscription.renew(is_autorenew=True, strict=False)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Error auto renewing subscription %s", subscription.sid)
+        with self._condition:
+            if entry[2] is not None:
+                self._push(entry)
+
+
 class Subscription(SubscriptionBase):
     """A class representing the subscription to a UPnP event.
     Inherits from `soco.events_base.SubscriptionBase`.
@@ -244,18 +765,19 @@ class Subscription(SubscriptionBase):
                  should be made.
             event_queue (:class:`~queue.Queue`): A queue on which received
                 events will be put. If not specified, a queue will be
-                created and used.
+                created and used. See `soco.events_base.EventQueue` for a
+                queue which can be bounded and can coalesce events.
         """
         super().__init__(service, event_queue)
-        # Used to keep track of the auto_renew thread
-        self._auto_renew_thread = None
-        self._auto_renew_thread_flag = threading.Event()
         # The SubscriptionsMap instance created when this module is imported.
         # This is referenced by soco.events_base.SubscriptionBase.
         self.subscriptions_map = subscriptions_map
         # The EventListener instance created when this module is imported.
         # This is referenced by soco.events_base.SubscriptionBase.
         self.event_listener = event_listener
+        # The RenewalScheduler instance created when this module is
+        # imported, which renews all auto renewed subscriptions.
+        self.renewal_scheduler = renewal_scheduler
         # Used to stop race conditions, as autorenewal may occur from a thread
         self._lock = threading.Lock()
 
@@ -339,35 +861,12 @@ class Subscription(SubscriptionBase):
         return self._wrap(unsubscribe, strict)
 
     def _auto_renew_start(self, interval):
-        """Starts the auto_renew thread."""
-
-        class AutoRenewThread(threading.Thread):
-            """Used by the auto_renew code to renew a subscription from within
-            a thread.
-            """
-
-            def __init__(self, interval, stop_flag, sub, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                self.interval = interval
-                self.subscription = sub
-                self.stop_flag = stop_flag
-                self.daemon = True
-
-            def run(self):
-                subscription = self.subscription
-                stop_flag = self.stop_flag
-                interval = self.interval
-                while not stop_flag.wait(interval):
-                    subscription.renew(is_autorenew=True, strict=False)
-
-        auto_renew_thread = AutoRenewThread(
-            interval, self._auto_renew_thread_flag, self
-        )
-        auto_renew_thread.start()
+        """Schedules auto renewal with the `RenewalScheduler`."""
+        self.renewal_scheduler.schedule(self, interval)
 
     def _auto_renew_cancel(self):
-        """Cancels the auto_renew thread"""
-        self._auto_renew_thread_flag.set()
+        """Cancels auto renewal."""
+        self.renewal_scheduler.cancel(self)
 
     # pylint: disable=no-self-use
     def _request(self, method, url, headers, success, unconditional=None):
@@ -485,3 +984,4 @@ class Subscription(SubscriptionBase):
 
 subscriptions_map = SubscriptionsMap()  # pylint: disable=C0103
 event_listener = EventListener()  # pylint: disable=C0103
+renewal_scheduler = RenewalScheduler()  # pylint: disable=C0103
@@ -14,115 +14,297 @@ import socket
 import time
 import threading
 import weakref
-from queue import Queue
+from queue import Full, Queue
+
+from lxml import etree as LXML
 
 from . import config
 from .data_structures_entry import from_didl_string
 from .exceptions import SoCoException, SoCoFault, EventParseException
 from .utils import camel_to_underscore
-from .xml import XML
 
 log = logging.getLogger(__name__)  # pylint: disable=C0103
 
 
+# The tag of each property of an event, which holds one evented variable
+PROPERTY_TAG = "{urn:schemas-upnp-org:event-1-0}property"
+
+# The tags of the element which holds the variables in a LastChange event,
+# in order of preference. The InstanceID is in one of two namespaces,
+# depending on whether it is an avTransport or a renderingControl event, and
+# a Queue event has a QueueID instead. We assume there is only one of these.
+# This is true for Sonos, as far as we know.
+LAST_CHANGE_INSTANCE_TAGS = {
+    "{urn:schemas-upnp-org:metadata-1-0/AVT/}InstanceID": 0,
+    "{urn:schemas-upnp-org:metadata-1-0/RCS/}InstanceID": 1,
+    "{urn:schemas-sonos-com:metadata-1-0/Queue/}QueueID": 2,
+}
+
+_parsers = threading.local()  # pylint: disable=invalid-name
+
+
+def _event_parser():
+    """Return this thread's parser for event bodies.
+
+    lxml parsers must not be used by two threads at once. Comments and
+    processing instructions are dropped, as `xml.etree.ElementTree` does, so
+    that only elements are iterated over.
+    """
+    parser = getattr(_parsers, "parser", None)
+    if parser is None:
+        # pylint: disable=c-extension-no-member
+        parser = _parsers.parser = LXML.XMLParser(
+            remove_comments=True,
+            remove_pis=True,
+            resolve_entities=False,
+        )
+    return parser
+
+
+@lru_cache(maxsize=1024)
+def variable_name(tag):
+    """Return the name of an evented variable, given its XML tag.
+
+    Any namespace is removed, and the name is converted from camel case,
+    eg ``{urn:schemas-rinconnetworks-com:metadata-1-0/}NextTrackURI``
+    becomes ``next_track_uri``. The results are memoized, since the same
+    few dozen tags occur in every event.
+
+    Args:
+        tag (str): The tag.
+
+    Returns:
+        str: The variable name.
+    """
+    if tag.startswith("{"):
+        tag = tag.split("}", 1)[1]
+    return camel_to_underscore(tag)
+
+
+class _LazyDidl:
+    """A DIDL-Lite string in an event, which is only parsed when needed."""
+
+    __slots__ = ("tag", "raw", "_value")
+
+    def __init__(self, tag, raw):
+        self.tag = tag
+        self.raw = raw
+        self._value = None
+
+    def resolve(self):
+        """Return the `DidlObject`, or a `SoCoFault` if the metadata can't be
+        parsed, parsing it the first time."""
+        if self._value is None:
+            self._value = _parse_didl(self.tag, self.raw)
+        return self._value
+
+    def __repr__(self):
+        return f"<lazy DIDL-Lite {self.tag} {self.raw[:40]!r}...>"
+
+
+def _parse_didl(tag, value):
+    """Convert DIDL metadata to a music library data structure.
+
+    Any parsing exception is wrapped in a `SoCoFault`, so the user can handle
+    it.
+    """
+    try:
+        return from_didl_string(value)[0]
+    except SoCoException as original_exception:
+        log.debug(
+            "Event contains illegal metadata"
+            "for '%s'.\n"
+            "Error message: '%s'\n"
+            "The result will be a SoCoFault.",
+            tag,
+            str(original_exception),
+        )
+        event_parse_exception = EventParseException(tag, value, original_exception)
+        return SoCoFault(event_parse_exception)
+
+
+class EventVariables(dict):
+    """The evented variables of an `Event`, keyed by name.
+
+    DIDL-Lite metadata, such as ``current_track_meta_data``, is only parsed
+    into a `DidlObject` (or a `SoCoFault`, if it can't be parsed) when the
+    variable is first read, by indexing, `get`, `items`, `values`, `pop`,
+    `copy` or conversion to a plain `dict`, since most consumers of events
+    never read it. The unparsed string is available from `raw`.
+    """
+
+    def _resolve(self, key, value):
+        """Return a value, parsing and storing it if it is lazy."""
+        if isinstance(value, _LazyDidl):
+            value = value.resolve()
+            dict.__setitem__(self, key, value)
+        return value
+
+    def raw(self, key, default=None):
+        """Return the value of a variable, without parsing DIDL-Lite metadata.
+
+        Args:
+            key (str): The name of the variable.
+            default: The value to return if there is no such variable.
+
+        Returns:
+            The unparsed string of DIDL-Lite metadata which has not been
+            read yet, or else the value.
+        """
+        value = dict.get(self, key, default)
+        if isinstance(value, _LazyDidl):
+            return value.raw
+        return value
+
+    def merge(self, variables):
+        """Merge in the variables of a later event, without parsing DIDL-Lite
+        metadata.
+
+        Values which are dicts of channels, such as ``volume``, are merged,
+        since they may be evented one channel at a time. Other values are
+        replaced.
+
+        Args:
+            variables (dict): The variables.
+        """
+        for key, value in EventVariables.raw_items(variables):
+            previous = dict.get(self, key)
+            if isinstance(value, dict) and isinstance(previous, dict):
+                value = {**previous, **value}
+            dict.__setitem__(self, key, value)
+
+    def raw_items(self):
+        """Return the ``(name, value)`` pairs without parsing DIDL-Lite
+        metadata which has not been read yet, for copying into another
+        `EventVariables`.
+
+        Returns:
+            list: The pairs.
+        """
+        return list(dict.items(self))
+
+    def __getitem__(self, key):
+        return self._resolve(key, dict.__getitem__(self, key))
+
+    def __iter__(self):
+        # Overriding this stops dict() and {**...} copying the lazy values
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(key, self[key]) for key in list(dict.keys(self))]
+
+    def values(self):
+        return [self[key] for key in list(dict.keys(self))]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            dict.__delitem__(self, key)
+            return value
+        return dict.pop(self, key, *default)
+
+    def copy(self):
+        return EventVariables(self.raw_items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def _parse_last_change(last_change, result):
+    """Add the variables of a LastChange event to a result."""
+    # pylint: disable=c-extension-no-member
+    last_change_tree = LXML.fromstring(last_change.encode("utf-8"), _event_parser())
+    instance = None
+    preference = len(LAST_CHANGE_INSTANCE_TAGS)
+    for element in last_change_tree:
+        rank = LAST_CHANGE_INSTANCE_TAGS.get(element.tag, preference)
+        if rank < preference:
+            instance, preference = element, rank
+    if instance is None:
+        return
+    # Look at each variable within the LastChange event
+    for last_change_var in instance:
+        tag = variable_name(last_change_var.tag)
+        # Now extract the relevant value for the variable. The UPnP specs
+        # suggest that the value of any variable evented via a LastChange
+        # Event will be in the 'val' attribute, but audio related variables
+        # may also have a 'channel' attribute. In addition, it seems that
+        # Sonos sometimes uses a text value instead: see
+        # http://forums.sonos.com/showthread.php?t=34663
+        value = last_change_var.get("val")
+        if value is None:
+            value = last_change_var.text
+        channel = last_change_var.get("channel")
+        # If DIDL metadata is returned, convert it to a music library data
+        # structure, when it is first read
+        if value is not None and value.startswith("<DIDL-Lite"):
+            if channel is None:
+                value = _LazyDidl(tag, value)
+            else:
+                value = _parse_didl(tag, value)
+        if channel is not None:
+            if result.get(tag) is None:
+                result[tag] = {}
+            result[tag][channel] = value
+        else:
+            result[tag] = value
+
+
 @lru_cache()
 def parse_event_xml(xml_event):
     """Parse the body of a UPnP event.
 
+    The body is parsed with lxml in a single pass over the properties, and
+    the variable names are looked up with `variable_name`.
+
     Args:
         xml_event (bytes): bytes containing the body of the event encoded
-            with utf-8.
+            with utf-8. A `str` is also accepted.
 
     Returns:
-        dict: A dict with keys representing the evented variables. The
-        relevant value will usually be a string representation of the
+        EventVariables: A dict with keys representing the evented variables.
+        The relevant value will usually be a string representation of the
         variable's value, but may on occasion be:
 
         * a dict (eg when the volume changes, the value will itself be a
           dict containing the volume for each channel:
           :code:`{'Volume': {'LF': '100', 'RF': '100', 'Master': '36'}}`)
         * an instance of a `DidlObject` subclass (eg if it represents
-          track metadata).
+          track metadata), which is only created when the variable is read.
         * a `SoCoFault` (if a variable contains illegal metadata)
     """
 
-    result = {}
-    tree = XML.fromstring(xml_event)
-    # property values are just under the propertyset, which
-    # uses this namespace
-    properties = tree.findall("{urn:schemas-upnp-org:event-1-0}property")
-    for prop in properties:  # pylint: disable=too-many-nested-blocks
+    result = EventVariables()
+    if isinstance(xml_event, str):
+        xml_event = xml_event.encode("utf-8")
+    # pylint: disable=c-extension-no-member
+    tree = LXML.fromstring(xml_event, _event_parser())
+    # property values are just under the propertyset
+    for prop in tree:
+        if prop.tag != PROPERTY_TAG:
+            continue
         for variable in prop:
             # Special handling for a LastChange event specially. For details on
             # LastChange events, see
             # http://upnp.org/specs/av/UPnP-av-RenderingControl-v1-Service.pdf
             # and http://upnp.org/specs/av/UPnP-av-AVTransport-v1-Service.pdf
             if variable.tag == "LastChange":
-                last_change_tree = XML.fromstring(variable.text.encode("utf-8"))
-                # We assume there is only one InstanceID tag. This is true for
-                # Sonos, as far as we know.
-                # InstanceID can be in one of two namespaces, depending on
-                # whether we are looking at an avTransport event, a
-                # renderingControl event, or a Queue event
-                # (there, it is named QueueID)
-                instance = last_change_tree.find(
-                    "{urn:schemas-upnp-org:metadata-1-0/AVT/}InstanceID"
-                )
-                if instance is None:
-                    instance = last_change_tree.find(
-                        "{urn:schemas-upnp-org:metadata-1-0/RCS/}InstanceID"
-                    )
-                if instance is None:
-                    instance = last_change_tree.find(
-                        "{urn:schemas-sonos-com:metadata-1-0/Queue/}QueueID"
-                    )
-                # Look at each variable within the LastChange event
-                for last_change_var in instance:
-                    tag = last_change_var.tag
-                    # Remove any namespaces from the tags
-                    if tag.startswith("{"):
-                        tag = tag.split("}", 1)[1]
-                    # Un-camel case it
-                    tag = camel_to_underscore(tag)
-                    # Now extract the relevant value for the variable.
-                    # The UPnP specs suggest that the value of any variable
-                    # evented via a LastChange Event will be in the 'val'
-                    # attribute, but audio related variables may also have a
-                    # 'channel' attribute. In addition, it seems that Sonos
-                    # sometimes uses a text value instead: see
-                    # http://forums.sonos.com/showthread.php?t=34663
-                    value = last_change_var.get("val")
-                    if value is None:
-                        value = last_change_var.text
-                    # If DIDL metadata is returned, convert it to a music
-                    # library data structure
-                    if value is not None and value.startswith("<DIDL-Lite"):
-                        # Wrap any parsing exception in a SoCoFault, so the
-                        # user can handle it
-                        try:
-                            value = from_didl_string(value)[0]
-                        except SoCoException as original_exception:
-                            log.debug(
-                                "Event contains illegal metadata"
-                                "for '%s'.\n"
-                                "Error message: '%s'\n"
-                                "The result will be a SoCoFault.",
-                                tag,
-                                str(original_exception),
-                            )
-                            event_parse_exception = EventParseException(
-                                tag, value, original_exception
-                            )
-                            value = SoCoFault(event_parse_exception)
-                    channel = last_change_var.get("channel")
-                    if channel is not None:
-                        if result.get(tag) is None:
-                            result[tag] = {}
-                        result[tag][channel] = value
-                    else:
-                        result[tag] = value
+                _parse_last_change(variable.text, result)
             else:
-                result[camel_to_underscore(variable.tag)] = variable.text
+                result[variable_name(variable.tag)] = variable.text
     return result
 
 
@@ -181,6 +363,143 @@ class Event:
         raise TypeError("Event object does not support attribute assignment")
 
 
+class EventQueue(Queue):
+    """A queue for the events of subscriptions, which can be bounded, and can
+    merge the events of a subscription which have not been consumed yet.
+
+    Pass one as the ``event_queue`` of a subscription, for example::
+
+        queue = EventQueue(maxsize=100, overflow=EventQueue.DROP_OLDEST)
+        subscription = device.renderingControl.subscribe(event_queue=queue)
+
+    When the queue is full, a new event either waits for room, as with
+    `queue.Queue`, or replaces the oldest event in the queue. If the queue
+    coalesces events, an event for a subscription which already has one in
+    the queue is merged into that event instead of being added. The merged
+    event has the newest value of each variable, and the ``sid``, ``seq``,
+    ``service`` and ``timestamp`` of the newer event, so a consumer sees
+    the latest state without the intermediate steps.
+
+    The queue is thread-safe, and may be shared between subscriptions.
+    """
+
+    #: Wait for room when the queue is full.
+    BLOCK = "block"
+    #: Drop the oldest event in the queue when it is full.
+    DROP_OLDEST = "drop_oldest"
+
+    def __init__(self, maxsize=0, overflow=BLOCK, coalesce=False):
+        """
+        Args:
+            maxsize (int, optional): The maximum number of events in the
+                queue. If it is 0 or less, the queue is not bounded.
+            overflow (str, optional): What to do with a new event when the
+                queue is full: `BLOCK` or `DROP_OLDEST`.
+            coalesce (bool, optional): Whether to merge the events of each
+                subscription while they are in the queue.
+        """
+        if overflow not in (self.BLOCK, self.DROP_OLDEST):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.overflow = overflow
+        self.coalesce = coalesce
+        #: `int`: The number of events dropped because the queue was full.
+        self.dropped = 0
+        #: `int`: The number of events merged into events in the queue.
+        self.coalesced = 0
+        super().__init__(maxsize)
+
+    # The items are held in one item lists, so that a queued event can be
+    # replaced by a merged one, found by subscription ID in _by_sid.
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self._by_sid = {}
+
+    def _put(self, item):
+        holder = [item]
+        self.queue.append(holder)
+        sid = getattr(item, "sid", None)
+        if self.coalesce and sid is not None:
+            self._by_sid[sid] = holder
+
+    def _get(self):
+        holder = self.queue.popleft()
+        item = holder[0]
+        sid = getattr(item, "sid", None)
+        if self._by_sid.get(sid) is holder:
+            del self._by_sid[sid]
+        return item
+
+    def _merge(self, event):
+        """Merge an event into the queued event of its subscription, if there
+        is one. Must be called holding the queue's mutex.
+
+        Returns:
+            bool: Whether the event was merged.
+        """
+        holder = self._by_sid.get(getattr(event, "sid", None))
+        if holder is None:
+            return False
+        variables = EventVariables()
+        variables.merge(holder[0].variables)
+        variables.merge(event.variables)
+        holder[0] = Event(
+            event.sid, event.seq, event.service, event.timestamp, variables
+        )
+        return True
+
+    def _drop_oldest(self):
+        """Drop the oldest item. Must be called holding the queue's mutex."""
+        self._get()
+        self.dropped += 1
+        self.unfinished_tasks -= 1
+        if self.unfinished_tasks == 0:
+            self.all_tasks_done.notify_all()
+
+    def put(self, item, block=True, timeout=None):
+        """Put an event into the queue, or merge it into a queued one.
+
+        Takes the same arguments as `queue.Queue.put`, which apply if the
+        queue is full and its overflow policy is `BLOCK`.
+
+        Raises:
+            queue.Full: If the queue is full, and the event is not merged
+                and can't wait for room. It is counted as dropped.
+        """
+        with self.not_full:
+            if self.coalesce and self._merge(item):
+                self.coalesced += 1
+                return
+            if 0 < self.maxsize <= self._qsize():
+                if self.overflow == self.DROP_OLDEST:
+                    self._drop_oldest()
+                else:
+                    self._wait_for_room(block, timeout)
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _wait_for_room(self, block, timeout):
+        """Wait until the queue is not full, as `queue.Queue.put` does. Must
+        be called holding the queue's mutex."""
+        if not block:
+            self.dropped += 1
+            raise Full
+        if timeout is None:
+            while self._qsize() >= self.maxsize:
+                self.not_full.wait()
+            return
+        if timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+        endtime = time.monotonic() + timeout
+        while self._qsize() >= self.maxsize:
+            remaining = endtime - time.monotonic()
+            if remaining <= 0.0:
+                self.dropped += 1
+                raise Full
+            self.not_full.wait(remaining)
+
+
 class EventNotifyHandlerBase:
     """Base class for `soco.events.EventNotifyHandler` and
     `soco.events_twisted.EventNotifyHandler`.
@@ -340,7 +659,8 @@ class SubscriptionBase:
                  should be made.
             event_queue (:class:`~queue.Queue`): A queue on which received
                 events will be put. If not specified, a queue will be
-                created and used.
+                created and used. See `EventQueue` for a queue which can be
+                bounded and can coalesce events.
         """
         self.service = service
         #: `str`: A unique ID for this subscription
@@ -518,6 +838,8 @@ class SubscriptionBase:
                 self.timeout = int(timeout.lstrip("Second-"))
             self._timestamp = time.time()
             self.is_subscribed = True
+            # pylint: disable=protected-access
+            self.service._refresh_event_cache(self)
             log.debug(
                 "Renewed subscription to %s, sid: %s",
                 self.service.base_url + self.service.event_subscription_url,
@@ -654,6 +976,9 @@ class SubscriptionBase:
         self._has_been_unsubscribed = True
         self._timestamp = None
         self.service.soco.zone_group_state.remove_subscription(self)
+        # Anything cached from this subscription's events may now go stale
+        # pylint: disable=protected-access
+        self.service._clear_event_cache(self.sid)
         # Cancel any auto renew
         self._auto_renew_cancel()
         if msg:
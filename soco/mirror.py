@@ -0,0 +1,420 @@
+"""This module contains a class which keeps a local model of a speaker's
+playback and rendering state up to date from UPnP events.
+
+A dashboard which shows the state of many speakers would otherwise have to
+poll each of them. A `StateMirror` subscribes to the speaker's
+AVTransport, RenderingControl and Queue services, and answers reads from
+the evented state, without any network calls, for as long as the
+subscriptions are alive. If the events stop, for example because a renewal
+fails, reads fall back to polling the speaker and the subscriptions are
+re-established in the background of later reads.
+
+While a speaker is mirrored, the corresponding `SoCo` properties such as
+`SoCo.volume`, `SoCo.mute` and `SoCo.play_mode` are also answered from the
+evented state, since the services' caches are primed from the same events.
+
+Example:
+
+    Mirror a speaker, using the threaded events module::
+
+        import soco
+
+        device = soco.SoCo("192.168.1.101")
+        mirror = device.start_mirror()
+        print(mirror.transport_state, mirror.volume, mirror.track["uri"])
+        print(device.volume)  # No network call
+        device.stop_mirror()
+
+    With `soco.events_asyncio`, from within a running event loop::
+
+        mirror = await device.start_mirror().async_start()
+"""
+
+import asyncio
+import inspect
+import logging
+import threading
+from time import monotonic
+
+from . import config
+from .data_structures_entry import from_didl_string
+from .events_base import EventVariables
+from .exceptions import SoCoException, SoCoFault
+from .services import Queue
+
+log = logging.getLogger(__name__)  # pylint: disable=C0103
+
+#: The services which are mirrored, by the attribute name used for them on
+#: a `SoCo` instance.
+MIRRORED_SERVICES = ("avTransport", "renderingControl", "queue")
+
+#: The default number of seconds to wait between attempts to re-establish a
+#: subscription which has lapsed.
+DEFAULT_RETRY_INTERVAL = 30
+
+
+class StateMirror:
+    """A local model of a speaker's state, fed by event subscriptions.
+
+    Each property returns the evented value while the subscription to the
+    corresponding service is fresh, and otherwise polls the speaker. A
+    subscription is fresh once it is subscribed, its `time_left` has not run
+    out and its initial event has been received.
+
+    Event callbacks may arrive on other threads, so the model is protected
+    by a lock.
+    """
+
+    def __init__(
+        self, soco, requested_timeout=None, retry_interval=DEFAULT_RETRY_INTERVAL
+    ):
+        """
+        Args:
+            soco (SoCo): The speaker to mirror.
+            requested_timeout (int, optional): The subscription timeout to
+                request, in seconds. If `None`, the speaker's default is
+                used.
+            retry_interval (float, optional): The minimum number of seconds
+                between attempts to re-establish a lapsed subscription.
+        """
+        self.soco = soco
+        self.requested_timeout = requested_timeout
+        self.retry_interval = retry_interval
+        #: dict: The mirrored `Service` instances, keyed by name
+        self.services = {
+            "avTransport": soco.avTransport,
+            "renderingControl": soco.renderingControl,
+            "queue": Queue(soco),
+        }
+        #: dict: The current subscription for each service, keyed by name
+        self.subscriptions = {}
+        self._variables = {name: EventVariables() for name in self.services}
+        self._last_event = dict.fromkeys(self.services)
+        self._next_retry = dict.fromkeys(self.services, 0)
+        # Futures of scheduled subscription methods, under events_asyncio
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Subscribe to the mirrored services.
+
+        With `soco.events_asyncio`, this must be called from within a
+        running event loop, and `async_start` should be awaited instead.
+
+        Returns:
+            `StateMirror`: The mirror itself.
+        """
+        self._started = True
+        for name in self.services:
+            if name not in self.subscriptions:
+                self._subscribe(name, strict=True)
+        return self
+
+    async def async_start(self):
+        """Subscribe to the mirrored services, and wait for the subscriptions
+        to be made.
+
+        Returns:
+            `StateMirror`: The mirror itself.
+        """
+        self.start()
+        await self._wait_pending()
+        return self
+
+    def stop(self):
+        """Unsubscribe from the mirrored services, and forget the mirrored
+        state."""
+        self._started = False
+        with self._lock:
+            subscriptions = list(self.subscriptions.values())
+            self.subscriptions.clear()
+            for name in self.services:
+                self._variables[name] = EventVariables()
+                self._last_event[name] = None
+        for subscription in subscriptions:
+            subscription.callback = None
+            if subscription.is_subscribed:
+                self._schedule(subscription.unsubscribe(strict=False))
+
+    async def async_stop(self):
+        """Unsubscribe from the mirrored services, and wait for the
+        unsubscriptions to complete."""
+        self.stop()
+        await self._wait_pending()
+
+    def is_fresh(self, name):
+        """Whether the evented state of a service can be relied on.
+
+        Args:
+            name (str): The name of the service, one of `MIRRORED_SERVICES`.
+
+        Returns:
+            bool: `True` if the subscription to the service is subscribed,
+            has not expired and has delivered its initial event.
+        """
+        subscription = self.subscriptions.get(name)
+        if subscription is None or not subscription.is_subscribed:
+            return False
+        if self._last_event[name] is None:
+            return False
+        return subscription.timeout is None or subscription.time_left > 0
+
+    @property
+    def is_stale(self):
+        """bool: Whether any part of the mirrored state would be polled."""
+        return not all(self.is_fresh(name) for name in self.services)
+
+    @property
+    def time_left(self):
+        """float: The number of seconds until the first of the subscriptions
+        expires, or `None` if none of them expire. This is 0 if any
+        subscription is missing."""
+        remaining = []
+        for name in self.services:
+            subscription = self.subscriptions.get(name)
+            if subscription is None or not subscription.is_subscribed:
+                return 0
+            if subscription.timeout is not None:
+                remaining.append(subscription.time_left)
+        return min(remaining) if remaining else None
+
+    def get(self, name, variable, default=None):
+        """Get the latest evented value of a variable.
+
+        Args:
+            name (str): The name of the service, one of `MIRRORED_SERVICES`.
+            variable (str): The name of the variable, as it appears in
+                `Event.variables`, eg ``"transport_state"``.
+            default: The value to return if the variable is not known, or
+                the subscription is not fresh.
+
+        Returns:
+            The value of the variable. No network calls are made, but a
+            lapsed subscription may be re-established.
+        """
+        value, found = self._lookup(name, variable)
+        return value if found else default
+
+    @property
+    def transport_state(self):
+        """str: The transport state, eg ``'PLAYING'``."""
+        value, found = self._lookup("avTransport", "transport_state")
+        if found:
+            return value
+        return self.soco.get_current_transport_info()["current_transport_state"]
+
+    @property
+    def play_mode(self):
+        """str: The queue's play mode, eg ``'SHUFFLE'``."""
+        value, found = self._lookup("avTransport", "current_play_mode")
+        if found:
+            return value
+        return self.soco.play_mode
+
+    @property
+    def cross_fade(self):
+        """bool: The crossfade mode."""
+        value, found = self._lookup("avTransport", "current_crossfade_mode")
+        if found:
+            return bool(int(value))
+        return self.soco.cross_fade
+
+    @property
+    def track(self):
+        """dict: The current track, with the keys ``uri``, ``duration``,
+        ``playlist_position`` and ``metadata``.
+
+        ``metadata`` is a `DidlObject`, or `None` if there is no track or its
+        metadata cannot be parsed. The playback position is not evented, so
+        use `SoCo.get_current_track_info` for that.
+        """
+        with self._lock:
+            fresh = self.is_fresh("avTransport")
+            variables = self._variables["avTransport"]
+            if fresh and "current_track_uri" in variables:
+                metadata = variables.get("current_track_meta_data")
+                return {
+                    "uri": variables["current_track_uri"],
+                    "duration": variables.get("current_track_duration"),
+                    "playlist_position": variables.get("current_track"),
+                    "metadata": None if isinstance(metadata, SoCoFault) else metadata,
+                }
+        self._retry("avTransport")
+        info = self.soco.avTransport.GetPositionInfo(
+            [("InstanceID", 0), ("Channel", "Master")]
+        )
+        metadata = None
+        if info["TrackMetaData"].startswith("<DIDL-Lite"):
+            try:
+                metadata = from_didl_string(info["TrackMetaData"])[0]
+            except (SoCoException, IndexError):
+                log.debug("Could not parse track metadata for %s", self.soco)
+        return {
+            "uri": info["TrackURI"],
+            "duration": info["TrackDuration"],
+            "playlist_position": info["Track"],
+            "metadata": metadata,
+        }
+
+    @property
+    def volume(self):
+        """int: The speaker's volume."""
+        value, found = self._lookup("renderingControl", "volume")
+        if found and "Master" in value:
+            return int(value["Master"])
+        return self.soco.volume
+
+    @property
+    def mute(self):
+        """bool: The speaker's mute state."""
+        value, found = self._lookup("renderingControl", "mute")
+        if found and "Master" in value:
+            return bool(int(value["Master"]))
+        return self.soco.mute
+
+    @property
+    def bass(self):
+        """int: The speaker's bass EQ."""
+        value, found = self._lookup("renderingControl", "bass")
+        if found:
+            return int(value)
+        return self.soco.bass
+
+    @property
+    def treble(self):
+        """int: The speaker's treble EQ."""
+        value, found = self._lookup("renderingControl", "treble")
+        if found:
+            return int(value)
+        return self.soco.treble
+
+    @property
+    def loudness(self):
+        """bool: The speaker's loudness compensation."""
+        value, found = self._lookup("renderingControl", "loudness")
+        if found and "Master" in value:
+            return bool(int(value["Master"]))
+        return self.soco.loudness
+
+    @property
+    def queue_update_id(self):
+        """int: The update id of the queue, which changes whenever the queue
+        does."""
+        value, found = self._lookup("queue", "update_id")
+        if found:
+            return int(value)
+        response = self.services["queue"].Browse(
+            [("QueueID", 0), ("StartingIndex", 0), ("RequestedCount", 1)]
+        )
+        return int(response["UpdateID"])
+
+    def _lookup(self, name, variable):
+        """Look up an evented variable.
+
+        Returns:
+            tuple: a ``(value, found)`` tuple, where ``found`` is `False` if
+            the subscription is not fresh or the variable has not been
+            evented.
+        """
+        with self._lock:
+            if self.is_fresh(name):
+                variables = self._variables[name]
+                if variable in variables:
+                    return variables[variable], True
+        self._retry(name)
+        return None, False
+
+    def _on_event(self, event):
+        """Merge the variables of an event into the model."""
+        with self._lock:
+            for name, subscription in self.subscriptions.items():
+                if subscription.sid == event.sid:
+                    break
+            else:
+                # An event for a subscription which has been replaced
+                return
+            # Channel values such as volume may be evented one channel at a
+            # time, and metadata may never be read, so merge without parsing
+            self._variables[name].merge(event.variables)
+            self._last_event[name] = monotonic()
+
+    def _on_renew_fail(self, exception):
+        """Log a failed renewal. The mirror polls until it resubscribes."""
+        log.warning("Renewal of mirror subscription failed: %s", exception)
+
+    def _retry(self, name):
+        """Re-establish a lapsed subscription, at most once every
+        `retry_interval` seconds."""
+        if not self._started:
+            return
+        subscription = self.subscriptions.get(name)
+        if subscription is not None and subscription.is_subscribed:
+            if subscription.timeout is None or subscription.time_left > 0:
+                # Still waiting for the initial event
+                return
+        now = monotonic()
+        with self._lock:
+            if now < self._next_retry[name]:
+                return
+            self._next_retry[name] = now + self.retry_interval
+        log.debug("Resubscribing to %s for %s", name, self.soco)
+        try:
+            self._subscribe(name, strict=False)
+        except Exception as error:  # pylint: disable=broad-except
+            log.warning("Could not resubscribe to %s: %s", name, error)
+
+    def _subscribe(self, name, strict):
+        """Create, register and subscribe a subscription to a service."""
+        subscription = config.EVENTS_MODULE.Subscription(self.services[name])
+        # Set the callback before subscribing, so the initial event is not
+        # put on the subscription's queue instead
+        subscription.callback = self._on_event
+        subscription.auto_renew_fail = self._on_renew_fail
+        with self._lock:
+            old = self.subscriptions.get(name)
+            self.subscriptions[name] = subscription
+            self._last_event[name] = None
+        if old is not None:
+            old.callback = None
+            if old.is_subscribed:
+                self._schedule(old.unsubscribe(strict=False))
+        self._schedule(
+            subscription.subscribe(
+                requested_timeout=self.requested_timeout,
+                auto_renew=True,
+                strict=strict,
+            )
+        )
+
+    def _schedule(self, result):
+        """Keep track of the result of a subscription method, if it is
+        awaitable.
+
+        The future is forgotten, and any exception logged, once it is done,
+        so that resubscriptions made by reads do not accumulate.
+        """
+        if not inspect.isawaitable(result):
+            return
+        try:
+            future = asyncio.ensure_future(result)
+        except RuntimeError as error:
+            # A read made outside the event loop. Try again on a later read.
+            if inspect.iscoroutine(result):
+                result.close()
+            log.warning("Could not schedule subscription method: %s", error)
+            return
+        self._pending.add(future)
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        """Forget a completed subscription method, logging any exception."""
+        self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            log.warning("Mirror subscription method failed: %s", future.exception())
+
+    async def _wait_pending(self):
+        """Wait for all scheduled subscription methods to complete."""
+        pending, self._pending = self._pending, set()
+        if pending:
+            await asyncio.gather(*pending)
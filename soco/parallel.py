@@ -0,0 +1,162 @@
+"""This module contains functions for running the same call on many Sonos
+devices at once.
+
+Calls are run on a bounded pool of threads, so that one slow or unreachable
+speaker does not hold up the others.
+
+Example:
+
+    Get the volume of every zone, and the transport state of each zone as
+    soon as it is known::
+
+        import soco
+        from soco import parallel
+
+        zones = soco.discover()
+        volumes, errors = parallel.call_all(zones, "volume", timeout=2)
+        for result in parallel.as_completed(
+            zones, "get_current_transport_info", timeout=2
+        ):
+            if result.exception is None:
+                print(result.zone, result.value["current_transport_state"])
+"""
+
+import logging
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import monotonic
+
+_LOG = logging.getLogger(__name__)
+
+#: The default maximum number of calls which are made at the same time.
+DEFAULT_MAX_WORKERS = 16
+
+
+class CallResult(namedtuple("CallResultBase", "zone, value, exception")):
+    """The outcome of a call on one zone.
+
+    ``value`` is the return value of the call, or `None` if it raised
+    ``exception``. ``exception`` is `None` if the call succeeded.
+    """
+
+
+def _call(zone, method, args, kwargs):
+    """Call ``method`` on ``zone``.
+
+    ``method`` may be a callable, which is called with the zone as its
+    first argument, or the name of a method or property of the zone.
+    """
+    if callable(method):
+        return method(zone, *args, **kwargs)
+    # Looking up a property will fetch its value
+    attribute = getattr(zone, method)
+    if callable(attribute):
+        return attribute(*args, **kwargs)
+    if args or kwargs:
+        raise TypeError(f"'{method}' is not callable, so takes no arguments")
+    return attribute
+
+
+def as_completed(
+    zones, method, *args, max_workers=DEFAULT_MAX_WORKERS, timeout=None, **kwargs
+):
+    """Call a method on many zones in parallel, yielding each result as soon
+    as it is available.
+
+    Args:
+        zones (iterable): The `SoCo` instances on which to make the call.
+            Duplicates are only called once.
+        method (str or callable): The name of a method or property of
+            `SoCo`, eg ``"get_speaker_info"`` or ``"volume"``, or a
+            callable which takes a `SoCo` instance as its first argument.
+        *args: Positional arguments for the call.
+        max_workers (int, optional): The maximum number of calls to run at
+            the same time. Defaults to `DEFAULT_MAX_WORKERS`.
+        timeout (float, optional): The number of seconds which each call may
+            take, measured from the moment it starts. A call which takes
+            longer is reported with a `TimeoutError` and is no longer waited
+            for, though the thread running it cannot be interrupted. If
+            `None` (the default), wait for every call to finish.
+        **kwargs: Keyword arguments for the call.
+
+    Yields:
+        `CallResult`: a ``(zone, value, exception)`` namedtuple for each
+        zone, in order of completion.
+    """
+    zones = list(dict.fromkeys(zones))
+    if not zones:
+        return
+    started = {}
+
+    def task(zone):
+        started[zone] = monotonic()
+        return _call(zone, method, args, kwargs)
+
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, len(zones)), thread_name_prefix="soco-parallel"
+    )
+    futures = {executor.submit(task, zone): zone for zone in zones}
+    pending = set(futures)
+    try:
+        while pending:
+            wait_timeout = None
+            if timeout is not None:
+                now = monotonic()
+                deadlines = {
+                    future: started[futures[future]] + timeout
+                    for future in pending
+                    if futures[future] in started and not future.done()
+                }
+                for future, deadline in deadlines.items():
+                    if deadline <= now:
+                        pending.discard(future)
+                        _LOG.debug("Call to %s timed out", futures[future])
+                        yield CallResult(
+                            futures[future],
+                            None,
+                            TimeoutError(f"Call did not complete within {timeout}s"),
+                        )
+                if not pending:
+                    break
+                # Wake up when the next running call expires. If none is
+                # running yet, check again once a call could have expired.
+                running = [d for d in deadlines.values() if d > now]
+                wait_timeout = min(running) - now if running else timeout
+            done, pending = wait(
+                pending, timeout=wait_timeout, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                exception = future.exception()
+                value = None if exception is not None else future.result()
+                yield CallResult(futures[future], value, exception)
+    finally:
+        # Do not start calls which are no longer waited for, and do not wait
+        # for calls which have timed out
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def call_all(
+    zones, method, *args, max_workers=DEFAULT_MAX_WORKERS, timeout=None, **kwargs
+):
+    """Call a method on many zones in parallel, and wait for the results.
+
+    Takes the same arguments as `as_completed`.
+
+    Returns:
+        tuple: a ``(results, exceptions)`` tuple of dicts, keyed by zone.
+        ``results`` maps each zone whose call succeeded to the return value,
+        and ``exceptions`` maps each zone whose call failed or timed out to
+        the exception.
+    """
+    results = {}
+    exceptions = {}
+    for result in as_completed(
+        zones, method, *args, max_workers=max_workers, timeout=timeout, **kwargs
+    ):
+        if result.exception is None:
+            results[result.zone] = result.value
+        else:
+            exceptions[result.zone] = result.exception
+    return results, exceptions
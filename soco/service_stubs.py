@@ -0,0 +1,255 @@
+"""This module generates service stubs from UPnP service descriptions.
+
+The methods of a `soco.services.Service` are dispatched dynamically:
+the first call of each action builds a dispatcher for it, and every call
+finds the action in the service description to compose the arguments and
+renders the SOAP envelope from a template. A stub is a subclass of a service
+class with a method for each action in its service description, which has
+the arguments of the action as keyword arguments, with their defaults, and
+sends a `soco.services.PreparedAction`, whose envelope is rendered when the
+stub is generated.
+
+Example:
+
+    Generate stubs from the services of a speaker, and use them::
+
+        import soco
+        from soco import config
+        from soco.service_stubs import soco_services, write_module
+
+        device = soco.SoCo("192.168.1.101")
+        write_module("sonos_stubs.py", soco_services(device))
+
+        import sonos_stubs
+
+        config.SERVICE_STUBS = sonos_stubs
+
+    The methods can be called with keyword arguments, or with a list of
+    ``(name, value)`` tuples as before::
+
+        device.renderingControl.GetVolume(Channel="Master")
+
+    ``dev_tools/generate_service_stubs.py`` does the same from the command
+    line. Actions for which no method is generated, such as those with
+    argument names which are not valid Python identifiers, are still
+    dispatched dynamically.
+"""
+
+import keyword
+import logging
+import os
+
+_LOG = logging.getLogger(__name__)
+
+#: tuple: The names of the `soco.core.SoCo` attributes which are services.
+SOCO_SERVICES = (
+    "alarmClock",
+    "audioIn",
+    "avTransport",
+    "contentDirectory",
+    "deviceProperties",
+    "groupRenderingControl",
+    "musicServices",
+    "renderingControl",
+    "systemProperties",
+    "zoneGroupTopology",
+)
+
+# The names of the parameters of each stub method, which action arguments
+# can't use
+RESERVED_NAMES = frozenset(("self", "args", "cache", "cache_timeout", "kwargs"))
+
+# The Python types of the UPnP data types, for docstrings
+PYTHON_TYPES = {
+    "ui1": "int",
+    "ui2": "int",
+    "ui4": "int",
+    "i1": "int",
+    "i2": "int",
+    "i4": "int",
+    "int": "int",
+    "boolean": "bool",
+}
+
+HEADER = '''"""Sonos UPnP services with a method for each action.
+
+Generated by soco.service_stubs from the service descriptions of
+{description}. Do not edit.
+"""
+# pylint: skip-file
+# flake8: noqa
+
+{imports}
+from soco.services import REQUIRED, PreparedAction
+'''
+
+
+def soco_services(soco):
+    """Return the services of a `SoCo` instance, for `generate_module`.
+
+    Args:
+        soco (SoCo): The instance.
+
+    Returns:
+        list: The `soco.services.Service` instances in `SOCO_SERVICES`.
+    """
+    return [getattr(soco, name) for name in SOCO_SERVICES]
+
+
+def _is_usable_name(name):
+    """Whether a UPnP name can be used as a Python name in a stub."""
+    return (
+        name.isidentifier()
+        and not keyword.iskeyword(name)
+        and name not in RESERVED_NAMES
+    )
+
+
+def _escape_docstring(text):
+    """Make text safe to put in a triple quoted docstring."""
+    return text.replace("\\", "\\\\").replace('"""', '\\"\\"\\"')
+
+
+def _describe_argument(argument):
+    """Return the docstring line for an input argument."""
+    vartype = argument.vartype
+    python_type = PYTHON_TYPES.get(vartype.datatype, "str")
+    if vartype.list:
+        description = "One of {}.".format(
+            ", ".join(f"``{value}``" for value in vartype.list)
+        )
+    elif vartype.range:
+        description = "From {} to {}.".format(vartype.range[0], vartype.range[1])
+    else:
+        description = f"A UPnP ``{vartype.datatype}``."
+    return _escape_docstring(f"{argument.name} ({python_type}): {description}")
+
+
+def _prepared_name(service, action):
+    """Return the module level name of an action's `PreparedAction`."""
+    return f"_{service.__class__.__name__}_{action.name}"
+
+
+def _generate_method(service, action):
+    """Return the source of the stub method for an action."""
+    lines = [
+        f"    def {action.name}(",
+        "        self,",
+        "        args=None,",
+        "        cache=None,",
+        "        cache_timeout=None,",
+    ]
+    if action.in_args:
+        lines.append("        *,")
+    for argument in action.in_args:
+        if argument.name in service.DEFAULT_ARGS:
+            default = repr(service.DEFAULT_ARGS[argument.name])
+        else:
+            default = "REQUIRED"
+        lines.append(f"        {argument.name}={default},")
+    lines.append("        **kwargs,")
+    lines.append("    ):")
+    lines.append(f'        """{_escape_docstring(str(action))}')
+    if action.in_args:
+        lines.append("")
+        lines.append("        Args:")
+        for argument in action.in_args:
+            lines.append(f"            {_describe_argument(argument)}")
+    if action.out_args:
+        names = ", ".join(f"``{argument.name}``" for argument in action.out_args)
+        lines.append("")
+        lines.append("        Returns:")
+        lines.append(f"            dict: The values of {names}, as strings.")
+    lines.append('        """')
+    lines.append("        if args is None:")
+    composed = ", ".join(
+        f"({argument.name!r}, {argument.name})" for argument in action.in_args
+    )
+    lines.append(f"            args = [{composed}]")
+    lines.append("        return self.send_prepared(")
+    lines.append(
+        f"            {_prepared_name(service, action)}, args, cache, "
+        "cache_timeout, kwargs"
+    )
+    lines.append("        )")
+    return "\n".join(lines)
+
+
+def _generate_prepared(service, action):
+    """Return the source of the `PreparedAction` for an action."""
+    prepared = service.prepare_action(action)
+    values = "".join(f"    {value!r},\n" for value in prepared)
+    return f"{_prepared_name(service, action)} = PreparedAction(\n{values})"
+
+
+def _usable_actions(service):
+    """Return the actions of a service for which methods can be generated."""
+    usable = []
+    for action in service.actions:
+        if not _is_usable_name(action.name) or hasattr(service.__class__, action.name):
+            _LOG.debug("No stub for %s.%s", service.service_type, action.name)
+            continue
+        if not all(_is_usable_name(argument.name) for argument in action.in_args):
+            _LOG.debug(
+                "No stub for %s.%s, which has unusable argument names",
+                service.service_type,
+                action.name,
+            )
+            continue
+        usable.append(action)
+    return usable
+
+
+def generate_module(services, description="a Sonos speaker"):
+    """Return the source of a module of service stubs.
+
+    The module has a class for each service, with the same name, which
+    subclasses the service's class. The services' actions are fetched from
+    their service descriptions, if they have not been already.
+
+    Args:
+        services (list): The `soco.services.Service` instances to generate
+            stubs for.
+        description (str, optional): A description of where the service
+            descriptions came from, for the module docstring.
+
+    Returns:
+        str: The source of the module.
+    """
+    modules = sorted({service.__class__.__module__ for service in services})
+    sections = [
+        HEADER.format(
+            description=_escape_docstring(description),
+            imports="\n".join(f"import {module}" for module in modules),
+        )
+    ]
+    for service in services:
+        cls = service.__class__
+        actions = _usable_actions(service)
+        for action in actions:
+            sections.append(_generate_prepared(service, action))
+        body = [
+            f"class {cls.__name__}({cls.__module__}.{cls.__name__}):",
+            f'    """`{cls.__module__}.{cls.__name__}`, with a method for each '
+            'action."""',
+        ]
+        for action in actions:
+            body.append("")
+            body.append(_generate_method(service, action))
+        sections.append("\n".join(body))
+    return "\n\n\n".join(sections) + "\n"
+
+
+def write_module(filepath, services, description="a Sonos speaker"):
+    """Write a module of service stubs.
+
+    Args:
+        filepath (str): The path of the module to write.
+        services (list): As for `generate_module`.
+        description (str, optional): As for `generate_module`.
+    """
+    source = generate_module(services, description)
+    temp_file = f"{filepath}.{os.getpid()}.tmp"
+    with open(temp_file, "w", encoding="UTF-8") as file_:
+        file_.write(source)
+    os.replace(temp_file, filepath)
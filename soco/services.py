@@ -33,16 +33,18 @@ Argument(name='CurrentDateFormat', vartype='string')] ...
 
 
 import logging
+import threading
 from collections import namedtuple
 from xml.sax.saxutils import escape
 
 import xml.etree.ElementTree as ET
 import requests
 
-from .cache import Cache
+from .cache import Cache, SingleFlight
 from . import events
 from . import config
 from .exceptions import NotSupportedException, SoCoUPnPException, UnknownSoCoException
+from .sessions import session_pool
 from .utils import prettify
 from .xml import XML, illegal_xml_re
 
@@ -65,6 +67,19 @@ log = logging.getLogger(__name__)  # pylint: disable=C0103
 if config.EVENTS_MODULE is None:
     config.EVENTS_MODULE = events
 
+#: tuple: Identical concurrent calls of actions whose names start with one of
+#: these prefixes are coalesced by `Service.send_command`. These actions only
+#: read state, so sharing one response between callers is safe.
+COALESCED_ACTION_PREFIXES = ("Get", "Browse")
+
+#: `tuple`: Actions whose names start with one of these prefixes do not change
+#: the state which is cached from events, so they leave it in the cache.
+NON_MUTATING_ACTION_PREFIXES = ("Get", "Browse", "Snapshot")
+
+#: `SingleFlight`: Tracks the requests which `Service.send_command` currently
+#: has in flight. Its ``stats`` count how many calls have been coalesced.
+in_flight_requests = SingleFlight()  # pylint: disable=invalid-name
+
 
 class Action(namedtuple("ActionBase", "name, in_args, out_args")):
     """A UPnP Action and its arguments."""
@@ -96,6 +111,82 @@ class Vartype(namedtuple("VartypeBase", "datatype, default, list, range")):
         return self.datatype
 
 
+class _Required:
+    """The type of `REQUIRED`."""
+
+    def __repr__(self):
+        return "REQUIRED"
+
+
+#: The default value of action arguments which must be given, in the
+#: methods of generated service stubs. See `Service.send_prepared`.
+REQUIRED = _Required()
+
+
+class PreparedAction(
+    namedtuple("PreparedActionBase", "name, signature, headers, prefix, suffix")
+):
+    """A UPnP action with its headers and SOAP envelope rendered in advance.
+
+    These are created by `Service.prepare_action`, and used by the service
+    stubs which :mod:`soco.service_stubs` generates. ``signature`` is the
+    string representation of the `Action`, for error messages, and the body
+    of a request is ``prefix``, the wrapped arguments, and ``suffix``.
+    """
+
+    def build_command(self, args):
+        """Build a SOAP request, as `Service.build_command` does.
+
+        Args:
+            args (list): The arguments, as a list of (name, value) tuples.
+
+        Returns:
+            tuple: a tuple containing the POST headers (as a dict) and a
+            string containing the SOAP body.
+        """
+        return self.headers, self.prefix + Service.wrap_arguments(args) + self.suffix
+
+
+class AsyncDispatcher:
+    """A dynamic dispatcher of awaitable UPnP actions for a `Service`.
+
+    Calls to methods on this object are dispatched to
+    `Service.async_send_command` with the action of the same name. It is
+    available as the ``async_`` attribute of each service:
+
+    >>> info = await device.avTransport.async_.GetPositionInfo(
+    ...     [("InstanceID", 0)])
+    """
+
+    def __init__(self, service):
+        """
+        Args:
+            service (Service): The service to which actions are sent.
+        """
+        self.service = service
+
+    def __getattr__(self, action):
+        """Called when a method on the instance cannot be found.
+
+        Args:
+            action (str): The name of the unknown method.
+        Returns:
+            callable: A coroutine function which sends the action.
+        """
+        service = self.service
+
+        async def _dispatcher(*args, **kwargs):
+            """Dispatch to async_send_command."""
+            return await service.async_send_command(action, *args, **kwargs)
+
+        _dispatcher.__name__ = action
+        # Cache it on this instance, so that next time we don't have to go
+        # through this again
+        setattr(self, action, _dispatcher)
+        log.debug("Dispatching async method %s", action)
+        return _dispatcher
+
+
 class Service:
     """A class representing a UPnP service.
 
@@ -119,6 +210,41 @@ class Service:
         "</s:Envelope>"
     )  # noqa PEP8
 
+    # From table 3.3 in
+    # http://upnp.org/specs/arch/UPnP-arch-DeviceArchitecture-v1.1.pdf
+    # This list may not be complete, but should be good enough to be going
+    # on with.  Error codes between 700-799 are defined for particular
+    # services, and may be overriden in subclasses. Error codes >800
+    # are generally SONOS specific. NB It may well be that SONOS does not
+    # use some of these error codes.
+
+    #: dict: Descriptions of the UPnP error codes, keyed by code.
+    UPNP_ERRORS = {
+        400: "Bad Request",
+        401: "Invalid Action",
+        402: "Invalid Args",
+        404: "Invalid Var",
+        412: "Precondition Failed",
+        501: "Action Failed",
+        600: "Argument Value Invalid",
+        601: "Argument Value Out of Range",
+        602: "Optional Action Not Implemented",
+        603: "Out Of Memory",
+        604: "Human Intervention Required",
+        605: "String Argument Too Long",
+        606: "Action Not Authorized",
+        607: "Signature Failure",
+        608: "Signature Missing",
+        609: "Not Encrypted",
+        610: "Invalid Sequence",
+        611: "Invalid Control URL",
+        612: "No Such Session",
+    }
+    #: dict: Default values for action arguments, keyed by argument name.
+    DEFAULT_ARGS = {}
+    #: dict: Additional HTTP headers to send with each action.
+    additional_headers = {}
+
     def __init__(self, soco):
         """
         Args:
@@ -156,38 +282,11 @@ class Service:
         self._actions = None
         self._event_vars = None
 
-        # From table 3.3 in
-        # http://upnp.org/specs/arch/UPnP-arch-DeviceArchitecture-v1.1.pdf
-        # This list may not be complete, but should be good enough to be going
-        # on with.  Error codes between 700-799 are defined for particular
-        # services, and may be overriden in subclasses. Error codes >800
-        # are generally SONOS specific. NB It may well be that SONOS does not
-        # use some of these error codes.
-
-        # pylint: disable=invalid-name
-        self.UPNP_ERRORS = {
-            400: "Bad Request",
-            401: "Invalid Action",
-            402: "Invalid Args",
-            404: "Invalid Var",
-            412: "Precondition Failed",
-            501: "Action Failed",
-            600: "Argument Value Invalid",
-            601: "Argument Value Out of Range",
-            602: "Optional Action Not Implemented",
-            603: "Out Of Memory",
-            604: "Human Intervention Required",
-            605: "String Argument Too Long",
-            606: "Action Not Authorized",
-            607: "Signature Failure",
-            608: "Signature Missing",
-            609: "Not Encrypted",
-            610: "Invalid Sequence",
-            611: "Invalid Control URL",
-            612: "No Such Session",
-        }
-        self.DEFAULT_ARGS = {}
-        self.additional_headers = {}
+        self._async_dispatcher = None
+        # The args, subscription ID and result of each cache entry which has
+        # been primed from events, by (action, tuple(args)). See _prime_cache
+        self._event_cache_entries = {}
+        self._event_cache_lock = threading.Lock()
 
     def __getattr__(self, action):
         """Called when a method on the instance cannot be found.
@@ -224,6 +323,18 @@ class Service:
         # return our new bound method, which will be called by Python
         return method
 
+    @property
+    def async_(self):
+        """`AsyncDispatcher`: Awaitable versions of this service's actions.
+
+        For example, ``await service.async_.GetMute(...)`` is the
+        non-blocking equivalent of ``service.GetMute(...)``. See
+        `async_send_command`.
+        """
+        if self._async_dispatcher is None:
+            self._async_dispatcher = AsyncDispatcher(self)
+        return self._async_dispatcher
+
     @staticmethod
     def wrap_arguments(args=None):
         """Wrap a list of tuples in xml ready to pass into a SOAP request.
@@ -476,6 +587,88 @@ class Service:
 
         if args is None:
             args = self.compose_args(action, kwargs)
+        return self._send(action, args, cache, cache_timeout, timeout)
+
+    def prepare_action(self, action):
+        """Render the headers and SOAP envelope of an action in advance.
+
+        Args:
+            action (str or `Action`): The action, or its name.
+
+        Returns:
+            `PreparedAction`: The prepared action, which can be sent with
+            `send_prepared`.
+
+        Raises:
+            AttributeError: If an action name is given and this service
+                does not support the action.
+        """
+        if not isinstance(action, Action):
+            for candidate in self.actions:
+                if candidate.name == action:
+                    action = candidate
+                    break
+            else:
+                raise AttributeError(f"Unknown Action: {action}")
+        headers, body = self.build_command(action.name)
+        split = body.rindex(f"</u:{action.name}>")
+        return PreparedAction(
+            action.name, str(action), headers, body[:split], body[split:]
+        )
+
+    def send_prepared(
+        self, prepared, args, cache=None, cache_timeout=None, kwargs=None
+    ):
+        """Send a prepared action to a Sonos device.
+
+        This is the counterpart of `send_command` for the methods of
+        generated service stubs, which compose the arguments themselves and
+        so need neither the service description nor `compose_args`.
+
+        Args:
+            prepared (`PreparedAction`): The action to send.
+            args (list): The arguments, as a list of (name, value) tuples.
+                Any value which is `REQUIRED` is taken to be missing.
+            cache (Cache): As for `send_command`.
+            cache_timeout (int): As for `send_command`.
+            kwargs (dict, optional): Any other keyword arguments passed to
+                the stub method. Only ``timeout`` is allowed, which is used
+                as in `send_command`.
+
+        Returns:
+             dict: a dict of ``{argument_name, value}`` items.
+
+        Raises:
+            ValueError: If an argument is missing, or an unexpected
+                argument is given.
+            `SoCoUPnPException`: if a SOAP error occurs.
+            `UnknownSoCoException`: if an unknown UPnP error occurs.
+            `requests.exceptions.HTTPError`: if an http error occurs.
+        """
+        timeout = config.REQUEST_TIMEOUT
+        if kwargs:
+            kwargs = dict(kwargs)
+            timeout = kwargs.pop("timeout", timeout)
+            if kwargs:
+                raise ValueError(
+                    "Unexpected argument '{}'. Method signature: {}".format(
+                        next(iter(kwargs)), prepared.signature
+                    )
+                )
+        for name, value in args:
+            if value is REQUIRED:
+                raise ValueError(
+                    "Missing argument '{}'. Method signature: {}".format(
+                        name, prepared.signature
+                    )
+                )
+        return self._send(prepared.name, args, cache, cache_timeout, timeout, prepared)
+
+    def _send(self, action, args, cache, cache_timeout, timeout, prepared=None):
+        """Send a command with composed arguments, from the cache if possible.
+
+        Used by `send_command` and `send_prepared`.
+        """
         if cache is None:
             cache = self.cache
         result = cache.get(action, args)
@@ -483,12 +676,57 @@ class Service:
             log.debug("Cache hit")
             return result
 
-        # Cache miss, so go ahead and make a network call
-        headers, body = self.build_command(action, args)
+        # Cache miss, so go ahead and make a network call. If another thread
+        # is already making exactly the same read-only call, share its result
+        # instead.
+        if config.REQUEST_COALESCING_ENABLED and action.startswith(
+            COALESCED_ACTION_PREFIXES
+        ):
+            key = (self.base_url + self.control_url, action, tuple(args))
+            try:
+                hash(key)
+            except TypeError:
+                key = None
+            if key is not None:
+                # Wait no longer for another thread's request than for our own
+                wait_timeout = timeout
+                if isinstance(timeout, tuple):
+                    wait_timeout = None if None in timeout else sum(timeout)
+                result, shared = in_flight_requests.do(
+                    key,
+                    self._post_command,
+                    action,
+                    args,
+                    cache,
+                    cache_timeout,
+                    timeout,
+                    prepared,
+                    wait_timeout=wait_timeout,
+                )
+                if shared:
+                    log.debug("Shared result of in-flight request")
+                    if result is not None:
+                        cache.put(result, action, args, timeout=cache_timeout)
+                return result
+        return self._post_command(action, args, cache, cache_timeout, timeout, prepared)
+
+    def _post_command(
+        self, action, args, cache, cache_timeout, timeout, prepared=None
+    ):  # pylint: disable=too-many-arguments
+        """Send a command to a Sonos device over the network.
+
+        Used by `send_command` on a cache miss. Takes the same arguments,
+        and the `PreparedAction` to build the request from, if there is one.
+        """
+        if prepared is None:
+            headers, body = self.build_command(action, args)
+        else:
+            headers, body = prepared.build_command(args)
         log.debug("Sending %s %s to %s", action, args, self.soco.ip_address)
         log.debug("Sending %s, %s", headers, prettify(body))
-        # Convert the body to bytes, and send it.
-        response = requests.post(
+        # Convert the body to bytes, and send it. If connection pooling is
+        # enabled, this will re-use a kept-alive connection to the speaker
+        response = session_pool.get(self.soco.ip_address).post(
             self.base_url + self.control_url,
             headers=headers,
             data=body.encode("utf-8"),
@@ -496,14 +734,137 @@ class Service:
         )
 
         log.debug("Received %s, %s", response.headers, response.text)
-        status = response.status_code
+        result = self._handle_response(
+            action, args, cache, cache_timeout, response.status_code, response.text
+        )
+        if result is None:
+            # Something else has gone wrong. Probably a network error. Let
+            # Requests handle it
+            response.raise_for_status()
+        return result
+
+    async def async_send_command(
+        self, action, args=None, cache=None, cache_timeout=None, session=None, **kwargs
+    ):
+        """Send a command to a Sonos device without blocking the event loop.
+
+        This is the `asyncio` counterpart of `send_command`, and takes the
+        same arguments. The same cache is consulted and primed, and the same
+        exceptions are raised for UPnP errors. It requires the `aiohttp`
+        package.
+
+        Args:
+            session (`aiohttp.ClientSession`, optional): The session to send
+                the request with. If not given, the session of the running
+                :py:mod:`soco.events_asyncio` event listener is used, if
+                there is one. Otherwise a session is created for this call
+                only, so passing a long-lived session is recommended.
+
+        Returns:
+             dict: a dict of ``{argument_name, value}`` items.
+
+        Raises:
+            AttributeError: If this service does not support the action.
+            ValueError: If the argument lists do not match the action
+                signature.
+            `SoCoUPnPException`: if a SOAP error occurs.
+            `UnknownSoCoException`: if an unknown UPnP error occurs.
+            `aiohttp.ClientResponseError`: if an http error occurs.
+        """
+        timeout = kwargs.pop("timeout", config.REQUEST_TIMEOUT)
+        log.debug("Request timeout set to %s", timeout)
+
+        if args is None:
+            if self._actions is None:
+                # Fetch the service description without blocking, so that
+                # compose_args does not have to
+                _, scpd_body = await self._async_request(
+                    "GET", self.base_url + self.scpd_url, session, 10
+                )
+                self._actions = list(self._parse_actions(scpd_body))
+            args = self.compose_args(action, kwargs)
+        if cache is None:
+            cache = self.cache
+        result = cache.get(action, args)
+        if result is not None:
+            log.debug("Cache hit")
+            return result
+
+        headers, body = self.build_command(action, args)
+        log.debug("Sending %s %s to %s", action, args, self.soco.ip_address)
+        log.debug("Sending %s, %s", headers, prettify(body))
+        response, text = await self._async_request(
+            "POST",
+            self.base_url + self.control_url,
+            session,
+            timeout,
+            headers=headers,
+            data=body.encode("utf-8"),
+        )
+
+        log.debug("Received %s, %s", response.headers, text)
+        result = self._handle_response(
+            action, args, cache, cache_timeout, response.status, text
+        )
+        if result is None:
+            response.raise_for_status()
+        return result
+
+    async def _async_request(self, method, url, session, timeout, **kwargs):
+        """Send an HTTP request using `aiohttp`.
+
+        Returns:
+            tuple: The (released) `aiohttp.ClientResponse` and its body as
+            text.
+        """
+        # aiohttp is an optional dependency, so only import it when needed
+        # pylint: disable=import-outside-toplevel
+        from aiohttp import ClientSession, ClientTimeout
+
+        if session is None:
+            listener = getattr(config.EVENTS_MODULE, "event_listener", None)
+            session = getattr(listener, "session", None)
+        if session is None:
+            async with ClientSession() as temporary_session:
+                return await self._async_request(
+                    method, url, temporary_session, timeout, **kwargs
+                )
+        async with session.request(
+            method,
+            url,
+            timeout=ClientTimeout(total=timeout),
+            raise_for_status=False,
+            **kwargs,
+        ) as response:
+            text = await response.text()
+        return response, text
+
+    def _handle_response(self, action, args, cache, cache_timeout, status, text):
+        """Process the status and body of a response to a UPnP action.
+
+        Used by both `send_command` and `async_send_command`.
+
+        Returns:
+            dict: The unwrapped result, or `None` if the status code was not
+            one which UPnP defines. The caller should then raise an HTTP
+            error.
+
+        Raises:
+            `NotSupportedException`: if the action is not supported.
+            `SoCoUPnPException`: if a SOAP error occurs.
+            `UnknownSoCoException`: if an unknown UPnP error occurs.
+        """
         log.debug("Received status %s from %s", status, self.soco.ip_address)
         if status == 200:
             # The response is good. Get the output params, and return them.
             # NB an empty dict is a valid result. It just means that no
-            # params are returned. By using response.text, we rely upon
-            # the requests library to convert to unicode for us.
-            result = self.unwrap_arguments(response.text) or True
+            # params are returned. We rely upon the HTTP library to convert
+            # the body to unicode for us.
+            result = self.unwrap_arguments(text) or True
+            if not action.startswith(NON_MUTATING_ACTION_PREFIXES):
+                # This action may have changed state which has been cached
+                # from events, so forget it until the next event arrives
+                self._clear_event_cache()
             # Store in the cache. There is no need to do this if there was an
             # error, since we would want to try a network call again.
             cache.put(result, action, args, timeout=cache_timeout)
@@ -516,11 +877,7 @@ class Service:
             # Internal server error. UPnP requires this to be returned if the
             # device does not like the action for some reason. The returned
             # content will be a SOAP Fault. Parse it and raise an error.
-            self.handle_upnp_error(response.text)
-        else:
-            # Something else has gone wrong. Probably a network error. Let
-            # Requests handle it
-            response.raise_for_status()
+            self.handle_upnp_error(text)
         return None
 
     def handle_upnp_error(self, xml_error):
@@ -643,6 +1000,80 @@ class Service:
             method as read only.
         """
 
+    def _prime_cache(self, event, entries):
+        """Put the results of actions, derived from an event, into the cache.
+
+        The entries remain valid while the subscription which delivered the
+        event is live, or until a state-changing action is sent through this
+        service, so that subscribed reads need no network calls.
+
+        Args:
+            event (Event): The event from which the entries were derived.
+            entries (list): a list of ``(action, args, result)`` tuples,
+                where ``action`` and ``args`` are exactly as they would be
+                passed to `send_command`, and ``result`` is the dict it
+                would return.
+        """
+        if not entries:
+            return
+        subscription = config.EVENTS_MODULE.subscriptions_map.get_subscription(
+            event.sid
+        )
+        if subscription is None:
+            return
+        timeout = self._event_cache_timeout(subscription)
+        if not timeout:
+            return
+        with self._event_cache_lock:
+            for action, args, result in entries:
+                self.cache.put(result, action, args, timeout=timeout)
+                self._event_cache_entries[(action, tuple(args))] = (
+                    args,
+                    event.sid,
+                    result,
+                )
+
+    def _refresh_event_cache(self, subscription):
+        """Extend the entries primed from a subscription's events, once it
+        has been renewed.
+
+        A renewal does not cause an event to be sent, so without this the
+        entries would expire although the subscription is still live.
+        """
+        timeout = self._event_cache_timeout(subscription)
+        if not timeout:
+            return
+        with self._event_cache_lock:
+            for (action, _), entry in self._event_cache_entries.items():
+                args, sid, result = entry
+                if sid == subscription.sid:
+                    self.cache.put(result, action, args, timeout=timeout)
+
+    @staticmethod
+    def _event_cache_timeout(subscription):
+        """The time for which entries primed from a subscription's events
+        are valid."""
+        if subscription.timeout is None:
+            # An infinite subscription. Re-check once a day anyway.
+            return 86400
+        return subscription.time_left
+
+    def _clear_event_cache(self, sid=None):
+        """Remove the entries which have been primed from events from the
+        cache, leaving any others.
+
+        Args:
+            sid (str, optional): Only remove the entries primed from the
+                events of the subscription with this ID.
+        """
+        if not self._event_cache_entries:
+            return
+        with self._event_cache_lock:
+            for key, (args, entry_sid, _) in list(self._event_cache_entries.items()):
+                if sid is None or entry_sid == sid:
+                    del self._event_cache_entries[key]
+                    self.cache.delete(key[0], args)
+
     @property
     def actions(self):
         """The service's actions with their arguments.
@@ -705,11 +1136,26 @@ class Service:
             )
         """
 
-        # pylint: disable=invalid-name
-        ns = "{urn:schemas-upnp-org:service-1-0}"
         # get the scpd body as bytes, and feed directly to elementtree
         # which likes to receive bytes
         scpd_body = requests.get(self.base_url + self.scpd_url, timeout=10).content
+        yield from self._parse_actions(scpd_body)
+
+    @staticmethod
+    def _parse_actions(scpd_body):
+        """Yield the actions described by a service description document.
+
+        Args:
+            scpd_body (bytes or str): The service control protocol
+                description.
+
+        Yields:
+            `Action`: the next action.
+        """
+        # pylint: disable=invalid-name
+        ns = "{urn:schemas-upnp-org:service-1-0}"
+        if isinstance(scpd_body, str):
+            scpd_body = scpd_body.encode("utf-8")
         tree = XML.fromstring(scpd_body)
         # parse the state variables to get the relevant variable types
         vartypes = {}
@@ -791,13 +1237,10 @@ class Service:
 class AlarmClock(Service):
     """Sonos alarm service, for setting and getting time and alarms."""
 
-    def __init__(self, soco):
-        super().__init__(soco)
-        self.UPNP_ERRORS.update(
-            {
-                801: "Already an alarm for this time",
-            }
-        )
+    UPNP_ERRORS = {
+        **Service.UPNP_ERRORS,
+        801: "Already an alarm for this time",
+    }
 
 
 class MusicServices(Service):
@@ -836,36 +1279,36 @@ class ContentDirectory(Service):
     """UPnP standard Content Directory service, for functions relating to
     browsing, searching and listing available music."""
 
+    # For error codes, see table 2.7.16 in
+    # http://upnp.org/specs/av/UPnP-av-ContentDirectory-v1-Service.pdf
+    UPNP_ERRORS = {
+        **Service.UPNP_ERRORS,
+        701: "No such object",
+        702: "Invalid CurrentTagValue",
+        703: "Invalid NewTagValue",
+        704: "Required tag",
+        705: "Read only tag",
+        706: "Parameter Mismatch",
+        708: "Unsupported or invalid search criteria",
+        709: "Unsupported or invalid sort criteria",
+        710: "No such container",
+        711: "Restricted object",
+        712: "Bad metadata",
+        713: "Restricted parent object",
+        714: "No such source resource",
+        715: "Resource access denied",
+        716: "Transfer busy",
+        717: "No such file transfer",
+        718: "No such destination resource",
+        719: "Destination resource access denied",
+        720: "Cannot process the request",
+    }
+    additional_headers = {"USER-AGENT": "Sonos/83.1-61210"}
+
     def __init__(self, soco):
         super().__init__(soco)
         self.control_url = "/MediaServer/ContentDirectory/Control"
         self.event_subscription_url = "/MediaServer/ContentDirectory/Event"
-        # For error codes, see table 2.7.16 in
-        # http://upnp.org/specs/av/UPnP-av-ContentDirectory-v1-Service.pdf
-        self.UPNP_ERRORS.update(
-            {
-                701: "No such object",
-                702: "Invalid CurrentTagValue",
-                703: "Invalid NewTagValue",
-                704: "Required tag",
-                705: "Read only tag",
-                706: "Parameter Mismatch",
-                708: "Unsupported or invalid search criteria",
-                709: "Unsupported or invalid sort criteria",
-                710: "No such container",
-                711: "Restricted object",
-                712: "Bad metadata",
-                713: "Restricted parent object",
-                714: "No such source resource",
-                715: "Resource access denied",
-                716: "Transfer busy",
-                717: "No such file transfer",
-                718: "No such destination resource",
-                719: "Destination resource access denied",
-                720: "Cannot process the request",
-            }
-        )
-        self.additional_headers = {"USER-AGENT": "Sonos/83.1-61210"}
 
 
 class MS_ConnectionManager(Service):  # pylint: disable=invalid-name
@@ -882,11 +1325,35 @@ class RenderingControl(Service):
     """UPnP standard rendering control service, for functions relating to
     playback rendering, eg bass, treble, volume and EQ."""
 
+    DEFAULT_ARGS = {"InstanceID": 0}
+
     def __init__(self, soco):
         super().__init__(soco)
         self.control_url = "/MediaRenderer/RenderingControl/Control"
         self.event_subscription_url = "/MediaRenderer/RenderingControl/Event"
-        self.DEFAULT_ARGS.update({"InstanceID": 0})
+
+    def _update_cache_on_event(self, event):
+        """Prime the cache with the volume, mute, loudness, bass and treble
+        reported in a LastChange event."""
+        entries = []
+        for variable, action, out_arg in (
+            ("volume", "GetVolume", "CurrentVolume"),
+            ("mute", "GetMute", "CurrentMute"),
+            ("loudness", "GetLoudness", "CurrentLoudness"),
+            ("bass", "GetBass", "CurrentBass"),
+            ("treble", "GetTreble", "CurrentTreble"),
+        ):
+            value = event.variables.get(variable)
+            if value is None:
+                continue
+            # Volume, mute and loudness are reported per channel. Bass and
+            # treble are not, but are read for the Master channel.
+            if not isinstance(value, dict):
+                value = {"Master": value}
+            for channel, channel_value in value.items():
+                args = [("InstanceID", 0), ("Channel", channel)]
+                entries.append((action, args, {out_arg: channel_value}))
+        self._prime_cache(event, entries)
 
 
 class MR_ConnectionManager(Service):  # pylint: disable=invalid-name
@@ -903,38 +1370,92 @@ class AVTransport(Service):
     """UPnP standard AV Transport service, for functions relating to transport
     management, eg play, stop, seek, playlists etc."""
 
+    # For error codes, see
+    # http://upnp.org/specs/av/UPnP-av-AVTransport-v1-Service.pdf
+    UPNP_ERRORS = {
+        **Service.UPNP_ERRORS,
+        701: "Transition not available",
+        702: "No contents",
+        703: "Read error",
+        704: "Format not supported for playback",
+        705: "Transport is locked",
+        706: "Write error",
+        707: "Media is protected or not writeable",
+        708: "Format not supported for recording",
+        709: "Media is full",
+        710: "Seek mode not supported",
+        711: "Illegal seek target",
+        712: "Play mode not supported",
+        713: "Record quality not supported",
+        714: "Illegal MIME-Type",
+        715: 'Content "BUSY"',
+        716: "Resource Not found",
+        717: "Play speed not supported",
+        718: "Invalid InstanceID",
+        737: "No DNS Server",
+        738: "Bad Domain Name",
+        739: "Server Error",
+    }
+    DEFAULT_ARGS = {"InstanceID": 0}
+
     def __init__(self, soco):
         super().__init__(soco)
         self.control_url = "/MediaRenderer/AVTransport/Control"
         self.event_subscription_url = "/MediaRenderer/AVTransport/Event"
-        # For error codes, see
-        # http://upnp.org/specs/av/UPnP-av-AVTransport-v1-Service.pdf
-        self.UPNP_ERRORS.update(
-            {
-                701: "Transition not available",
-                702: "No contents",
-                703: "Read error",
-                704: "Format not supported for playback",
-                705: "Transport is locked",
-                706: "Write error",
-                707: "Media is protected or not writeable",
-                708: "Format not supported for recording",
-                709: "Media is full",
-                710: "Seek mode not supported",
-                711: "Illegal seek target",
-                712: "Play mode not supported",
-                713: "Record quality not supported",
-                714: "Illegal MIME-Type",
-                715: 'Content "BUSY"',
-                716: "Resource Not found",
-                717: "Play speed not supported",
-                718: "Invalid InstanceID",
-                737: "No DNS Server",
-                738: "Bad Domain Name",
-                739: "Server Error",
-            }
-        )
-        self.DEFAULT_ARGS.update({"InstanceID": 0})
+
+    def _update_cache_on_event(self, event):
+        """Prime the cache with the transport state, play mode and crossfade
+        mode reported in a LastChange event.
+
+        The position info and media info are not evented completely (the
+        current position, for example, is never evented), so these are
+        removed from the cache instead, since the event may mean that they
+        have changed. For this reason the current track URI, which is only
+        returned by ``GetPositionInfo``, is not primed either.
+        """
+        variables = event.variables
+        args = [("InstanceID", 0)]
+        self.cache.delete("GetPositionInfo", [("InstanceID", 0), ("Channel", "Master")])
+        self.cache.delete("GetMediaInfo", args)
+        entries = []
+        if "transport_state" in variables and "transport_status" in variables:
+            entries.append(
+                (
+                    "GetTransportInfo",
+                    args,
+                    {
+                        "CurrentTransportState": variables["transport_state"],
+                        "CurrentTransportStatus": variables["transport_status"],
+                        # The speed is evented as TransportPlaySpeed, which
+                        # speakers report as NOT_IMPLEMENTED. GetTransportInfo
+                        # reports the normal speed of 1, which is the only one
+                        # Sonos devices support.
+                        "CurrentSpeed": "1",
+                    },
+                )
+            )
+        if "current_play_mode" in variables:
+            entries.append(
+                (
+                    "GetTransportSettings",
+                    args,
+                    {
+                        "PlayMode": variables["current_play_mode"],
+                        "RecQualityMode": variables.get(
+                            "current_record_quality_mode", "NOT_IMPLEMENTED"
+                        ),
+                    },
+                )
+            )
+        if "current_crossfade_mode" in variables:
+            entries.append(
+                (
+                    "GetCrossfadeMode",
+                    args,
+                    {"CrossfadeMode": variables["current_crossfade_mode"]},
+                )
+            )
+        self._prime_cache(event, entries)
 
 
 class Queue(Service):
@@ -951,8 +1472,28 @@ class GroupRenderingControl(Service):
     """Sonos group rendering control service, for functions relating to group
     volume etc."""
 
+    DEFAULT_ARGS = {"InstanceID": 0}
+
     def __init__(self, soco):
         super().__init__(soco)
         self.control_url = "/MediaRenderer/GroupRenderingControl/Control"
         self.event_subscription_url = "/MediaRenderer/GroupRenderingControl/Event"
-        self.DEFAULT_ARGS.update({"InstanceID": 0})
+
+    def _update_cache_on_event(self, event):
+        """Prime the cache with the group volume and group mute reported in
+        an event."""
+        entries = []
+        args = [("InstanceID", 0)]
+        if event.variables.get("group_volume") is not None:
+            entries.append(
+                (
+                    "GetGroupVolume",
+                    args,
+                    {"CurrentVolume": event.variables["group_volume"]},
+                )
+            )
+        if event.variables.get("group_mute") is not None:
+            entries.append(
+                ("GetGroupMute", args, {"CurrentMute": event.variables["group_mute"]})
+            )
+        self._prime_cache(event, entries)
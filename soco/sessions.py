@@ -0,0 +1,126 @@
+"""This module contains classes for re-using HTTP connections to speakers.
+
+By default, each UPnP action sent by a `soco.services.Service` opens a new
+TCP connection to port 1400 on the speaker. If `config.SESSION_POOL_ENABLED`
+is `True`, a `requests.Session` with a small keep-alive connection pool is
+created for each speaker IP address instead, and shared by all the services
+of the corresponding `SoCo` instance.
+
+Example:
+
+    Enable connection pooling before sending any commands::
+
+        from soco import config
+        config.SESSION_POOL_ENABLED = True
+        config.SESSION_POOL_SIZE = 4
+        config.SESSION_POOL_IDLE_TIMEOUT = 30
+"""
+
+import logging
+import threading
+from time import monotonic
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config
+
+log = logging.getLogger(__name__)  # pylint: disable=C0103
+
+
+class SessionPool:
+    """A thread-safe registry of `requests.Session` objects, keyed by speaker
+    IP address.
+
+    Sessions which have not been used for more than
+    `config.SESSION_POOL_IDLE_TIMEOUT` seconds are closed and removed from the
+    registry, so that idle speakers do not hold open sockets.
+    """
+
+    def __init__(self):
+        # A mapping of ip_address to [session, last_used] lists
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+
+    def get(self, ip_address):
+        """Get the HTTP client to use for a speaker.
+
+        Args:
+            ip_address (str): The speaker's IP address.
+
+        Returns:
+            `requests.Session` or module: A pooled session for this speaker
+            if `config.SESSION_POOL_ENABLED` is `True`, otherwise the
+            `requests` module itself. Either way, the return value offers
+            ``get``, ``post`` and ``request`` methods.
+        """
+        if not config.SESSION_POOL_ENABLED:
+            return requests
+        now = monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._evict_idle(now)
+            entry = self._sessions.get(ip_address)
+            if entry is None:
+                entry = [self._make_session(), now]
+                self._sessions[ip_address] = entry
+                log.debug("Created pooled session for %s", ip_address)
+            else:
+                entry[1] = now
+            return entry[0]
+
+    def close(self, ip_address):
+        """Close and remove the session for a speaker, if there is one.
+
+        Args:
+            ip_address (str): The speaker's IP address.
+        """
+        with self._lock:
+            entry = self._sessions.pop(ip_address, None)
+        if entry is not None:
+            entry[0].close()
+
+    def clear(self):
+        """Close and remove all sessions."""
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for session, _ in entries:
+            session.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, ip_address):
+        with self._lock:
+            return ip_address in self._sessions
+
+    @staticmethod
+    def _make_session():
+        """Create a session with a keep-alive pool for a single host."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.SESSION_POOL_SIZE)
+        session.mount("http://", adapter)
+        return session
+
+    def _evict_idle(self, now):
+        """Close sessions which have been idle for too long.
+
+        Must be called with ``self._lock`` held.
+        """
+        idle_timeout = config.SESSION_POOL_IDLE_TIMEOUT
+        if idle_timeout is None:
+            self._next_sweep = now + 1.0
+            return
+        for ip_address, (session, last_used) in list(self._sessions.items()):
+            if now - last_used > idle_timeout:
+                del self._sessions[ip_address]
+                session.close()
+                log.debug("Evicted idle pooled session for %s", ip_address)
+        # Sweep at most once a second, since this runs on every request
+        self._next_sweep = now + min(idle_timeout, 1.0)
+
+
+session_pool = SessionPool()  # pylint: disable=C0103
@@ -0,0 +1,514 @@
+"""This module contains a long-lived SSDP listener, which keeps a registry of
+the Sonos devices on the network.
+
+`soco.discovery.discover` sends a search and waits for a reply every time it
+is called, and never learns when a speaker leaves the network. A
+`DeviceRegistry` instead joins the SSDP multicast group, handles the
+``ssdp:alive`` and ``ssdp:byebye`` announcements which speakers make, and
+repeats the search periodically, so that lookups can be answered
+immediately from memory.
+
+Example:
+
+    Keep track of speakers coming and going::
+
+        from soco.ssdp import DeviceRegistry
+
+        def changed(kind, entry):
+            print(kind, entry.soco, entry.household_id)
+
+        registry = DeviceRegistry()
+        registry.add_listener(changed)
+        registry.start()
+        ...
+        kitchen = registry.by_name("Kitchen")
+        registry.stop()
+"""
+
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+from textwrap import dedent
+
+from . import config
+from .utils import really_utf8
+
+_LOG = logging.getLogger(__name__)
+
+MCAST_GRP = "239.255.255.250"
+MCAST_PORT = 1900
+ZONE_PLAYER = "urn:schemas-upnp-org:device:ZonePlayer:1"
+PLAYER_SEARCH = dedent(f"""\
+    M-SEARCH * HTTP/1.1
+    HOST: {MCAST_GRP}:{MCAST_PORT}
+    MAN: "ssdp:discover"
+    MX: 1
+    ST: {ZONE_PLAYER}
+    """).encode("utf-8")
+
+# The number of times a search is sent on each socket. UDP is unreliable
+SEARCH_REPEATS = 3
+
+# The maximum age of an announcement, if a device does not give one
+DEFAULT_MAX_AGE = 1800
+
+# The kinds of registry change passed to listeners
+DEVICE_ADDED = "added"
+DEVICE_UPDATED = "updated"
+DEVICE_REMOVED = "removed"
+
+
+class DeviceEntry(
+    namedtuple(
+        "DeviceEntryBase",
+        "soco, uid, household_id, boot_seq, last_seen, max_age, player_name, "
+        "is_visible",
+        defaults=(None, None),
+    )
+):
+    """A device known to a `DeviceRegistry`.
+
+    ``last_seen`` is the `time.time` at which the device last announced
+    itself or answered a search. The entry expires ``max_age`` seconds
+    later, unless it is seen again.
+
+    ``player_name`` and ``is_visible`` come from the zone group state of the
+    device's household, which the registry fetches when a device is added or
+    changes. They are `None` until it has been fetched.
+    """
+
+
+def parse_ssdp_message(data):
+    """Parse an SSDP message.
+
+    Args:
+        data (bytes): The datagram.
+
+    Returns:
+        tuple: a ``(start_line, headers)`` tuple, where ``headers`` is a
+        dict with upper case keys.
+    """
+    lines = data.decode("utf-8", "replace").splitlines()
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().upper()] = value.strip()
+    return (lines[0].strip() if lines else ""), headers
+
+
+def uid_from_usn(usn):
+    """Return the uid in a USN header, eg ``RINCON_000XXX1400`` from
+    ``uuid:RINCON_000XXX1400::urn:schemas-upnp-org:device:ZonePlayer:1``."""
+    uid = usn.split("::", 1)[0]
+    if uid.startswith("uuid:"):
+        uid = uid[5:]
+    return uid
+
+
+def max_age_from_cache_control(cache_control):
+    """Return the max-age in a CACHE-CONTROL header, eg 1800 from
+    ``max-age = 1800``."""
+    for directive in cache_control.split(","):
+        name, _, value = directive.partition("=")
+        if name.strip().lower() == "max-age":
+            try:
+                return int(value.strip())
+            except ValueError:
+                break
+    return DEFAULT_MAX_AGE
+
+
+def create_search_socket(interface_addr):
+    """Create a socket for sending searches from a network interface.
+
+    Args:
+        interface_addr (str): The IP address of the interface.
+
+    Returns:
+        socket.socket: The socket.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    # UPnP v1.0 requires a TTL of 4
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, struct.pack("B", 4))
+    sock.setsockopt(
+        socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface_addr)
+    )
+    return sock
+
+
+def send_search(sockets):
+    """Send `PLAYER_SEARCH` `SEARCH_REPEATS` times on each socket.
+
+    A socket on which sending fails is not used again.
+
+    Args:
+        sockets (list): The sockets, as made by `create_search_socket`.
+
+    Returns:
+        list: The sockets on which sending failed.
+    """
+    sockets = list(sockets)
+    failed = []
+    for _ in range(SEARCH_REPEATS):
+        for sock in sockets[:]:  # Copy the list, because items may be removed
+            _LOG.debug("Sending discovery packet on %s", sock)
+            try:
+                sock.sendto(really_utf8(PLAYER_SEARCH), (MCAST_GRP, MCAST_PORT))
+            except OSError as error:
+                _LOG.debug("Sending failed on %s: %s", sock, error)
+                sockets.remove(sock)
+                failed.append(sock)
+    return failed
+
+
+def create_notify_socket(interface_addrs):
+    """Create a socket which receives the announcements multicast to the SSDP
+    group on each of the network interfaces.
+
+    Args:
+        interface_addrs (iterable): The IP addresses of the interfaces.
+
+    Returns:
+        socket.socket: The socket.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        except OSError:
+            pass
+    sock.bind(("", MCAST_PORT))
+    for interface_addr in interface_addrs:
+        sock.setsockopt(
+            socket.IPPROTO_IP,
+            socket.IP_ADD_MEMBERSHIP,
+            socket.inet_aton(MCAST_GRP) + socket.inet_aton(interface_addr),
+        )
+    return sock
+
+
+class DeviceRegistry:
+    """A registry of the Sonos devices on the network, kept up to date by a
+    background thread which listens for SSDP messages.
+
+    All the methods are thread-safe. Listeners are called on the listener
+    thread, so they should return quickly.
+    """
+
+    def __init__(self, interface_addr=None, household_id=None, search_interval=300):
+        """
+        Args:
+            interface_addr (str, optional): The IP address of the network
+                interface to use. If `None`, all suitable interfaces are used.
+            household_id (str, optional): Only register devices in this
+                household.
+            search_interval (float, optional): The number of seconds between
+                searches. Announcements are also received between searches.
+        """
+        self.interface_addr = interface_addr
+        self.household_id = household_id
+        self.search_interval = search_interval
+        self._entries = {}
+        # A device through which to fetch the zone group state, for each
+        # household whose names and visibility need updating
+        self._topology_due = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._sockets = []
+        self._search_sockets = []
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start listening, and send a search.
+
+        Raises:
+            OSError: if no sockets could be created.
+        """
+        if self._thread is not None:
+            return
+        if self.interface_addr is not None:
+            addresses = {self.interface_addr}
+        else:
+            # pylint: disable=import-outside-toplevel
+            from .discovery import _find_ipv4_addresses
+
+            addresses = _find_ipv4_addresses()
+        self._search_sockets = []
+        for address in addresses:
+            try:
+                self._search_sockets.append(create_search_socket(address))
+            except OSError as error:
+                _LOG.warning("Can't make a search socket for %s: %s", address, error)
+        self._sockets = list(self._search_sockets)
+        try:
+            self._sockets.append(create_notify_socket(addresses))
+        except OSError as error:
+            # Another process may have port 1900. Rely on searches instead.
+            _LOG.warning("Can't listen for SSDP announcements: %s", error)
+        if not self._sockets:
+            raise OSError("No sockets available for SSDP")
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="SoCoDeviceRegistry", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop listening. The registry keeps its entries."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join()
+        for sock in self._sockets:
+            sock.close()
+        self._sockets = []
+        self._search_sockets = []
+
+    @property
+    def is_running(self):
+        """bool: Whether the registry is listening."""
+        return self._thread is not None
+
+    def search(self):
+        """Send a search for Sonos devices. The replies are handled by the
+        listener thread."""
+        send_search(self._search_sockets)
+
+    def add_listener(self, listener):
+        """Call a function whenever a device is added, updated or removed.
+
+        Args:
+            listener (callable): A function which takes the kind of change
+                (``"added"``, ``"updated"`` or ``"removed"``) and the
+                `DeviceEntry`.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stop calling a function added with `add_listener`."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @property
+    def entries(self):
+        """dict: A snapshot of the `DeviceEntry` for each known device, keyed
+        by uid."""
+        self.expire()
+        with self._lock:
+            return dict(self._entries)
+
+    @property
+    def zones(self):
+        """set: The `SoCo` instances for all the known devices."""
+        return {entry.soco for entry in self.entries.values()}
+
+    def get(self, uid):
+        """Get the entry for a device.
+
+        Args:
+            uid (str): The uid of the device, eg ``RINCON_000XXX1400``.
+
+        Returns:
+            DeviceEntry: The entry, or `None` if the device is not known.
+        """
+        return self.entries.get(uid)
+
+    def any_soco(self):
+        """Return the most recently seen visible device.
+
+        This makes no network calls. Visibility is known once the zone group
+        state of the device's household has been fetched.
+
+        Returns:
+            SoCo: A `SoCo` instance, or `None` if no visible devices are
+            known.
+        """
+        entries = sorted(
+            self.entries.values(), key=lambda entry: entry.last_seen, reverse=True
+        )
+        for entry in entries:
+            if entry.is_visible:
+                return entry.soco
+        return None
+
+    def by_name(self, name):
+        """Return a known visible device by name.
+
+        This makes no network calls. Names are known once the zone group
+        state of the device's household has been fetched.
+
+        Args:
+            name (str): The name of the device.
+
+        Returns:
+            SoCo: A `SoCo` instance, or `None` if no device has the name.
+        """
+        for entry in self.entries.values():
+            if entry.player_name == name and entry.is_visible:
+                return entry.soco
+        return None
+
+    def update_topology(self):
+        """Fetch the zone group state of each household with new or changed
+        devices, and record the names and visibility of its devices.
+
+        This is called by the listener thread, which also schedules each
+        household for an update at every search, so that renamed or
+        regrouped devices are noticed. Only one request is made per
+        household.
+        """
+        with self._lock:
+            due, self._topology_due = self._topology_due, {}
+        for zone in due.values():
+            zgs = zone.zone_group_state
+            try:
+                zgs.poll(zone)
+            except Exception as error:  # pylint: disable=broad-except
+                _LOG.debug("Could not fetch zone group state from %s: %s", zone, error)
+                continue
+            # pylint: disable=protected-access
+            names = {member._uid: member._player_name for member in zgs.all_zones}
+            visible = {member._uid for member in zgs.visible_zones}
+            updated = []
+            with self._lock:
+                for uid, entry in self._entries.items():
+                    if uid not in names:
+                        continue
+                    new = entry._replace(
+                        player_name=names[uid], is_visible=uid in visible
+                    )
+                    if new != entry:
+                        self._entries[uid] = new
+                        updated.append(new)
+            for entry in updated:
+                self._notify(DEVICE_UPDATED, entry)
+
+    def expire(self):
+        """Remove the devices whose announcements have expired."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                entry
+                for entry in self._entries.values()
+                if entry.last_seen + entry.max_age < now
+            ]
+            for entry in expired:
+                del self._entries[entry.uid]
+        for entry in expired:
+            _LOG.debug("SSDP announcement of %s expired", entry.uid)
+            self._notify(DEVICE_REMOVED, entry)
+
+    def handle_message(self, data, address):
+        """Update the registry from an SSDP message.
+
+        Args:
+            data (bytes): The datagram.
+            address (tuple): The ``(ip_address, port)`` it came from.
+        """
+        start_line, headers = parse_ssdp_message(data)
+        if start_line.startswith("NOTIFY"):
+            if headers.get("NT") != ZONE_PLAYER:
+                return
+            if headers.get("NTS") == "ssdp:byebye":
+                self._remove(uid_from_usn(headers.get("USN", "")))
+                return
+        elif not start_line.startswith("HTTP/1.1 200"):
+            # An M-SEARCH from another control point
+            return
+        elif headers.get("ST") != ZONE_PLAYER:
+            return
+        if "Sonos" not in headers.get("SERVER", "Sonos"):
+            return
+        self._seen(headers, address)
+
+    def _seen(self, headers, address):
+        """Add or refresh the entry for the device which sent a message."""
+        uid = uid_from_usn(headers.get("USN", ""))
+        household_id = headers.get("X-RINCON-HOUSEHOLD")
+        if not uid or (self.household_id and household_id != self.household_id):
+            return
+        location = headers.get("LOCATION", "")
+        ip_address = location.split("//", 1)[-1].split(":", 1)[0] or address[0]
+        boot_seq = headers.get("X-RINCON-BOOTSEQ")
+        with self._lock:
+            old = self._entries.get(uid)
+            if old is not None and old.soco.ip_address == ip_address:
+                zone = old.soco
+            else:
+                zone = config.SOCO_CLASS(ip_address)
+                # pylint: disable=protected-access
+                zone._uid = uid
+                if household_id:
+                    zone._household_id = household_id
+            entry = DeviceEntry(
+                zone,
+                uid,
+                household_id,
+                boot_seq,
+                time.time(),
+                max_age_from_cache_control(headers.get("CACHE-CONTROL", "")),
+            )
+            if old is not None:
+                entry = entry._replace(
+                    player_name=old.player_name, is_visible=old.is_visible
+                )
+            self._entries[uid] = entry
+            changed = old is None or old.soco is not zone or old.boot_seq != boot_seq
+            if changed:
+                self._topology_due.setdefault(household_id, zone)
+        if old is None:
+            _LOG.debug("Added %s at %s to the registry", uid, ip_address)
+            self._notify(DEVICE_ADDED, entry)
+        elif changed:
+            _LOG.debug("Updated %s at %s in the registry", uid, ip_address)
+            self._notify(DEVICE_UPDATED, entry)
+
+    def _remove(self, uid):
+        """Remove the entry for a device which has said goodbye."""
+        with self._lock:
+            entry = self._entries.pop(uid, None)
+        if entry is not None:
+            _LOG.debug("Removed %s from the registry", uid)
+            self._notify(DEVICE_REMOVED, entry)
+
+    def _notify(self, kind, entry):
+        """Pass a change to each listener."""
+        for listener in list(self._listeners):
+            try:
+                listener(kind, entry)
+            except Exception:  # pylint: disable=broad-except
+                _LOG.exception("Error in DeviceRegistry listener %s", listener)
+
+    def _run(self):
+        """Listen for SSDP messages until stopped."""
+        next_search = 0
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            if now >= next_search:
+                self.search()
+                next_search = now + self.search_interval
+                with self._lock:
+                    for entry in self._entries.values():
+                        self._topology_due.setdefault(entry.household_id, entry.soco)
+            self.expire()
+            try:
+                readable, _, _ = select.select(self._sockets, [], [], 0.5)
+            except (OSError, ValueError):
+                # The sockets are being closed
+                break
+            for sock in readable:
+                try:
+                    data, address = sock.recvfrom(2048)
+                except OSError:
+                    continue
+                self.handle_message(data, address)
+            self.update_topology()
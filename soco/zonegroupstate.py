@@ -14,6 +14,12 @@ avoid unnecessary reprocessing of identical data.
 Since the payloads are identical between all speakers, we can use a
 common cache per household.
 
+Each new payload is compared with the previous topology, and only the
+differences are applied: existing `ZoneGroup` instances are updated in
+place, and the changes are passed as a list of `ZoneGroupStateChange`
+instances to any listeners registered with
+`ZoneGroupState.add_listener`.
+
 As satellites can sometimes deliver outdated payloads when they are
 directly polled, these requests are instead forwarded to the parent
 device.
@@ -62,8 +68,10 @@ Example payload contents:
 """
 
 import asyncio
+import hashlib
 import logging
 import time
+from collections import namedtuple
 from weakref import WeakSet
 
 from lxml import etree as LXML
@@ -75,6 +83,9 @@ from .groups import ZoneGroup
 
 POLLING_CACHE_TIMEOUT = 5
 NEVER_TIME = -1200.0
+# The number of distinct raw payloads (eg with differing element orders)
+# remembered as duplicates of the current state
+MAX_KNOWN_PAYLOADS = 32
 
 ZGS_ATTRIB_MAPPING = {
     "BootSeq": "_boot_seqnum",
@@ -100,9 +111,44 @@ ZGS_XSLT = """
 """
 ZGS_TRANSFORM = LXML.XSLT(LXML.fromstring(ZGS_XSLT))  # pylint:disable=I1101
 
+# The kinds of ZoneGroupStateChange
+GROUP_ADDED = "group_added"
+GROUP_REMOVED = "group_removed"
+COORDINATOR_CHANGED = "coordinator_changed"
+MEMBERS_CHANGED = "members_changed"
+ZONE_ADDED = "zone_added"
+ZONE_REMOVED = "zone_removed"
+ZONE_MOVED = "zone_moved"
+VISIBILITY_CHANGED = "visibility_changed"
+SATELLITE_CHANGED = "satellite_changed"
+
 _LOG = logging.getLogger(__name__)
 
 
+class ZoneGroupStateChange(
+    namedtuple("ZoneGroupStateChangeBase", "kind, uid, old, new")
+):
+    """A change to the topology of a household.
+
+    ``kind`` is one of the following, and ``uid`` is the uid of the group
+    (for ``group_*``, ``coordinator_changed`` and ``members_changed``) or of
+    the zone (for ``zone_*``, ``visibility_changed`` and
+    ``satellite_changed``) which changed. ``old`` and ``new`` are:
+
+    * ``group_added``: `None`, and the new `ZoneGroup`.
+    * ``group_removed``: the removed `ZoneGroup`, and `None`.
+    * ``coordinator_changed``: the old and new coordinator `SoCo` instances.
+    * ``members_changed``: the old and new frozensets of member `SoCo`
+      instances.
+    * ``zone_added``: `None`, and the new `SoCo` instance.
+    * ``zone_removed``: the removed `SoCo` instance, and `None`.
+    * ``zone_moved``: the uids of the group the zone left and joined.
+    * ``visibility_changed``: the old and new visibility, as bools.
+    * ``satellite_changed``: the old and new `SoCo` instance of which the
+      zone is a satellite, or `None` if it is not a satellite.
+    """
+
+
 class ZoneGroupState:
     """Handles processing and caching of ZoneGroupState payloads.
 
@@ -117,7 +163,14 @@ class ZoneGroupState:
 
         self._cache_until = NEVER_TIME
         self._last_zgs = None
+        # Digests of the raw payloads which normalize to _last_zgs
+        self._known_payloads = set()
         self._subscriptions = WeakSet()
+        self._listeners = []
+        # The ZoneGroup for each group uid, and for each zone the uid of
+        # its group, its visibility and its satellite parent
+        self._groups_by_uid = {}
+        self._zone_info = {}
 
         # Statistics
         self.total_requests = 0
@@ -160,11 +213,34 @@ class ZoneGroupState:
             self.remove_subscription(sub)
         return bool(self._subscriptions)
 
+    def add_listener(self, listener):
+        """Call a function with the changes made by each new payload.
+
+        Args:
+            listener (callable): A function which takes a list of
+                `ZoneGroupStateChange` instances. It is only called when
+                there are changes, and may be called from an event thread,
+                so should return quickly. To receive the changes on a
+                queue, pass the queue's ``put`` method.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stop calling a function added with `add_listener`."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
     def clear_zone_groups(self):
         """Clear all known group sets."""
         self.groups.clear()
         self.all_zones.clear()
         self.visible_zones.clear()
+        self._groups_by_uid.clear()
+        self._zone_info.clear()
+        # Make sure that the next payload repopulates the sets
+        self._last_zgs = None
+        self._known_payloads.clear()
 
     def poll(self, soco):
         """Poll using the provided SoCo instance and process the payload."""
@@ -291,9 +367,19 @@ class ZoneGroupState:
     def process_payload(self, payload, source, source_ip):
         """Update using the provided XML payload."""
         self.total_requests += 1
+        # Each change is echoed by every subscribed speaker, so check for a
+        # payload which has been seen before without normalizing it
+        payload_digest = zgs_digest(payload)
+        if payload_digest in self._known_payloads:
+            _LOG.debug(
+                "Duplicate ZGS received from %s (%s), ignoring", source_ip, source
+            )
+            return
         tree = normalize_zgs_xml(payload)
         normalized_zgs = str(tree)
         if normalized_zgs == self._last_zgs:
+            if len(self._known_payloads) < MAX_KNOWN_PAYLOADS:
+                self._known_payloads.add(payload_digest)
             _LOG.debug(
                 "Duplicate ZGS received from %s (%s), ignoring", source_ip, source
             )
@@ -308,10 +394,22 @@ class ZoneGroupState:
             self.total_requests,
         )
 
-        self.update_soco_instances(tree)
+        changes = self.update_soco_instances(tree)
         self._last_zgs = normalized_zgs
+        self._known_payloads = {payload_digest}
+        if changes:
+            self._notify_listeners(changes)
+
+    def _notify_listeners(self, changes):
+        """Pass the changes from a payload to each listener."""
+        for listener in list(self._listeners):
+            try:
+                listener(changes)
+            except Exception:  # pylint: disable=broad-except
+                _LOG.exception("Error in ZoneGroupState listener %s", listener)
 
-    def parse_zone_group_member(self, member_element):
+    @staticmethod
+    def parse_zone_group_member(member_element):
         """Parse a ZoneGroupMember or Satellite element from Zone Group
         State, create a SoCo instance for the member, set basic attributes
         and return it."""
@@ -340,25 +438,30 @@ class ZoneGroupState:
             for channel in channel_map.split(";"):
                 if channel.startswith(zone._uid):
                     zone._channel = channel.split(":")[-1]
-
-        # Add the zone to the set of all members, and to the set
-        # of visible members if appropriate
-        if member_attribs.get("Invisible") != "1":
-            self.visible_zones.add(zone)
-        self.all_zones.add(zone)
         return zone
 
     def update_soco_instances(self, tree):
-        """Update all SoCo instances with the provided payload."""
-        # pylint: disable=protected-access
-        self.clear_zone_groups()
+        """Update all SoCo instances with the provided payload.
+
+        The new topology is compared with the previous one, and only the
+        differences are applied to `groups`, `all_zones` and
+        `visible_zones`.
 
+        Returns:
+            list: The `ZoneGroupStateChange` instances describing the
+            differences.
+        """
+        # pylint: disable=protected-access
         # Compatibility fallback for pre-10.1 firmwares
         # where a "ZoneGroups" element is not used
         zone_groups = tree.find("ZoneGroups")
         if zone_groups is None:
             zone_groups = tree
 
+        # group uid -> (coordinator, members)
+        new_groups = {}
+        # zone -> (group uid, visible, satellite parent)
+        new_zone_info = {}
         for group_element in zone_groups.findall("ZoneGroup"):
             coordinator_uid = group_element.attrib["Coordinator"]
             group_uid = group_element.attrib["ID"]
@@ -379,6 +482,11 @@ class ZoneGroupState:
                 zone._is_bridge = member_element.attrib.get("IsZoneBridge") == "1"
                 # add the zone to the members for this group
                 members.add(zone)
+                new_zone_info[zone] = (
+                    group_uid,
+                    member_element.attrib.get("Invisible") != "1",
+                    None,
+                )
                 # Loop over Satellite elements if present, and process as for
                 # ZoneGroup elements
                 satellite_elements = member_element.findall("Satellite")
@@ -390,7 +498,106 @@ class ZoneGroupState:
                     # Assume a satellite can't be a bridge or coordinator, so
                     # no need to check.
                     members.add(satellite)
-            self.groups.add(ZoneGroup(group_uid, group_coordinator, members))
+                    new_zone_info[satellite] = (
+                        group_uid,
+                        satellite_element.attrib.get("Invisible") != "1",
+                        zone,
+                    )
+            new_groups[group_uid] = (group_coordinator, members)
+
+        changes = self._apply_group_changes(new_groups)
+        changes.extend(self._apply_zone_changes(new_zone_info))
+        return changes
+
+    def _apply_group_changes(self, new_groups):
+        """Update `groups` to match the new groups, and return the changes."""
+        changes = []
+        for uid in list(self._groups_by_uid):
+            if uid not in new_groups:
+                group = self._groups_by_uid.pop(uid)
+                self.groups.discard(group)
+                changes.append(ZoneGroupStateChange(GROUP_REMOVED, uid, group, None))
+        for uid, (coordinator, members) in new_groups.items():
+            group = self._groups_by_uid.get(uid)
+            if group is None:
+                group = ZoneGroup(uid, coordinator, members)
+                self._groups_by_uid[uid] = group
+                self.groups.add(group)
+                changes.append(ZoneGroupStateChange(GROUP_ADDED, uid, None, group))
+                continue
+            if group.coordinator is not coordinator:
+                changes.append(
+                    ZoneGroupStateChange(
+                        COORDINATOR_CHANGED, uid, group.coordinator, coordinator
+                    )
+                )
+                group.coordinator = coordinator
+            if group.members != members:
+                changes.append(
+                    ZoneGroupStateChange(
+                        MEMBERS_CHANGED,
+                        uid,
+                        frozenset(group.members),
+                        frozenset(members),
+                    )
+                )
+                group.members = members
+        return changes
+
+    def _apply_zone_changes(self, new_zone_info):
+        """Update `all_zones` and `visible_zones` to match the new zones, and
+        return the changes."""
+        # pylint: disable=protected-access
+        changes = []
+        for zone in list(self._zone_info):
+            if zone not in new_zone_info:
+                del self._zone_info[zone]
+                self.all_zones.discard(zone)
+                self.visible_zones.discard(zone)
+                changes.append(
+                    ZoneGroupStateChange(ZONE_REMOVED, zone._uid, zone, None)
+                )
+        for zone, info in new_zone_info.items():
+            old_info = self._zone_info.get(zone)
+            if old_info == info:
+                continue
+            self._zone_info[zone] = info
+            group_uid, visible, parent = info
+            if visible:
+                self.visible_zones.add(zone)
+            else:
+                self.visible_zones.discard(zone)
+            if old_info is None:
+                self.all_zones.add(zone)
+                changes.append(ZoneGroupStateChange(ZONE_ADDED, zone._uid, None, zone))
+                continue
+            old_group_uid, old_visible, old_parent = old_info
+            if old_group_uid != group_uid:
+                changes.append(
+                    ZoneGroupStateChange(
+                        ZONE_MOVED, zone._uid, old_group_uid, group_uid
+                    )
+                )
+            if old_visible != visible:
+                changes.append(
+                    ZoneGroupStateChange(
+                        VISIBILITY_CHANGED, zone._uid, old_visible, visible
+                    )
+                )
+            if old_parent is not parent:
+                changes.append(
+                    ZoneGroupStateChange(
+                        SATELLITE_CHANGED, zone._uid, old_parent, parent
+                    )
+                )
+        return changes
+
+
+def zgs_digest(xml):
+    """Return a digest of a raw ZoneGroupState payload."""
+    if isinstance(xml, str):
+        xml = xml.encode("utf-8")
+    return hashlib.sha1(xml).digest()
 
 
 def normalize_zgs_xml(xml):
@@ -11,6 +11,7 @@ from unittest import mock
 
 import pytest
 from soco import SoCo
+from soco.core import _CreatedOnFirstUse
 
 IP_ADDR = "192.168.1.101"
 THISDIR = path.dirname(path.abspath(__file__))
@@ -34,6 +35,12 @@ def moco():
     patchers = [mock.patch(f"soco.core.{service}") for service in services]
     for patch in patchers:
         patch.start()
+    # Services are created on first use, so forget any created with the
+    # mocks of an earlier test
+    for instance in SoCo._instances.get(SoCo._class_group, {}).values():
+        for name, value in vars(SoCo).items():
+            if isinstance(value, _CreatedOnFirstUse):
+                instance.__dict__.pop(name, None)
     with mock.patch(
         "soco.SoCo.is_coordinator", new_callable=mock.PropertyMock
     ) as is_coord:
@@ -1,12 +1,18 @@
 """Tests for the cache module."""
 
-from soco.cache import Cache, NullCache, TimedCache
+import threading
+from time import sleep
+from unittest import mock
+
+import pytest
+
+from soco import config
+from soco.cache import BoundedTimedCache, Cache, NullCache, SingleFlight, TimedCache
+from soco.services import RenderingControl
 
 
 def test_instance_creation():
     assert isinstance(Cache(), TimedCache)
-    from soco import config
-
     config.CACHE_ENABLED = False
     assert isinstance(Cache(), NullCache)
     config.CACHE_ENABLED = True
@@ -14,8 +20,6 @@ def test_instance_creation():
 
 def test_cache_put_get():
     """Test putting items into, and getting them from, the cache."""
-    from time import sleep
-
     cache = Cache()
     cache.put("item", "some", kw="args", timeout=3)
     assert not cache.get("some", "otherargs") == "item"
@@ -80,3 +84,204 @@ def test_cache_disable():
     assert cache.get("args") is None
     # Check it's there
     assert cache.get("some", kw="args") is None
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    in_flight = SingleFlight()
+    started = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        started.set()
+        sleep(0.2)
+        return value * 2
+
+    results = []
+
+    def worker():
+        results.append(in_flight.do("key", slow, 21))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert calls == [21]
+    assert sorted(results) == [(42, False), (42, True), (42, True), (42, True)]
+    assert in_flight.stats == {"calls": 1, "coalesced": 3, "timed_out": 0}
+    # Once the call is complete, a new call is made
+    assert in_flight.do("key", slow, 1) == (2, False)
+    in_flight.reset_stats()
+    assert in_flight.stats == {"calls": 0, "coalesced": 0, "timed_out": 0}
+
+
+def test_single_flight_shares_exceptions():
+    in_flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        sleep(0.2)
+        raise ValueError("Oops")
+
+    def worker():
+        try:
+            in_flight.do("key", failing)
+        except ValueError as error:
+            errors.append(error)
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=worker)
+    follower.start()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2
+    assert errors[0] is errors[1]
+    # The failed call does not linger
+    with pytest.raises(ValueError):
+        in_flight.do("key", failing)
+
+
+def test_single_flight_wait_timeout():
+    in_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def hanging():
+        started.set()
+        release.wait(5)
+        return "leader"
+
+    leader = threading.Thread(target=in_flight.do, args=("key", hanging))
+    leader.start()
+    started.wait()
+    # A follower stops waiting for a hung call, and makes its own
+    assert in_flight.do("key", lambda: "direct", wait_timeout=0.05) == (
+        "direct",
+        False,
+    )
+    release.set()
+    leader.join()
+    # The follower made its own call, so it did not share a result
+    assert in_flight.stats == {"calls": 2, "coalesced": 0, "timed_out": 1}
+
+
+def test_bounded_cache_selection():
+    assert isinstance(Cache(max_entries=10), BoundedTimedCache)
+    config.CACHE_MAX_ENTRIES = 5
+    try:
+        cache = Cache(default_timeout=3)
+        assert isinstance(cache, BoundedTimedCache)
+        assert cache.max_entries == 5
+        assert cache.max_bytes is None
+        assert cache.default_timeout == 3
+    finally:
+        config.CACHE_MAX_ENTRIES = None
+    assert type(Cache()) is TimedCache
+
+
+def test_bounded_cache_lru_eviction():
+    cache = BoundedTimedCache(default_timeout=10, max_entries=2)
+    cache.put("one", 1)
+    cache.put("two", 2)
+    assert cache.get(1) == "one"
+    cache.put("three", 3)
+    assert cache.get(2) is None
+    assert cache.get(1) == "one"
+    assert cache.get(3) == "three"
+    assert cache.stats == {
+        "entries": 2,
+        "bytes": cache.stats["bytes"],
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "expirations": 0,
+    }
+    cache.delete(1)
+    cache.clear()
+    assert cache.stats["entries"] == 0
+    assert cache.stats["bytes"] == 0
+
+
+def test_bounded_cache_max_bytes():
+    cache = BoundedTimedCache(default_timeout=10, max_entries=None, max_bytes=2000)
+    for i in range(10):
+        cache.put("x" * 500, i)
+    stats = cache.stats
+    assert 0 < stats["bytes"] <= 2000
+    assert stats["entries"] < 10
+    assert stats["evictions"] == 10 - stats["entries"]
+    # The most recent item is still there
+    assert cache.get(9) == "x" * 500
+
+
+def test_bounded_cache_expiry():
+    with mock.patch("soco.cache.time", return_value=100):
+        cache = BoundedTimedCache(default_timeout=5, sweep_interval=60)
+        cache.put("item", "short", timeout=1)
+        cache.put("item", "long")
+        # A timeout of 0 means that the item is not stored
+        cache.put("item", "none", timeout=0)
+        assert cache.stats["entries"] == 2
+    with mock.patch("soco.cache.time", return_value=102):
+        # Lazy expiry on lookup
+        assert cache.get("short") is None
+        assert cache.stats["expirations"] == 1
+        assert cache.get("long") == "item"
+    with mock.patch("soco.cache.time", return_value=110):
+        cache.purge_expired()
+        assert cache.stats["entries"] == 0
+        assert cache.stats["expirations"] == 2
+    with mock.patch("soco.cache.time", return_value=200):
+        cache.put("item", "a", timeout=1)
+    with mock.patch("soco.cache.time", return_value=300):
+        # The periodic sweep runs on put
+        cache.put("item", "b")
+        assert cache.stats["entries"] == 1
+
+
+def test_make_key_fast_path():
+    """Typical send_command keys are tuples, and other keys are pickled."""
+    args = [("InstanceID", 0), ("Channel", "Master")]
+    key = TimedCache.make_key(("GetVolume", args), {})
+    assert key == ("GetVolume", (("InstanceID", 0), ("Channel", "Master")))
+    assert hash(key) == hash(TimedCache.make_key(("GetVolume", list(args)), {}))
+
+    # Anything else is pickled
+    for call in (
+        (("GetVolume", [("InstanceID", True)]), {}),
+        (("GetVolume", [("InstanceID", 0.0)]), {}),
+        (("GetVolume", [["InstanceID", 0]]), {}),
+        (("GetVolume", tuple(args)), {}),
+        (("GetVolume", args), {"kw": "args"}),
+        (("some", "args"), {}),
+    ):
+        assert isinstance(TimedCache.make_key(*call), bytes)
+
+    # Values which compare equal but have different types do not collide
+    cache = Cache()
+    cache.put("int", "GetVolume", [("InstanceID", 1)], timeout=3)
+    cache.put("bool", "GetVolume", [("InstanceID", True)], timeout=3)
+    cache.put("str", "GetVolume", [("InstanceID", "1")], timeout=3)
+    assert cache.get("GetVolume", [("InstanceID", 1)]) == "int"
+    assert cache.get("GetVolume", [("InstanceID", True)]) == "bool"
+    assert cache.get("GetVolume", [("InstanceID", "1")]) == "str"
+
+
+def test_send_command_cache_hit_uses_fast_key():
+    """A send_command cache entry is stored under the tuple key."""
+    soco = mock.MagicMock()
+    soco.ip_address = "192.168.1.101"
+    service = RenderingControl(soco)
+    args = [("InstanceID", 0), ("Channel", "Master")]
+    service.cache.put({"CurrentVolume": "25"}, "GetVolume", args, timeout=60)
+    assert list(service.cache._cache) == [("GetVolume", tuple(args))]
+    assert service.send_command("GetVolume", args) == {"CurrentVolume": "25"}
@@ -1,23 +1,34 @@
 import socket
 import select
+import threading
+import time
 import ipaddress
 import ifaddr
 
 from collections import OrderedDict
 
+import requests
+
 from unittest.mock import patch, MagicMock as Mock, call
 
-from soco import discover
+from soco import SoCo, discover
 from soco import config
 from soco.discovery import (
     by_name,
+    contactable,
+    discover_households,
+    discover_iter,
     _find_ipv4_addresses,
     _find_ipv4_networks,
     _check_ip_and_port,
     _is_sonos,
     _sonos_scan_worker_thread,
     scan_network,
+    scan_network_iter,
+    _order_ip_addresses_to_scan,
+    _read_neighbour_table,
 )
+from soco.sessions import session_pool
 
 IP_ADDR = "192.168.1.101"
 TIMEOUT = 5
@@ -70,6 +81,87 @@ class TestDiscover:
         config.SOCO_CLASS.assert_not_called
 
 
+def test_discover_iter(monkeypatch):
+    monkeypatch.setattr("socket.socket", Mock())
+    sock = socket.socket.return_value
+    responses = [
+        (b"SERVER: Sonos/70.3\r\nX-RINCON-HOUSEHOLD: Sonos_H1\r\n", ["10.5.0.1"]),
+        (b"SERVER: Sonos/70.3\r\nX-RINCON-HOUSEHOLD: Sonos_H1\r\n", ["10.5.0.1"]),
+        (b"SERVER: Other/1.0\r\n", ["10.5.0.9"]),
+        (b"SERVER: Sonos/70.3\r\nX-RINCON-HOUSEHOLD: Sonos_H2\r\n", ["10.5.0.2"]),
+    ]
+    sock.recvfrom.side_effect = responses
+    monkeypatch.setattr(
+        "soco.discovery._find_ipv4_addresses", Mock(return_value={"10.5.0.100"})
+    )
+    monkeypatch.setattr("soco.config.SOCO_CLASS", Mock())
+    config.SOCO_CLASS.return_value._household_id = None
+    monkeypatch.setattr("select.select", Mock(return_value=([sock], 1, 1)))
+
+    found = discover_iter(timeout=1)
+    # The first device is yielded before any other response is read
+    zone = next(found)
+    config.SOCO_CLASS.assert_called_once_with("10.5.0.1")
+    assert sock.recvfrom.call_count == 1
+    assert zone._household_id == "Sonos_H1"
+    # Repeats, and responses from other devices, are skipped
+    next(found)
+    config.SOCO_CLASS.assert_called_with("10.5.0.2")
+    assert config.SOCO_CLASS.call_count == 2
+    found.close()
+    sock.close.assert_called_once()
+
+
+def test_discover_households():
+    """Test discover_households with two households answering the search,
+    and a third found by scanning"""
+    households = {
+        "Sonos_H1": ["10.6.0.1", "10.6.0.2", "10.6.0.3"],
+        "Sonos_H2": ["10.6.0.4"],
+        "Sonos_H3": ["10.6.0.5", "10.6.0.6"],
+    }
+    household_of = {
+        ip: household for household, ips in households.items() for ip in ips
+    }
+    zones_of = {
+        household: {SoCo(ip) for ip in ips} for household, ips in households.items()
+    }
+    for ip in ("10.6.0.1", "10.6.0.2", "10.6.0.4"):
+        SoCo(ip)._household_id = household_of[ip]
+    fetched = []
+
+    def all_zones(zone):
+        fetched.append(zone.ip_address)
+        return zones_of[household_of[zone.ip_address]]
+
+    def visible_zones(zone):
+        return {member for member in all_zones(zone) if member.ip_address != "10.6.0.3"}
+
+    def household_id(zone):
+        zone._household_id = household_of[zone.ip_address]
+        return zone._household_id
+
+    responders = [SoCo("10.6.0.1"), SoCo("10.6.0.2"), SoCo("10.6.0.4")]
+    scanned = [SoCo("10.6.0.3"), SoCo("10.6.0.5"), SoCo("10.6.0.6")]
+    with patch("soco.discovery.discover_iter", return_value=iter(responders)), patch(
+        "soco.discovery.scan_network_iter", return_value=iter(scanned)
+    ) as scan, patch.object(SoCo, "all_zones", property(all_zones)), patch.object(
+        SoCo, "visible_zones", property(visible_zones)
+    ), patch.object(
+        SoCo, "household_id", property(household_id)
+    ):
+        found = discover_households(network_scan=True, networks_to_scan=["x"])
+    scan.assert_called_once_with(networks_to_scan=["x"])
+    assert found == {
+        "Sonos_H1": {SoCo("10.6.0.1"), SoCo("10.6.0.2")},
+        "Sonos_H2": {SoCo("10.6.0.4")},
+        "Sonos_H3": zones_of["Sonos_H3"],
+    }
+    # One device in each household was asked for its zones
+    assert sorted(set(fetched)) == ["10.6.0.1", "10.6.0.4", "10.6.0.5"]
+    assert SoCo("10.6.0.6")._household_id == "Sonos_H3"
+
+
 def test_by_name():
     """Test the by_name method"""
     devices = set()
@@ -194,6 +286,136 @@ def test_scan_network(monkeypatch):
         assert scan_network(networks_to_scan=["not_a_network", ""]) is None
 
 
+def test_scan_network_iter(monkeypatch):
+    _setup_sockets(monkeypatch)
+    monkeypatch.setattr(
+        "soco.discovery._is_sonos", lambda ip_address: ip_address != "192.168.0.2"
+    )
+    zones = scan_network_iter(networks_to_scan=["192.168.0.0/28"], max_threads=4)
+    assert [zone.ip_address for zone in zones] == ["192.168.0.1"]
+
+    # Closing the generator stops the scan
+    with patch(
+        "soco.discovery._find_ip_addresses_to_scan",
+        return_value={"192.168.0.1", "192.168.0.2"},
+    ), patch("soco.discovery._sonos_scan_worker_thread") as worker:
+        worker.side_effect = lambda ips, timeout, found, multi: found.append(
+            "192.168.0.1"
+        )
+        zones = scan_network_iter()
+        assert next(zones).ip_address == "192.168.0.1"
+        zones.close()
+    ip_set = worker.call_args[0][0]
+    assert not ip_set
+
+
+def test_contactable(requests_mock):
+    requests_mock.get("http://10.7.0.1:1400/xml/device_description.xml", text="")
+    requests_mock.get(
+        "http://10.7.0.2:1400/xml/device_description.xml",
+        exc=requests.exceptions.ConnectTimeout,
+    )
+    requests_mock.get(
+        "http://10.7.0.3:1400/xml/device_description.xml", status_code=500
+    )
+    speakers = {SoCo("10.7.0.1"), SoCo("10.7.0.2"), SoCo("10.7.0.3")}
+    assert contactable(speakers) == {SoCo("10.7.0.1")}
+    # The set passed in is left alone
+    assert len(speakers) == 3
+    latencies = contactable(speakers, latency=True)
+    assert set(latencies) == speakers
+    assert latencies[SoCo("10.7.0.1")] >= 0
+    assert latencies[SoCo("10.7.0.2")] is None
+    assert contactable(None) == set()
+    assert contactable(set(), latency=True) == {}
+
+
+def test_contactable_deadline():
+    release = threading.Event()
+
+    def probe(speaker, timeout, use_session_pool):
+        if speaker.ip_address == "10.7.0.2":
+            release.wait(5)
+            return 0.01
+        return 0.001
+
+    speakers = {SoCo("10.7.0.1"), SoCo("10.7.0.2")}
+    with patch("soco.discovery._probe_speaker", side_effect=probe) as probe_:
+        start = time.monotonic()
+        found = contactable(speakers, timeout=0.2, use_session_pool=True)
+        release.set()
+    assert time.monotonic() - start < 2
+    assert found == {SoCo("10.7.0.1")}
+    probe_.assert_any_call(SoCo("10.7.0.1"), 0.2, True)
+
+
+def test_contactable_session_pool(requests_mock, monkeypatch):
+    requests_mock.get("http://10.7.0.4:1400/xml/device_description.xml", text="")
+    monkeypatch.setattr(config, "SESSION_POOL_ENABLED", True)
+    try:
+        assert contactable({SoCo("10.7.0.4")}, use_session_pool=True)
+        assert "10.7.0.4" in session_pool
+    finally:
+        session_pool.close("10.7.0.4")
+
+
+NEIGHBOUR_TABLE = """\
+IP address       HW type     Flags       HW address            Mask     Device
+192.168.0.1      0x1         0x2         02:fc:00:00:00:05     *        eth0
+192.168.0.9      0x1         0x2         48:A6:B8:12:34:56     *        eth0
+192.168.0.12     0x1         0x0         00:00:00:00:00:00     *        eth0
+192.168.0.5      0x1         0x2         94:9f:3e:00:00:01     *        eth0
+10.0.0.7         0x1         0x2         5c:aa:fd:00:00:02     *        eth1
+"""
+
+
+def test_read_neighbour_table(tmp_path):
+    path = tmp_path / "arp"
+    path.write_text(NEIGHBOUR_TABLE, encoding="ascii")
+    assert _read_neighbour_table(str(path)) == {
+        "192.168.0.1": "02:fc:00:00:00:05",
+        "192.168.0.9": "48:a6:b8:12:34:56",
+        "192.168.0.5": "94:9f:3e:00:00:01",
+        "10.0.0.7": "5c:aa:fd:00:00:02",
+    }
+    assert _read_neighbour_table(str(tmp_path / "missing")) == {}
+    # Malformed lines are skipped
+    path.write_text(
+        NEIGHBOUR_TABLE
+        + "192.168.0.7      0x1         bogus       02:00:00:00:00:07\n",
+        encoding="ascii",
+    )
+    assert "192.168.0.7" not in _read_neighbour_table(str(path))
+    assert "192.168.0.9" in _read_neighbour_table(str(path))
+
+
+def test_scan_order(tmp_path, monkeypatch):
+    path = tmp_path / "arp"
+    path.write_text(NEIGHBOUR_TABLE, encoding="ascii")
+    monkeypatch.setattr("soco.discovery.NEIGHBOUR_TABLE", str(path))
+    ip_set = set(ipaddress.ip_network("192.168.0.0/28"))
+    ordered = [str(ip) for ip in _order_ip_addresses_to_scan(ip_set)]
+    # Sonos neighbours, then other neighbours, then the rest
+    assert ordered[:4] == ["192.168.0.5", "192.168.0.9", "192.168.0.1", "192.168.0.0"]
+    assert sorted(ordered) == sorted(str(ip) for ip in ip_set)
+
+    # The scan stops at the first Sonos neighbour, having probed nothing else
+    probed = []
+
+    def check(ip_address, port, timeout):
+        probed.append(ip_address)
+        return ip_address in ("192.168.0.5", "192.168.0.14")
+
+    with patch("soco.discovery._check_ip_and_port", side_effect=check), patch(
+        "soco.discovery._is_sonos", return_value=True
+    ), patch("soco.config.SOCO_CLASS", new=Mock()):
+        config.SOCO_CLASS.return_value.visible_zones = {"192.168.0.5"}
+        assert scan_network(networks_to_scan=["192.168.0.0/28"], max_threads=1) == {
+            "192.168.0.5"
+        }
+    assert probed == ["192.168.0.5"]
+
+
 # Helper functions for scan_network() tests
 
 
@@ -0,0 +1,312 @@
+"""Tests for the discovery_asyncio module."""
+
+import asyncio
+import socket
+from unittest import mock
+
+import pytest
+
+from soco import SoCo
+from soco import discovery_asyncio
+from soco.zonegroupstate import ZoneGroupState
+
+pytest.importorskip("aiohttp")
+
+
+class FakeAsyncResponse:
+    """A stand-in for an aiohttp ClientResponse."""
+
+    def __init__(self, status, text):
+        self.status = status
+        self._text = text
+
+    async def text(self):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def test_check_ip_and_port():
+    async def run():
+        server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            is_open = await discovery_asyncio._check_ip_and_port("127.0.0.1", port, 0.5)
+        server.close()
+        await server.wait_closed()
+        is_closed = not await discovery_asyncio._check_ip_and_port(
+            "127.0.0.1", port, 0.5
+        )
+        return is_open, is_closed
+
+    assert asyncio.run(run()) == (True, True)
+
+
+@pytest.mark.parametrize(
+    "status, text, expected",
+    [
+        (200, "<root><manufacturer>Sonos, Inc.</manufacturer></root>", True),
+        (200, "<root><manufacturer>Other</manufacturer></root>", False),
+        (404, "", False),
+    ],
+)
+def test_is_sonos(status, text, expected):
+    session = mock.Mock()
+    session.get.return_value = FakeAsyncResponse(status, text)
+    assert asyncio.run(discovery_asyncio._is_sonos("10.2.0.1", session)) is expected
+    session.get.assert_called_once_with(
+        "http://10.2.0.1:1400/xml/device_description.xml", timeout=mock.ANY
+    )
+
+
+@pytest.fixture()
+def fake_network():
+    """Fake the probes of addresses 10.2.0.0/28, with Sonos devices in two
+    households at .3, .4 and .9."""
+    households = {
+        "10.2.0.3": "H1",
+        "10.2.0.4": "H1",
+        "10.2.0.9": "H2",
+    }
+    states = {"H1": ZoneGroupState(), "H2": ZoneGroupState()}
+    for ip_address, household in households.items():
+        states[household].all_zones.add(SoCo(ip_address))
+    states["H1"].visible_zones.add(SoCo("10.2.0.3"))
+    states["H2"].visible_zones.add(SoCo("10.2.0.9"))
+    fetched = []
+
+    async def check(ip_address, port, timeout):
+        await asyncio.sleep(0)
+        return ip_address in households or ip_address == "10.2.0.5"
+
+    async def is_sonos(ip_address, session):
+        return ip_address != "10.2.0.5"
+
+    async def fetch(zone, session):
+        fetched.append(zone)
+        return states[households[zone.ip_address]]
+
+    with mock.patch.object(
+        discovery_asyncio, "_check_ip_and_port", side_effect=check
+    ), mock.patch.object(
+        discovery_asyncio, "_is_sonos", side_effect=is_sonos
+    ), mock.patch.object(
+        discovery_asyncio, "_fetch_zone_group_state", side_effect=fetch
+    ):
+        yield fetched
+
+
+def test_scan_network_multi_household(fake_network):
+    zones = asyncio.run(
+        discovery_asyncio.scan_network(
+            multi_household=True, networks_to_scan=["10.2.0.0/28"], max_concurrency=3
+        )
+    )
+    assert zones == {SoCo("10.2.0.3"), SoCo("10.2.0.9")}
+    # Only one device per household is asked for the topology
+    assert len(fake_network) == 2
+    zones = asyncio.run(
+        discovery_asyncio.scan_network(
+            include_invisible=True,
+            multi_household=True,
+            networks_to_scan=["10.2.0.0/28"],
+        )
+    )
+    assert zones == {SoCo("10.2.0.3"), SoCo("10.2.0.4"), SoCo("10.2.0.9")}
+
+
+def test_scan_network_stops_at_first_device(fake_network):
+    zones = asyncio.run(
+        discovery_asyncio.scan_network(networks_to_scan=["10.2.0.0/28"])
+    )
+    assert len(fake_network) == 1
+    assert zones in ({SoCo("10.2.0.3")}, {SoCo("10.2.0.9")})
+
+
+def test_scan_network_finds_nothing(fake_network):
+    assert (
+        asyncio.run(discovery_asyncio.scan_network(networks_to_scan=["10.3.0.0/28"]))
+        is None
+    )
+
+
+def test_scan_network_waits_for_file_handles(fake_network):
+    calls = []
+
+    async def check(ip_address, port, timeout):
+        calls.append(ip_address)
+        if len(calls) == 1:
+            raise OSError("Too many open files")
+        return ip_address == "10.2.0.3"
+
+    with mock.patch.object(
+        discovery_asyncio, "_check_ip_and_port", side_effect=check
+    ), mock.patch("asyncio.sleep", new_callable=mock.AsyncMock):
+        zones = asyncio.run(
+            discovery_asyncio.scan_network(
+                networks_to_scan=["10.2.0.3/32"], max_concurrency=1
+            )
+        )
+    assert calls == ["10.2.0.3", "10.2.0.3"]
+    assert zones == {SoCo("10.2.0.3")}
+
+
+def test_scan_network_iter(fake_network):
+    async def collect(limit=None):
+        found = []
+        async for zone in discovery_asyncio.scan_network_iter(
+            networks_to_scan=["10.2.0.0/28"], max_concurrency=4
+        ):
+            found.append(zone)
+            if len(found) == limit:
+                break
+        return found
+
+    zones = asyncio.run(collect())
+    assert set(zones) == {SoCo("10.2.0.3"), SoCo("10.2.0.4"), SoCo("10.2.0.9")}
+    # The topology is not fetched
+    assert not fake_network
+    # Stopping early cancels the scan
+    assert len(asyncio.run(collect(limit=1))) == 1
+
+
+class FakeResponder(asyncio.DatagramProtocol):
+    """Answer each search with the responses of some Sonos devices."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.transport = None
+        self.searches = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.searches += 1
+        for response in self.responses:
+            self.transport.sendto(response, addr)
+
+
+@pytest.fixture()
+def fake_search(monkeypatch):
+    """Send searches to a fake responder on the loopback interface, and fake
+    the zone group state of the devices which respond."""
+    states = {}
+    fetched = []
+
+    def create_search_socket(address):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        return sock
+
+    async def fetch(zone, session):
+        fetched.append(zone)
+        return states[zone._household_id]
+
+    monkeypatch.setattr(discovery_asyncio, "MCAST_GRP", "127.0.0.1")
+    monkeypatch.setattr(discovery_asyncio, "create_search_socket", create_search_socket)
+    monkeypatch.setattr(
+        discovery_asyncio, "_find_ipv4_addresses", lambda: {"10.8.0.100"}
+    )
+    monkeypatch.setattr(discovery_asyncio, "_fetch_zone_group_state", fetch)
+
+    async def run(coro, responses):
+        loop = asyncio.get_running_loop()
+        transport, responder = await loop.create_datagram_endpoint(
+            lambda: FakeResponder(responses), local_addr=("127.0.0.1", 0)
+        )
+        monkeypatch.setattr(
+            discovery_asyncio, "MCAST_PORT", transport.get_extra_info("sockname")[1]
+        )
+        try:
+            return await coro
+        finally:
+            transport.close()
+
+    return run, states, fetched
+
+
+def response(household, server="Sonos/70.3"):
+    """Return a search response."""
+    return (
+        f"HTTP/1.1 200 OK\r\nSERVER: Linux UPnP/1.0 {server}\r\n"
+        f"X-RINCON-HOUSEHOLD: {household}\r\n\r\n"
+    ).encode("utf-8")
+
+
+def test_discover(fake_search):
+    run, states, fetched = fake_search
+    state = states["Sonos_H8"] = ZoneGroupState()
+    kitchen = SoCo("127.0.0.1")
+    den = SoCo("10.8.0.2")
+    kitchen._player_name = "Kitchen"
+    den._player_name = "Den"
+    state.all_zones.update({kitchen, den, SoCo("10.8.0.3")})
+    state.visible_zones.update({kitchen, den})
+    responses = [response("Other_H1", server="Other/1.0"), response("Sonos_H8")]
+
+    zones = asyncio.run(run(discovery_asyncio.discover(timeout=2), responses))
+    assert zones == {kitchen, den}
+    assert fetched == [kitchen]
+    assert kitchen._household_id == "Sonos_H8"
+    assert (
+        len(
+            asyncio.run(
+                run(discovery_asyncio.discover(include_invisible=True), responses)
+            )
+        )
+        == 3
+    )
+    found = asyncio.run(run(discovery_asyncio.by_name("Den"), responses))
+    assert found is den
+    assert asyncio.run(run(discovery_asyncio.by_name("Attic"), responses)) is None
+    assert (
+        asyncio.run(
+            run(
+                discovery_asyncio.discover(timeout=0.2, household_id="Sonos_X"),
+                responses,
+            )
+        )
+        is None
+    )
+
+
+def test_discover_falls_back_to_scan(fake_search):
+    run, _, _ = fake_search
+    zones = {SoCo("10.8.0.5"), SoCo("10.8.0.6")}
+    SoCo("10.8.0.5")._household_id = "Sonos_H9"
+    with mock.patch.object(
+        discovery_asyncio, "scan_network", new=mock.AsyncMock(return_value=zones)
+    ) as scan:
+        found = asyncio.run(
+            run(
+                discovery_asyncio.discover(
+                    timeout=0.1,
+                    household_id="Sonos_H9",
+                    allow_network_scan=True,
+                    scan_timeout=0.1,
+                ),
+                [],
+            )
+        )
+    assert found == {SoCo("10.8.0.5")}
+    scan.assert_awaited_once_with(
+        include_invisible=False, multi_household=True, scan_timeout=0.1
+    )
+
+
+def test_any_soco_uses_known_instances():
+    zone = SoCo("10.8.0.7")
+    zone._household_id = "Sonos_H7"
+    state = SoCo.zone_group_states["Sonos_H7"] = ZoneGroupState()
+    state.visible_zones.add(zone)
+    try:
+        with mock.patch.object(discovery_asyncio, "discover") as discover:
+            assert asyncio.run(discovery_asyncio.any_soco()) is not None
+        discover.assert_not_called()
+    finally:
+        del SoCo.zone_group_states["Sonos_H7"]
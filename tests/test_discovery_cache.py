@@ -0,0 +1,139 @@
+"""Tests for the discovery_cache module."""
+
+import json
+from unittest import mock
+
+import pytest
+
+from soco import SoCo
+from soco import config
+from soco import discovery
+from soco.discovery_cache import CACHE_VERSION, DiscoveryCache
+
+DESCRIPTION = """<?xml version="1.0" encoding="utf-8" ?>
+<root xmlns="urn:schemas-upnp-org:device-1-0"><device>
+<roomName>{name}</roomName><modelName>Sonos One</modelName>
+<UDN>uuid:{uid}</UDN>
+</device></root>"""
+
+
+def make_zone(ip_address, uid, name):
+    """Return a SoCo instance with the attributes discovery would give it."""
+    # pylint: disable=protected-access
+    zone = SoCo(ip_address)
+    zone._uid = uid
+    zone._player_name = name
+    return zone
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    """A cache holding one household of three zones, one invisible."""
+    cache = DiscoveryCache(str(tmp_path / "soco" / "discovery_cache.json"))
+    zones = {
+        make_zone("10.4.0.1", "RINCON_A", "Kitchen"),
+        make_zone("10.4.0.2", "RINCON_B", "Den"),
+        make_zone("10.4.0.3", "RINCON_C", "Bridge"),
+    }
+    visible = {zone for zone in zones if zone.ip_address != "10.4.0.3"}
+    with mock.patch("soco.discovery_cache.time.time", return_value=1000.0):
+        cache.record(zones, visible, "Sonos_H1")
+    return cache
+
+
+def test_record_and_reload(cache):
+    reloaded = DiscoveryCache(cache.filepath)
+    assert reloaded.entries == cache.entries
+    entry = reloaded.entries["RINCON_A"]
+    assert entry == {
+        "ip_address": "10.4.0.1",
+        "uid": "RINCON_A",
+        "household_id": "Sonos_H1",
+        "player_name": "Kitchen",
+        "model_name": None,
+        "is_visible": True,
+        "last_seen": 1000.0,
+    }
+    # Recording a household replaces its previous entries
+    cache.record({make_zone("10.4.0.1", "RINCON_A", "Kitchen")}, None, "Sonos_H1")
+    assert set(DiscoveryCache(cache.filepath).entries) == {"RINCON_A"}
+
+
+def test_unreadable_files_are_ignored(tmp_path):
+    filepath = tmp_path / "discovery_cache.json"
+    filepath.write_text("{not json", encoding="utf-8")
+    assert DiscoveryCache(str(filepath)).entries == {}
+    filepath.write_text(
+        json.dumps({"version": CACHE_VERSION + 1, "zones": {"X": {}}}),
+        encoding="utf-8",
+    )
+    assert DiscoveryCache(str(filepath)).entries == {}
+
+
+def test_zones_and_by_name(cache):
+    cache.record({make_zone("10.4.0.9", "RINCON_Z", "Attic")}, None, "Sonos_H2")
+    # The household seen most recently
+    assert cache.zones() == {SoCo("10.4.0.9")}
+    assert cache.zones("Sonos_H1") == {SoCo("10.4.0.1"), SoCo("10.4.0.2")}
+    assert len(cache.zones("Sonos_H1", include_invisible=True)) == 3
+    assert cache.zones("Sonos_H3") == set()
+    assert cache.by_name("Den") is SoCo("10.4.0.2")
+    assert cache.by_name("Den", household_id="Sonos_H2") is None
+    assert cache.by_name("Bridge") is None
+
+
+def test_validate(cache, requests_mock):
+    requests_mock.get(
+        "http://10.4.0.1:1400/xml/device_description.xml",
+        text=DESCRIPTION.format(name="Kitchen 2", uid="RINCON_A"),
+    )
+    # Another speaker now has this address
+    requests_mock.get(
+        "http://10.4.0.2:1400/xml/device_description.xml",
+        text=DESCRIPTION.format(name="Den", uid="RINCON_X"),
+    )
+    requests_mock.get(
+        "http://10.4.0.3:1400/xml/device_description.xml", status_code=404
+    )
+    assert cache.validate() == {"RINCON_B", "RINCON_C"}
+    entries = DiscoveryCache(cache.filepath).entries
+    assert list(entries) == ["RINCON_A"]
+    assert entries["RINCON_A"]["player_name"] == "Kitchen 2"
+    assert entries["RINCON_A"]["model_name"] == "Sonos One"
+    assert entries["RINCON_A"]["last_seen"] > 1000.0
+
+
+def test_discover_and_by_name_use_the_cache(cache, monkeypatch):
+    monkeypatch.setattr(config, "DISCOVERY_CACHE", cache)
+    with mock.patch.object(cache, "validate_in_background") as validate, mock.patch(
+        "soco.discovery._find_ipv4_addresses", return_value=set()
+    ) as find_addresses:
+        assert discovery.discover() == {SoCo("10.4.0.1"), SoCo("10.4.0.2")}
+        assert discovery.discover(household_id="Sonos_H2") is None
+        assert discovery.by_name("Kitchen") is SoCo("10.4.0.1")
+    assert validate.call_count == 2
+    # Only the search for another household used the network
+    assert find_addresses.call_count == 1
+
+
+def test_discover_records_in_the_cache(tmp_path, monkeypatch):
+    cache = DiscoveryCache(str(tmp_path / "discovery_cache.json"))
+    monkeypatch.setattr(config, "DISCOVERY_CACHE", cache)
+    zone = make_zone("10.4.0.5", "RINCON_E", "Office")
+    sock = mock.Mock()
+    sock.recvfrom.return_value = (
+        b"HTTP/1.1 200 OK\r\nSERVER: Linux UPnP/1.0 Sonos/70.3\r\n"
+        b"X-RINCON-HOUSEHOLD: Sonos_H5\r\n\r\n",
+        ("10.4.0.5", 1900),
+    )
+    with mock.patch("socket.socket", return_value=sock), mock.patch(
+        "soco.discovery._find_ipv4_addresses", return_value={"10.4.0.100"}
+    ), mock.patch("select.select", return_value=([sock], [], [])), mock.patch.object(
+        SoCo, "all_zones", new_callable=mock.PropertyMock, return_value={zone}
+    ), mock.patch.object(
+        SoCo, "visible_zones", new_callable=mock.PropertyMock, return_value={zone}
+    ):
+        assert discovery.discover() == {zone}
+    entry = DiscoveryCache(cache.filepath).entries["RINCON_E"]
+    assert entry["household_id"] == "Sonos_H5"
+    assert entry["player_name"] == "Office"
@@ -1,13 +1,30 @@
 """Tests for the services module."""
 
+import http.client
+import queue
+import threading
+import time
+from unittest import mock
+
 import pytest
 
 from soco.data_structures import DidlAudioLineIn
-from soco.events_base import Event, parse_event_xml
+from soco import config, events
+from soco.data_structures import DidlMusicTrack
+from soco.data_structures_entry import from_didl_string
+from soco.events_base import (
+    Event,
+    EventQueue,
+    EventVariables,
+    parse_event_xml,
+    variable_name,
+)
+from soco.exceptions import SoCoFault
 
 from conftest import DataLoader
 
 DATA_LOADER = DataLoader("data_structures_entry_integration")
+EVENTS_LOADER = DataLoader("events")
 
 
 DUMMY_EVENT = """
@@ -124,3 +141,418 @@ def test_event_parsing_null_value():
     # Before the fix this raised AttributeError: 'NoneType' has no attribute 'startswith'
     result = parse_event_xml(event_xml)
     assert result["current_track_uri"] is None
+
+
+def test_event_parsing_recorded_events():
+    result = parse_event_xml(EVENTS_LOADER.load_xml("av_transport.xml").encode())
+    assert len(result) == 36
+    assert result["transport_state"] == "PLAYING"
+    assert result["next_track_uri"].startswith("x-sonos-http:librarytrack")
+    track = result["current_track_meta_data"]
+    assert isinstance(track, DidlMusicTrack)
+    assert track.title == "Dancing Queen"
+    assert result["enqueued_transport_uri_meta_data"] == ""
+
+    result = parse_event_xml(EVENTS_LOADER.load_xml("rendering_control.xml"))
+    assert result["volume"] == {"Master": "23", "LF": "100", "RF": "100"}
+    assert result["loudness"] == {"Master": "1"}
+    assert result["sub_enabled"] == "1"
+
+    result = parse_event_xml(EVENTS_LOADER.load_xml("queue.xml"))
+    assert result == {"update_id": "37", "curated": "0"}
+
+    result = parse_event_xml(EVENTS_LOADER.load_xml("zone_group_topology.xml"))
+    assert result["zone_group_state"].startswith("<ZoneGroupState>")
+    assert result["muse_household_id"].startswith("Sonos_")
+
+    result = parse_event_xml(EVENTS_LOADER.load_xml("content_directory.xml"))
+    assert result["container_update_i_ds"] == "Q:0,37"
+    assert result["share_index_last_error"] is None
+
+
+def test_event_parsing_ignores_comments():
+    event_xml = (
+        '<?xml version="1.0"?>'
+        '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">'
+        "<!-- a comment -->"
+        "<e:property><!-- another --><ZoneGroupName>Den</ZoneGroupName>"
+        "</e:property>"
+        "</e:propertyset>"
+    )
+    assert parse_event_xml(event_xml) == {"zone_group_name": "Den"}
+
+
+def test_variable_name():
+    variable_name.cache_clear()
+    tag = "{urn:schemas-rinconnetworks-com:metadata-1-0/}NextTrackURI"
+    assert variable_name(tag) == "next_track_uri"
+    assert variable_name("CurrentTrackMetaData") == "current_track_meta_data"
+    assert variable_name(tag) == "next_track_uri"
+    assert variable_name.cache_info().hits == 1
+
+
+def test_event_metadata_is_parsed_when_read():
+    body = EVENTS_LOADER.load_xml("av_transport.xml").encode()
+    with mock.patch(
+        "soco.events_base.from_didl_string", wraps=from_didl_string
+    ) as parse_didl:
+        result = parse_event_xml.__wrapped__(body)
+        assert isinstance(result, EventVariables)
+        assert result["transport_state"] == "PLAYING"
+        assert result.raw("current_track_meta_data").startswith("<DIDL-Lite")
+        assert not parse_didl.called
+        event = Event("sid", "1", "service", 0.0, result)
+        track = event.current_track_meta_data
+        assert track.title == "Dancing Queen"
+        assert parse_didl.call_count == 1
+        # The parsed object is kept
+        assert result["current_track_meta_data"] is track
+        assert result.raw("current_track_meta_data") is track
+        copied = dict(result)
+        assert parse_didl.call_count == 2
+    assert copied["next_track_meta_data"].title == "Knowing Me, Knowing You"
+    assert copied == result
+    assert {**result} == result
+
+
+def test_event_illegal_metadata_is_a_fault():
+    event_xml = (
+        '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">'
+        "<e:property>"
+        "<LastChange>"
+        '&lt;Event xmlns="urn:schemas-upnp-org:metadata-1-0/AVT/"&gt;'
+        '&lt;InstanceID val="0"&gt;'
+        '&lt;CurrentTrackMetaData val="&amp;lt;DIDL-Lite xmlns=&amp;quot;'
+        "urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/&amp;quot;&amp;gt;"
+        '&amp;lt;oops/&amp;gt;&amp;lt;/DIDL-Lite&amp;gt;"/&gt;'
+        "&lt;/InstanceID&gt;"
+        "&lt;/Event&gt;"
+        "</LastChange>"
+        "</e:property>"
+        "</e:propertyset>"
+    )
+    result = parse_event_xml.__wrapped__(event_xml)
+    assert result.raw("current_track_meta_data").endswith("<oops/></DIDL-Lite>")
+    fault = result.get("current_track_meta_data")
+    assert isinstance(fault, SoCoFault)
+    assert fault.exception.tag == "current_track_meta_data"
+    assert list(result.values()) == [fault]
+
+
+def make_event(sid, seq, **variables):
+    return Event(sid, str(seq), "service", float(seq), EventVariables(variables))
+
+
+def test_event_queue_drop_oldest():
+    event_queue = EventQueue(maxsize=2, overflow=EventQueue.DROP_OLDEST)
+    for seq in range(5):
+        event_queue.put(make_event("sid", seq, volume=str(seq)))
+    assert event_queue.dropped == 3
+    assert [event_queue.get().seq, event_queue.get().seq] == ["3", "4"]
+    assert event_queue.empty()
+    # The dropped events don't need task_done calls
+    event_queue.task_done()
+    event_queue.task_done()
+    event_queue.join()
+
+
+def test_event_queue_block():
+    event_queue = EventQueue(maxsize=1)
+    event_queue.put(make_event("sid", 1))
+    with pytest.raises(queue.Full):
+        event_queue.put(make_event("sid", 2), timeout=0.01)
+    with pytest.raises(queue.Full):
+        event_queue.put(make_event("sid", 3), block=False)
+    assert event_queue.dropped == 2
+    putter = threading.Thread(target=event_queue.put, args=(make_event("sid", 4),))
+    putter.start()
+    assert event_queue.get().seq == "1"
+    putter.join(1)
+    assert event_queue.get().seq == "4"
+    with pytest.raises(ValueError):
+        EventQueue(overflow="sometimes")
+
+
+def test_event_queue_coalesce():
+    event_queue = EventQueue(maxsize=2, coalesce=True)
+    event_queue.put(make_event("a", 1, volume={"Master": "10", "LF": "100"}, mute="0"))
+    event_queue.put(make_event("b", 1, transport_state="PLAYING"))
+    # Merging doesn't need room in the queue
+    event_queue.put(make_event("a", 2, volume={"Master": "11"}), block=False)
+    event_queue.put(make_event("a", 3, volume={"Master": "12"}, mute="1"), block=False)
+    assert event_queue.coalesced == 2
+    first = event_queue.get()
+    assert first.seq == "3"
+    assert first.timestamp == 3.0
+    assert first.variables == {"volume": {"Master": "12", "LF": "100"}, "mute": "1"}
+    # Once the event has been taken, the next one is queued again
+    event_queue.put(make_event("a", 4, mute="0"))
+    assert event_queue.get().sid == "b"
+    assert event_queue.get().variables == {"mute": "0"}
+    assert event_queue.coalesced == 2
+    assert event_queue.dropped == 0
+    # Items which are not events are queued as usual
+    event_queue.put("not an event")
+    assert event_queue.get() == "not an event"
+
+
+NOTIFY_BODY = (
+    '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">'
+    "<e:property><ZoneGroupName>Den {}</ZoneGroupName></e:property>"
+    "</e:propertyset>"
+)
+
+
+@pytest.fixture()
+def fake_subscription():
+    """A subscription which records the events sent to it, and the threads
+    which sent them."""
+    subscription = mock.Mock()
+    subscription.service.service_id = "ZoneGroupTopology"
+    received = []
+
+    def send_event(event):
+        received.append((event.seq, threading.current_thread().name))
+
+    subscription.send_event.side_effect = send_event
+    with mock.patch.object(
+        events.subscriptions_map, "get_subscription", return_value=subscription
+    ):
+        yield received
+
+
+def notify(connection, seq):
+    """Send a NOTIFY on a connection, and return the response status."""
+    body = NOTIFY_BODY.format(seq).encode()
+    connection.request(
+        "NOTIFY", "/", body=body, headers={"SID": "uuid:sub1", "SEQ": str(seq)}
+    )
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def start_pooled_server(workers=2):
+    """Start a pooled event server, and return it."""
+    server = events.PooledEventServer(
+        ("127.0.0.1", 0), events.PooledEventNotifyHandler, workers=workers, backlog=2
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_pooled_event_server(fake_subscription, monkeypatch):
+    monkeypatch.setattr(config, "EVENT_SERVER_KEEPALIVE_TIMEOUT", 1.0)
+    server = start_pooled_server()
+    try:
+        connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+        # Several events over one kept-alive connection
+        assert [notify(connection, seq) for seq in range(3)] == [200] * 3
+        other = http.client.HTTPConnection(*server.server_address, timeout=5)
+        assert notify(other, 3) == 200
+        connection.close()
+        other.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [seq for seq, _ in fake_subscription] == ["0", "1", "2", "3"]
+    threads = {thread for _, thread in fake_subscription}
+    assert threads <= {"EventServerWorker-0", "EventServerWorker-1"}
+
+
+def test_pooled_event_server_idle_connections(fake_subscription, monkeypatch):
+    monkeypatch.setattr(config, "EVENT_SERVER_KEEPALIVE_TIMEOUT", 0.5)
+    server = start_pooled_server(workers=1)
+    try:
+        idle = http.client.HTTPConnection(*server.server_address, timeout=5)
+        assert notify(idle, 0) == 200
+        # The idle connection does not hold on to the only worker
+        other = http.client.HTTPConnection(*server.server_address, timeout=0.3)
+        assert notify(other, 1) == 200
+        # The idle connection is still usable
+        assert notify(idle, 2) == 200
+        # until it has been idle for too long
+        time.sleep(1)
+        assert idle.sock.recv(1) == b""
+        idle.close()
+        other.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert [seq for seq, _ in fake_subscription] == ["0", "1", "2"]
+
+
+def test_sequence_buffer():
+    buffer = events.SequenceBuffer()
+    delivered = []
+
+    def add(seq, timeout=1.0):
+        buffer.add("sid", str(seq), lambda: delivered.append(seq), timeout)
+
+    add(0)
+    # Event 2 overtakes event 1, and is held back without waiting
+    add(2)
+    assert delivered == [0]
+    add(1)
+    assert delivered == [0, 1, 2]
+    # A missing event is only waited for until the timeout
+    add(4, timeout=0.05)
+    add(5, timeout=0.05)
+    assert delivered == [0, 1, 2]
+    time.sleep(0.3)
+    assert delivered == [0, 1, 2, 4, 5]
+    # A late event is delivered at once
+    add(3)
+    # Sequence numbers which can't be parsed are not ordered
+    buffer.add("sid", None, lambda: delivered.append(None))
+    assert delivered == [0, 1, 2, 4, 5, 3, None]
+
+
+def test_event_listener_uses_pooled_server(monkeypatch):
+    monkeypatch.setattr(config, "EVENT_SERVER_WORKERS", 2)
+    listener = events.EventListener()
+    listener.requested_port_number = 0
+    listener.listen("127.0.0.1")
+    # pylint: disable=protected-access
+    server = listener._listener_thread.server
+    assert isinstance(server, events.PooledEventServer)
+    listener.stop_listening(server.server_address)
+    assert not listener._listener_thread.is_alive()
+
+
+def wait_for(condition, timeout=5):
+    """Wait for a condition to become true, returning whether it did."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_renewal_scheduler(monkeypatch):
+    monkeypatch.setattr(config, "AUTO_RENEW_JITTER", 0)
+    scheduler = events.RenewalScheduler()
+    first, second = mock.Mock(), mock.Mock()
+    scheduler.schedule(first, 0.02)
+    scheduler.schedule(second, 0.03)
+    assert len(scheduler) == 2
+    assert wait_for(lambda: first.renew.call_count >= 2)
+    assert wait_for(lambda: second.renew.call_count >= 2)
+    first.renew.assert_called_with(is_autorenew=True, strict=False)
+
+    scheduler.cancel(first)
+    scheduler.cancel(second)
+    # Cancelling twice is harmless
+    scheduler.cancel(second)
+    assert len(scheduler) == 0
+    time.sleep(0.05)
+    count = first.renew.call_count
+    time.sleep(0.05)
+    assert first.renew.call_count == count
+    renewers = [
+        thread
+        for thread in threading.enumerate()
+        if thread.name == "SubscriptionRenewer"
+    ]
+    assert scheduler._thread in renewers  # pylint: disable=protected-access
+
+
+def test_renewal_scheduler_jitter(monkeypatch):
+    monkeypatch.setattr(config, "AUTO_RENEW_JITTER", 0.5)
+    monkeypatch.setattr(events.random, "random", lambda: 1.0)
+    scheduler = events.RenewalScheduler()
+    subscription = mock.Mock()
+    before = time.monotonic()
+    scheduler.schedule(subscription, 100)
+    # pylint: disable=protected-access
+    due = scheduler._entries[subscription][0]
+    assert before + 50 <= due <= time.monotonic() + 50
+    # Scheduling again replaces the entry
+    scheduler.schedule(subscription, 100)
+    assert len(scheduler) == 1
+    scheduler.cancel(subscription)
+
+
+def test_renewal_scheduler_pool_is_bounded(monkeypatch):
+    monkeypatch.setattr(config, "AUTO_RENEW_JITTER", 0)
+    monkeypatch.setattr(config, "AUTO_RENEW_WORKERS", 2)
+    scheduler = events.RenewalScheduler()
+    lock = threading.Lock()
+    running = []
+    peak = []
+    release = threading.Event()
+
+    def renew(**_):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        release.wait(5)
+        with lock:
+            running.pop()
+
+    subscriptions = [mock.Mock(renew=renew) for _ in range(5)]
+    for subscription in subscriptions:
+        scheduler.schedule(subscription, 0.01)
+    assert wait_for(lambda: len(peak) >= 2)
+    time.sleep(0.05)
+    assert max(peak) == 2
+    for subscription in subscriptions:
+        scheduler.cancel(subscription)
+    release.set()
+
+
+def test_renewal_scheduler_logs_errors(monkeypatch, caplog):
+    monkeypatch.setattr(config, "AUTO_RENEW_JITTER", 0)
+    scheduler = events.RenewalScheduler()
+    subscription = mock.Mock(sid="uuid:failing")
+    subscription.renew.side_effect = RuntimeError("Boom")
+    scheduler.schedule(subscription, 0.01)
+    # A failed renewal is logged, and the subscription is still scheduled
+    assert wait_for(lambda: subscription.renew.call_count >= 2)
+    scheduler.cancel(subscription)
+    assert "Error auto renewing subscription uuid:failing" in caplog.text
+    assert "Boom" in caplog.text
+
+
+def test_subscription_auto_renew_uses_scheduler(monkeypatch):
+    monkeypatch.setattr(config, "AUTO_RENEW_JITTER", 0)
+    subscription = events.Subscription(mock.Mock())
+    subscription.renewal_scheduler = events.RenewalScheduler()
+    monkeypatch.setattr(subscription, "renew", mock.Mock())
+    # pylint: disable=protected-access
+    subscription._auto_renew_start(0.01)
+    assert wait_for(lambda: subscription.renew.called)
+    subscription._auto_renew_cancel()
+    assert len(subscription.renewal_scheduler) == 0
+    assert isinstance(events.renewal_scheduler, events.RenewalScheduler)
+
+
+def test_busy_pooled_server_can_be_stopped(monkeypatch):
+    monkeypatch.setattr(config, "EVENT_SERVER_WORKERS", 1)
+    monkeypatch.setattr(config, "EVENT_SERVER_BACKLOG", 0)
+    release = threading.Event()
+    subscription = mock.Mock()
+    subscription.service.service_id = "ZoneGroupTopology"
+    subscription.send_event.side_effect = lambda event: release.wait(5)
+    listener = events.EventListener()
+    listener.requested_port_number = 0
+    listener.listen("127.0.0.1")
+    # pylint: disable=protected-access
+    server = listener._listener_thread.server
+    with mock.patch.object(
+        events.subscriptions_map, "get_subscription", return_value=subscription
+    ):
+        # Occupy the only worker
+        busy = http.client.HTTPConnection(*server.server_address, timeout=5)
+        sender = threading.Thread(target=notify, args=(busy, 0), daemon=True)
+        sender.start()
+        assert wait_for(lambda: subscription.send_event.called)
+        # Further connections are refused, rather than blocking the server
+        refused = http.client.HTTPConnection(*server.server_address, timeout=5)
+        assert notify(refused, 1) == 503
+        listener.stop_listening(server.server_address)
+        assert not listener._listener_thread.is_alive()
+        release.set()
+        sender.join(5)
+        busy.close()
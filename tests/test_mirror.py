@@ -0,0 +1,275 @@
+"""Tests for the mirror module."""
+
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from soco import SoCo
+from soco.events_base import Event
+from soco.exceptions import SoCoException
+from soco.mirror import StateMirror
+
+IP_ADDR = "192.168.1.151"
+
+
+class FakeSubscription:
+    """A stand-in for `soco.events.Subscription`."""
+
+    made = []
+
+    def __init__(self, service, event_queue=None):
+        self.service = service
+        self.sid = None
+        self.timeout = 100
+        self.time_left = 0
+        self.is_subscribed = False
+        self.callback = None
+        self.auto_renew_fail = None
+        self.made.append(self)
+
+    def subscribe(self, requested_timeout=None, auto_renew=False, strict=True):
+        self.sid = "uuid:{}".format(len(self.made))
+        self.is_subscribed = True
+        self.time_left = 100
+        return self
+
+    def unsubscribe(self, strict=True):
+        self.is_subscribed = False
+        self.time_left = 0
+
+    def notify(self, **variables):
+        """Deliver an event, as the event listener would."""
+        event = Event(self.sid, "0", self.service, 0, variables)
+        self.service._update_cache_on_event(event)
+        self.callback(event)
+
+
+class FakeAsyncSubscription(FakeSubscription):
+    """A stand-in for `soco.events_asyncio.Subscription`."""
+
+    def subscribe(self, requested_timeout=None, auto_renew=False, strict=True):
+        future = asyncio.Future()
+        future.set_result(super().subscribe(requested_timeout, auto_renew, strict))
+        return future
+
+    async def unsubscribe(self, strict=True):
+        super().unsubscribe(strict)
+
+
+@pytest.fixture()
+def events_module():
+    """Patch the events module with fake subscriptions."""
+    module = SimpleNamespace(
+        Subscription=FakeSubscription,
+        subscriptions_map=SimpleNamespace(
+            get_subscription=lambda sid: next(
+                (sub for sub in FakeSubscription.made if sub.sid == sid), None
+            )
+        ),
+    )
+    FakeSubscription.made = []
+    with mock.patch("soco.config.EVENTS_MODULE", module):
+        yield module
+
+
+@pytest.fixture()
+def device():
+    """A SoCo instance which should not be polled unless a test says so."""
+    soco = SoCo(IP_ADDR)
+    soco.renderingControl.cache.clear()
+    soco.avTransport.cache.clear()
+    with mock.patch.object(soco.renderingControl, "send_command") as rendering:
+        with mock.patch.object(soco.avTransport, "send_command") as transport:
+            rendering.side_effect = AssertionError("Polled")
+            transport.side_effect = AssertionError("Polled")
+            yield soco
+    soco.stop_mirror()
+
+
+def test_start_subscribes_to_each_service(events_module, device):
+    mirror = device.start_mirror(requested_timeout=600)
+    assert device.mirror is mirror
+    assert set(mirror.subscriptions) == {"avTransport", "renderingControl", "queue"}
+    assert all(sub.is_subscribed for sub in mirror.subscriptions.values())
+    # Starting again does not subscribe twice
+    assert device.start_mirror() is mirror
+    assert len(FakeSubscription.made) == 3
+    # Fresh only once the initial events have arrived
+    assert mirror.is_stale
+    assert mirror.time_left == 100
+
+
+def test_reads_come_from_events(events_module, device):
+    mirror = device.start_mirror()
+    subs = mirror.subscriptions
+    subs["renderingControl"].notify(
+        volume={"Master": "30", "LF": "100"},
+        mute={"Master": "0"},
+        loudness={"Master": "1"},
+        bass="-2",
+        treble="4",
+    )
+    subs["avTransport"].notify(
+        transport_state="PLAYING",
+        current_play_mode="SHUFFLE",
+        current_crossfade_mode="1",
+        current_track_uri="x-file-cifs://server/track.mp3",
+        current_track_duration="0:03:14",
+        current_track="3",
+    )
+    subs["queue"].notify(update_id="12")
+    assert not mirror.is_stale
+    assert mirror.volume == 30
+    assert mirror.mute is False
+    assert mirror.loudness is True
+    assert (mirror.bass, mirror.treble) == (-2, 4)
+    assert mirror.transport_state == "PLAYING"
+    assert mirror.play_mode == "SHUFFLE"
+    assert mirror.cross_fade is True
+    assert mirror.track == {
+        "uri": "x-file-cifs://server/track.mp3",
+        "duration": "0:03:14",
+        "playlist_position": "3",
+        "metadata": None,
+    }
+    assert mirror.queue_update_id == 12
+    assert mirror.get("avTransport", "current_track") == "3"
+    assert mirror.get("avTransport", "unknown", "default") == "default"
+
+    # Later events update single channels
+    subs["renderingControl"].notify(volume={"LF": "90"})
+    assert mirror.get("renderingControl", "volume") == {"Master": "30", "LF": "90"}
+
+
+def test_transport_info_answered_from_events(events_module):
+    device = SoCo("192.168.1.152")
+    mirror = device.start_mirror()
+    try:
+        mirror.subscriptions["avTransport"].notify(
+            transport_state="PAUSED_PLAYBACK", transport_status="OK"
+        )
+        with mock.patch("requests.post") as fake_post:
+            assert device.get_current_transport_info() == {
+                "current_transport_state": "PAUSED_PLAYBACK",
+                "current_transport_status": "OK",
+                "current_transport_speed": "1",
+            }
+            assert not fake_post.called
+    finally:
+        device.stop_mirror()
+        device.avTransport.cache.clear()
+
+
+def test_events_for_replaced_subscriptions_are_ignored(events_module, device):
+    mirror = device.start_mirror()
+    sub = mirror.subscriptions["renderingControl"]
+    sub.notify(volume={"Master": "30"})
+    stale_event = Event("uuid:old", "0", sub.service, 0, {"volume": {"Master": "5"}})
+    sub.callback(stale_event)
+    assert mirror.volume == 30
+
+
+def test_polls_while_stale(events_module, device):
+    mirror = device.start_mirror()
+    device.renderingControl.send_command.side_effect = None
+    device.renderingControl.send_command.return_value = {"CurrentVolume": "17"}
+    # No initial event yet
+    assert mirror.volume == 17
+    mirror.subscriptions["renderingControl"].notify(volume={"Master": "30"})
+    assert mirror.volume == 30
+    # Subscription expired
+    mirror.subscriptions["renderingControl"].time_left = 0
+    assert mirror.is_fresh("renderingControl") is False
+    assert mirror.volume == 17
+
+
+def test_resubscribes_when_events_stop(events_module, device):
+    mirror = device.start_mirror()
+    device.renderingControl.send_command.side_effect = None
+    device.renderingControl.send_command.return_value = {"CurrentVolume": "17"}
+    old = mirror.subscriptions["renderingControl"]
+    old.notify(volume={"Master": "30"})
+    # A failed renewal cancels the subscription
+    old.is_subscribed = False
+    assert mirror.volume == 17
+    new = mirror.subscriptions["renderingControl"]
+    assert new is not old and new.is_subscribed
+    assert old.callback is None
+    new.notify(volume={"Master": "31"})
+    assert mirror.volume == 31
+
+    # Resubscription attempts are rate limited
+    new.is_subscribed = False
+    assert mirror.volume == 17
+    assert mirror.subscriptions["renderingControl"] is new
+
+
+def test_stop_unsubscribes(events_module, device):
+    mirror = device.start_mirror()
+    subs = list(mirror.subscriptions.values())
+    assert device.stop_mirror() is mirror
+    assert device.mirror is None
+    assert not any(sub.is_subscribed for sub in subs)
+    assert mirror.subscriptions == {}
+    assert mirror.time_left == 0
+    assert device.stop_mirror() is None
+
+
+def test_fallback_track_and_queue_update_id(events_module, device):
+    mirror = StateMirror(device)
+    device.avTransport.send_command.side_effect = None
+    device.avTransport.send_command.return_value = {
+        "Track": "1",
+        "TrackDuration": "0:00:00",
+        "TrackURI": "x-rincon-mp3radio://example.com/stream",
+        "TrackMetaData": "NOT_IMPLEMENTED",
+    }
+    assert mirror.track["uri"] == "x-rincon-mp3radio://example.com/stream"
+    assert mirror.track["metadata"] is None
+    with mock.patch.object(
+        mirror.services["queue"], "send_command", return_value={"UpdateID": "7"}
+    ) as browse:
+        assert mirror.queue_update_id == 7
+        browse.assert_called_once_with(
+            "Browse", [("QueueID", 0), ("StartingIndex", 0), ("RequestedCount", 1)]
+        )
+    # Not started, so no subscriptions are made
+    assert FakeSubscription.made == []
+
+
+def test_async_start_and_stop(events_module, device):
+    events_module.Subscription = FakeAsyncSubscription
+
+    async def run():
+        mirror = await device.start_mirror().async_start()
+        assert all(sub.is_subscribed for sub in mirror.subscriptions.values())
+        subs = list(mirror.subscriptions.values())
+        device.stop_mirror()
+        await mirror.async_stop()
+        assert not any(sub.is_subscribed for sub in subs)
+
+    asyncio.run(run())
+
+
+def test_async_pending_forgotten_when_done(events_module, device, caplog):
+    events_module.Subscription = FakeAsyncSubscription
+    mirror = StateMirror(device)
+
+    async def fail():
+        raise SoCoException("Unreachable")
+
+    async def run():
+        mirror._schedule(fail())
+        mirror._schedule(asyncio.sleep(0))
+        assert len(mirror._pending) == 2
+        await asyncio.sleep(0.01)
+        # Completed futures are dropped, and their exceptions retrieved
+        assert not mirror._pending
+
+    asyncio.run(run())
+    assert "Unreachable" in caplog.text
+    # Outside an event loop, nothing is scheduled
+    mirror._schedule(fail())
+    assert not mirror._pending
@@ -0,0 +1,115 @@
+"""Tests for the parallel module."""
+
+import threading
+import time
+
+import pytest
+
+from soco import parallel
+
+
+class FakeZone:
+    """A stand-in for a SoCo instance."""
+
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+
+    @property
+    def volume(self):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return len(self.name)
+
+    def greet(self, greeting, punctuation="."):
+        time.sleep(self.delay)
+        return f"{greeting} {self.name}{punctuation}"
+
+
+def test_call_all_with_method_name():
+    zones = [FakeZone("kitchen"), FakeZone("lounge")]
+    results, exceptions = parallel.call_all(zones, "greet", "Hello", punctuation="!")
+    assert results == {zones[0]: "Hello kitchen!", zones[1]: "Hello lounge!"}
+    assert exceptions == {}
+
+
+def test_call_all_with_property_and_callable():
+    zones = [FakeZone("kitchen"), FakeZone("den")]
+    results, _ = parallel.call_all(zones, "volume")
+    assert results == {zones[0]: 7, zones[1]: 3}
+    results, _ = parallel.call_all(zones, lambda zone, n: zone.name * n, 2)
+    assert results == {zones[0]: "kitchenkitchen", zones[1]: "denden"}
+    # Properties take no arguments
+    _, exceptions = parallel.call_all(zones[:1], "volume", 2)
+    assert isinstance(exceptions[zones[0]], TypeError)
+
+
+def test_call_all_collects_exceptions():
+    error = ValueError("offline")
+    zones = [FakeZone("kitchen"), FakeZone("lounge", error=error)]
+    results, exceptions = parallel.call_all(zones, "volume")
+    assert results == {zones[0]: 7}
+    assert exceptions == {zones[1]: error}
+
+
+def test_calls_run_concurrently():
+    zones = [FakeZone(str(i), delay=0.2) for i in range(10)]
+    start = time.monotonic()
+    results, _ = parallel.call_all(zones, "volume", max_workers=10)
+    assert len(results) == 10
+    assert time.monotonic() - start < 1.0
+
+
+def test_max_workers_is_respected():
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def track(zone):
+        with lock:
+            active.append(zone)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(zone)
+
+    zones = [FakeZone(str(i)) for i in range(8)]
+    parallel.call_all(zones, track, max_workers=2)
+    assert max(peak) == 2
+
+
+def test_timeout():
+    zones = [FakeZone("fast"), FakeZone("slow", delay=1.0)]
+    start = time.monotonic()
+    results, exceptions = parallel.call_all(zones, "volume", timeout=0.2)
+    assert time.monotonic() - start < 0.8
+    assert results == {zones[0]: 4}
+    assert isinstance(exceptions[zones[1]], TimeoutError)
+
+
+def test_as_completed_streams_in_completion_order():
+    zones = [FakeZone("slow", delay=0.3), FakeZone("fast")]
+    names = [
+        result.zone.name
+        for result in parallel.as_completed(zones, "greet", "Hi", max_workers=2)
+    ]
+    assert names == ["fast", "slow"]
+
+
+def test_as_completed_handles_empty_and_duplicate_zones():
+    assert list(parallel.as_completed([], "volume")) == []
+    zone = FakeZone("kitchen")
+    assert list(parallel.as_completed([zone, zone], "volume")) == [
+        parallel.CallResult(zone, 7, None)
+    ]
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_as_completed_can_be_abandoned(max_workers):
+    zones = [FakeZone(str(i), delay=0.05) for i in range(6)]
+    stream = parallel.as_completed(zones, "volume", max_workers=max_workers)
+    first = next(stream)
+    assert first.exception is None
+    stream.close()
@@ -0,0 +1,145 @@
+"""Tests for the service_stubs module."""
+
+import types
+from unittest import mock
+
+import pytest
+
+from soco import SoCo, config
+from soco.service_stubs import generate_module, soco_services, write_module
+from soco.services import REQUIRED, RenderingControl, Service
+
+SCPD = """<?xml version="1.0" encoding="utf-8" ?>
+<scpd xmlns="urn:schemas-upnp-org:service-1-0">
+<serviceStateTable>
+<stateVariable sendEvents="no"><name>A_ARG_TYPE_InstanceID</name>
+<dataType>ui4</dataType></stateVariable>
+<stateVariable sendEvents="no"><name>A_ARG_TYPE_Channel</name>
+<dataType>string</dataType>
+<allowedValueList><allowedValue>Master</allowedValue>
+<allowedValue>LF</allowedValue></allowedValueList></stateVariable>
+<stateVariable sendEvents="no"><name>Volume</name><dataType>ui2</dataType>
+<allowedValueRange><minimum>0</minimum><maximum>100</maximum>
+</allowedValueRange></stateVariable>
+</serviceStateTable>
+<actionList>
+<action><name>GetVolume</name><argumentList>
+<argument><name>InstanceID</name><direction>in</direction>
+<relatedStateVariable>A_ARG_TYPE_InstanceID</relatedStateVariable></argument>
+<argument><name>Channel</name><direction>in</direction>
+<relatedStateVariable>A_ARG_TYPE_Channel</relatedStateVariable></argument>
+<argument><name>CurrentVolume</name><direction>out</direction>
+<relatedStateVariable>Volume</relatedStateVariable></argument>
+</argumentList></action>
+<action><name>subscribe</name><argumentList>
+<argument><name>InstanceID</name><direction>in</direction>
+<relatedStateVariable>A_ARG_TYPE_InstanceID</relatedStateVariable></argument>
+</argumentList></action>
+<action><name>SetCache</name><argumentList>
+<argument><name>cache</name><direction>in</direction>
+<relatedStateVariable>A_ARG_TYPE_InstanceID</relatedStateVariable></argument>
+</argumentList></action>
+</actionList>
+</scpd>"""
+
+RESPONSE = (
+    '<?xml version="1.0"?>'
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"'
+    ' s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+    "<s:Body>"
+    '<u:GetVolumeResponse xmlns:u="urn:schemas-upnp-org:service:'
+    'RenderingControl:1">'
+    "<CurrentVolume>25</CurrentVolume>"
+    "</u:GetVolumeResponse>"
+    "</s:Body>"
+    "</s:Envelope>"
+)
+
+CONTROL_URL = "http://10.5.0.1:1400/MediaRenderer/RenderingControl/Control"
+
+
+def load_stubs(source):
+    """Return the module whose source is given."""
+    module = types.ModuleType("sonos_stubs")
+    exec(compile(source, "sonos_stubs.py", "exec"), module.__dict__)
+    return module
+
+
+@pytest.fixture()
+def stubs():
+    """A module of stubs generated from the rendering control service of a
+    speaker."""
+    service = RenderingControl(SoCo("10.5.0.1"))
+    # pylint: disable=protected-access
+    service._actions = list(Service._parse_actions(SCPD))
+    return load_stubs(generate_module([service], description="a test speaker"))
+
+
+def test_generate_module(stubs):
+    assert issubclass(stubs.RenderingControl, RenderingControl)
+    method = stubs.RenderingControl.__dict__["GetVolume"]
+    assert method.__doc__.startswith(
+        "GetVolume(InstanceID: ui4, Channel: [Master, LF]) -> {CurrentVolume: [0..100]}"
+    )
+    assert "Channel (str): One of ``Master``, ``LF``." in method.__doc__
+    # Actions whose names clash are left to the dynamic dispatcher
+    assert "subscribe" not in stubs.RenderingControl.__dict__
+    assert "SetCache" not in stubs.RenderingControl.__dict__
+    assert "a test speaker" in stubs.__doc__
+
+
+def test_stub_methods_send_the_same_requests(stubs, requests_mock):
+    requests_mock.post(CONTROL_URL, text=RESPONSE)
+    generic = RenderingControl(SoCo("10.5.0.1"))
+    # pylint: disable=protected-access
+    generic._actions = list(Service._parse_actions(SCPD))
+    stub = stubs.RenderingControl(SoCo("10.5.0.1"))
+
+    assert generic.GetVolume(Channel="Master", cache_timeout=0) == {
+        "CurrentVolume": "25"
+    }
+    assert stub.GetVolume(Channel="Master", cache_timeout=0) == {"CurrentVolume": "25"}
+    assert stub.GetVolume([("InstanceID", 0), ("Channel", "Master")]) == {
+        "CurrentVolume": "25"
+    }
+    first, second, third = requests_mock.request_history
+    assert second.body == first.body == third.body
+    assert second.headers["SOAPACTION"] == first.headers["SOAPACTION"]
+    # The stub didn't need the service description
+    assert stub._actions is None
+
+
+def test_stub_method_argument_errors(stubs):
+    stub = stubs.RenderingControl(SoCo("10.5.0.1"))
+    with pytest.raises(ValueError, match="Missing argument 'Channel'"):
+        stub.GetVolume()
+    with pytest.raises(ValueError, match="Unexpected argument 'Volume'"):
+        stub.GetVolume(Channel="Master", Volume=2)
+
+
+def test_stub_method_timeout(stubs):
+    stub = stubs.RenderingControl(SoCo("10.5.0.1"))
+    with mock.patch.object(stub, "_send") as send:
+        stub.GetVolume(Channel="LF", timeout=3)
+    send.assert_called_once_with(
+        "GetVolume", [("InstanceID", 0), ("Channel", "LF")], None, None, 3, mock.ANY
+    )
+    assert repr(REQUIRED) == "REQUIRED"
+
+
+def test_soco_uses_service_stubs(stubs, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "SERVICE_STUBS", stubs)
+    device = SoCo("10.5.0.2")
+    assert isinstance(device.renderingControl, stubs.RenderingControl)
+    # Services without stubs are the usual ones
+    assert type(device.avTransport).__module__ == "soco.services"
+
+    monkeypatch.setattr(config, "SERVICE_STUBS", None)
+    device = SoCo("10.5.0.3")
+    for service in soco_services(device):
+        # pylint: disable=protected-access
+        service._actions = []
+    filepath = tmp_path / "stubs.py"
+    write_module(str(filepath), soco_services(device))
+    module = load_stubs(filepath.read_text(encoding="utf-8"))
+    assert module.AVTransport.__bases__[0].__name__ == "AVTransport"
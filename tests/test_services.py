@@ -3,13 +3,25 @@
 # These tests require pytest.
 
 
+import asyncio
+import inspect
+import threading
+import time
+
 import pytest
 
+from soco import SoCo
+from soco.events_base import Event, parse_event_xml
 from soco.exceptions import SoCoUPnPException, UnknownSoCoException
+from soco.groups import ZoneGroup
 from soco.services import ContentDirectory, Service, Action, Argument, Vartype
+from soco.services import AVTransport, GroupRenderingControl, RenderingControl
+from soco.services import in_flight_requests
 
 from unittest import mock
 
+from conftest import DataLoader
+
 # Dummy known-good errors/responses etc.  These are not necessarily valid as
 # actual commands, but are valid XML/UPnP. They also contain unicode characters
 # to test unicode handling.
@@ -142,8 +154,6 @@ def test_init_defaults(service):
 
 def test_method_dispatcher_function_creation(service):
     """Testing __getattr__ functionality."""
-    import inspect
-
     # There should be no testing method
     assert "testing" not in service.__dict__.keys()
     # but we should be able to inspect it
@@ -306,8 +316,6 @@ def test_send_command(service):
         assert fake_post.called
         # calling again after the time interval will avoid the cache
         fake_post.reset_mock()
-        import time
-
         time.sleep(2)
         result = service.send_command(
             "SetAVTransportURI",
@@ -369,3 +377,259 @@ def test_handle_upnp_error_with_empty_response(service):
 
 
 # TODO: test iter_actions
+
+
+class FakeAsyncResponse:
+    """A stand-in for an aiohttp ClientResponse."""
+
+    def __init__(self, status, text):
+        self.status = status
+        self.headers = {}
+        self._text = text
+        self.raise_for_status = mock.Mock()
+
+    async def text(self):
+        return self._text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def test_async_send_command(service):
+    """Awaiting an action should result in a single http request, and
+    should share the cache with send_command."""
+    session = mock.Mock()
+    session.request.return_value = FakeAsyncResponse(200, DUMMY_VALID_RESPONSE)
+    args = [("InstanceID", 0), ("Unicode", "μИⅠℂ☺ΔЄ💋")]
+
+    async def run():
+        first = await service.async_.GetLEDState(args, cache_timeout=2, session=session)
+        second = await service.async_send_command("GetLEDState", args, session=session)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"CurrentLEDState": "On", "Unicode": "μИⅠℂ☺ΔЄ💋"}
+    session.request.assert_called_once_with(
+        "POST",
+        "http://192.168.1.101:1400/Service/Control",
+        timeout=mock.ANY,
+        raise_for_status=False,
+        headers=mock.ANY,
+        data=mock.ANY,
+    )
+    # The sync path is served from the same cache
+    with mock.patch("requests.post") as fake_post:
+        assert service.GetLEDState(args) == first
+        assert not fake_post.called
+
+
+def test_async_send_command_errors(service):
+    """UPnP errors are raised as for send_command, and other errors are
+    left to aiohttp."""
+    session = mock.Mock()
+    session.request.return_value = FakeAsyncResponse(500, DUMMY_ERROR)
+    with pytest.raises(SoCoUPnPException):
+        asyncio.run(service.async_send_command("Test", [], session=session))
+
+    response = FakeAsyncResponse(403, "")
+    session.request.return_value = response
+    assert asyncio.run(service.async_send_command("Test", [], session=session)) is None
+    response.raise_for_status.assert_called_once_with()
+
+
+def test_async_dispatcher_caches_methods(service):
+    """async_ should return the same dispatcher, which caches its methods."""
+    assert service.async_ is service.async_
+    method = service.async_.Testing
+    assert inspect.iscoroutinefunction(method)
+    assert method.__name__ == "Testing"
+    assert service.async_.Testing is method
+
+
+def test_send_command_coalesces_concurrent_reads(service):
+    """Identical concurrent Get requests should share one http request, but
+    other actions should not be coalesced."""
+    response = mock.MagicMock()
+    response.headers = {}
+    response.status_code = 200
+    response.text = DUMMY_VALID_RESPONSE
+
+    def slow_post(*args, **kwargs):
+        time.sleep(0.2)
+        return response
+
+    def call(action, results):
+        results.append(service.send_command(action, [("InstanceID", 0)]))
+
+    for action, expected_posts in (("GetLEDState", 1), ("Next", 4)):
+        in_flight_requests.reset_stats()
+        results = []
+        with mock.patch("requests.post", side_effect=slow_post) as fake_post:
+            threads = [
+                threading.Thread(target=call, args=(action, results)) for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert fake_post.call_count == expected_posts
+        assert len(results) == 4
+        assert all(result == results[0] for result in results)
+    in_flight_requests.reset_stats()
+
+
+RENDERING_CONTROL_EVENT = (
+    '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">'
+    "<e:property><LastChange>"
+    '&lt;Event xmlns="urn:schemas-upnp-org:metadata-1-0/RCS/"&gt;'
+    '&lt;InstanceID val="0"&gt;'
+    '&lt;Volume channel="Master" val="36"/&gt;'
+    '&lt;Volume channel="LF" val="100"/&gt;'
+    '&lt;Mute channel="Master" val="0"/&gt;'
+    '&lt;Bass val="2"/&gt;'
+    '&lt;Treble val="-1"/&gt;'
+    '&lt;Loudness channel="Master" val="1"/&gt;'
+    "&lt;/InstanceID&gt;&lt;/Event&gt;"
+    "</LastChange></e:property>"
+    "</e:propertyset>"
+)
+
+
+@pytest.fixture()
+def subscription():
+    """A live subscription, as found by _prime_cache."""
+    subscription = mock.Mock(timeout=100, time_left=50)
+    with mock.patch("soco.config.EVENTS_MODULE") as events_module:
+        events_module.subscriptions_map.get_subscription.return_value = subscription
+        yield subscription
+
+
+def test_rendering_control_cache_primed_by_event(subscription):
+    """Volume etc. should be read from the cache after an event, until a
+    state-changing action is sent."""
+    mock_soco = mock.MagicMock()
+    mock_soco.ip_address = "192.168.1.101"
+    service = RenderingControl(mock_soco)
+    variables = parse_event_xml(RENDERING_CONTROL_EVENT)
+    service._update_cache_on_event(Event("sid", "0", service, 0, variables))
+
+    master = [("InstanceID", 0), ("Channel", "Master")]
+    with mock.patch("requests.post") as fake_post:
+        assert service.GetVolume(master) == {"CurrentVolume": "36"}
+        assert service.GetVolume([("InstanceID", 0), ("Channel", "LF")]) == {
+            "CurrentVolume": "100"
+        }
+        assert service.GetMute(master) == {"CurrentMute": "0"}
+        assert service.GetBass(master) == {"CurrentBass": "2"}
+        assert service.GetTreble(master) == {"CurrentTreble": "-1"}
+        assert service.GetLoudness(master) == {"CurrentLoudness": "1"}
+        assert not fake_post.called
+
+    response = mock.MagicMock()
+    response.status_code = 200
+    response.text = DUMMY_VALID_RESPONSE
+    with mock.patch("requests.post", return_value=response) as fake_post:
+        service.SetVolume(master + [("DesiredVolume", 10)])
+        service.GetVolume(master)
+        assert fake_post.call_count == 2
+
+
+def test_cache_not_primed_without_subscription(subscription):
+    mock_soco = mock.MagicMock()
+    service = GroupRenderingControl(mock_soco)
+    subscription.time_left = 0
+    event = Event("sid", "0", service, 0, {"group_volume": "12"})
+    service._update_cache_on_event(event)
+    assert service.cache.get("GetGroupVolume", [("InstanceID", 0)]) is None
+
+    subscription.time_left = 50
+    service._update_cache_on_event(event)
+    assert service.cache.get("GetGroupVolume", [("InstanceID", 0)]) == {
+        "CurrentVolume": "12"
+    }
+    # Clearing forgets the primed entries, but not others
+    service.cache.put(
+        {"CurrentMute": "0"}, "GetGroupMute", [("InstanceID", 0)], timeout=60
+    )
+    service._clear_event_cache()
+    assert service.cache.get("GetGroupVolume", [("InstanceID", 0)]) is None
+    assert service.cache.get("GetGroupMute", [("InstanceID", 0)]) == {
+        "CurrentMute": "0"
+    }
+
+
+def test_event_cache_refreshed_on_renewal(subscription):
+    service = GroupRenderingControl(mock.MagicMock())
+    subscription.sid = "sid"
+    args = [("InstanceID", 0)]
+    with mock.patch("soco.cache.time", return_value=1000):
+        service._update_cache_on_event(
+            Event("sid", "0", service, 0, {"group_volume": "12"})
+        )
+    with mock.patch("soco.cache.time", return_value=1040):
+        # Renewed with 50s left, as time_left says
+        service._refresh_event_cache(subscription)
+    with mock.patch("soco.cache.time", return_value=1080):
+        assert service.cache.get("GetGroupVolume", args) == {"CurrentVolume": "12"}
+
+
+def test_av_transport_cache_primed_by_event(subscription):
+    mock_soco = mock.MagicMock()
+    service = AVTransport(mock_soco)
+    position_args = [("InstanceID", 0), ("Channel", "Master")]
+    service.cache.put({"TrackURI": "old"}, "GetPositionInfo", position_args, timeout=60)
+    xml = DataLoader("data_structures_entry_integration").load_xml("source_linein.xml")
+    variables = parse_event_xml(xml)
+    service._update_cache_on_event(Event("sid", "0", service, 0, variables))
+
+    args = [("InstanceID", 0)]
+    with mock.patch("requests.post") as fake_post:
+        assert service.GetTransportInfo(args) == {
+            "CurrentTransportState": "PLAYING",
+            "CurrentTransportStatus": "OK",
+            "CurrentSpeed": "1",
+        }
+        assert not fake_post.called
+    assert service.cache.get("GetTransportSettings", args) == {
+        "PlayMode": "NORMAL",
+        "RecQualityMode": "NOT_IMPLEMENTED",
+    }
+    assert service.cache.get("GetCrossfadeMode", args) == {"CrossfadeMode": "0"}
+    # The position is not evented, so it is dropped rather than primed
+    assert service.cache.get("GetPositionInfo", position_args) is None
+
+
+def test_event_cache_kept_by_snapshot(subscription):
+    """Snapshotting the group volume, as ZoneGroup.volume does, does not
+    change evented state, so the primed group volume is still used."""
+    coordinator = SoCo("192.168.1.101")
+    service = coordinator.groupRenderingControl
+    service._update_cache_on_event(
+        Event("sid", "0", service, 0, {"group_volume": "12", "group_mute": "1"})
+    )
+    group = ZoneGroup("uid", coordinator)
+    response = mock.MagicMock()
+    response.status_code = 200
+    response.text = DUMMY_VALID_RESPONSE
+    with mock.patch("requests.post", return_value=response) as fake_post:
+        assert group.volume == 12
+        assert group.mute
+        # Only the snapshot is sent
+        assert fake_post.call_count == 1
+
+
+def test_event_cache_cleared_per_subscription(subscription):
+    service = GroupRenderingControl(mock.MagicMock())
+    service._update_cache_on_event(
+        Event("one", "0", service, 0, {"group_volume": "12"})
+    )
+    service._update_cache_on_event(Event("two", "0", service, 0, {"group_mute": "1"}))
+    # Cancelling one subscription leaves the entries of the other
+    service._clear_event_cache("one")
+    assert service.cache.get("GetGroupVolume", [("InstanceID", 0)]) is None
+    assert service.cache.get("GetGroupMute", [("InstanceID", 0)]) == {
+        "CurrentMute": "1"
+    }
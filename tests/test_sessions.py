@@ -0,0 +1,92 @@
+"""Tests for the sessions module."""
+
+from unittest import mock
+
+import pytest
+import requests
+
+from soco import config
+from soco.services import Service
+from soco.sessions import SessionPool
+
+
+@pytest.fixture()
+def pooling():
+    """Enable session pooling for the duration of a test."""
+    config.SESSION_POOL_ENABLED = True
+    yield
+    config.SESSION_POOL_ENABLED = False
+
+
+def test_disabled_returns_requests_module():
+    pool = SessionPool()
+    assert pool.get("192.168.1.101") is requests
+    assert len(pool) == 0
+
+
+def test_session_per_ip(pooling):
+    pool = SessionPool()
+    first = pool.get("192.168.1.101")
+    assert isinstance(first, requests.Session)
+    assert pool.get("192.168.1.101") is first
+    second = pool.get("192.168.1.102")
+    assert second is not first
+    assert len(pool) == 2
+    adapter = first.get_adapter("http://192.168.1.101:1400")
+    assert adapter._pool_maxsize == config.SESSION_POOL_SIZE
+    pool.clear()
+    assert len(pool) == 0
+
+
+def test_idle_eviction(pooling):
+    pool = SessionPool()
+    with mock.patch("soco.sessions.monotonic", return_value=100.0):
+        first = pool.get("192.168.1.101")
+        pool.get("192.168.1.102")
+    # Only the session which has been used recently survives
+    with mock.patch("soco.sessions.monotonic", return_value=120.0):
+        pool.get("192.168.1.102")
+    with mock.patch.object(first, "close") as close, mock.patch(
+        "soco.sessions.monotonic", return_value=100.0 + 31
+    ):
+        pool.get("192.168.1.102")
+        close.assert_called_once_with()
+    assert "192.168.1.101" not in pool
+    assert "192.168.1.102" in pool
+
+
+def test_close(pooling):
+    pool = SessionPool()
+    session = pool.get("192.168.1.101")
+    with mock.patch.object(session, "close") as close:
+        pool.close("192.168.1.101")
+        close.assert_called_once_with()
+    assert "192.168.1.101" not in pool
+    # Closing an unknown ip is not an error
+    pool.close("192.168.1.101")
+
+
+def test_send_command_uses_pooled_session(pooling):
+    mock_soco = mock.MagicMock()
+    mock_soco.ip_address = "192.168.1.101"
+    service = Service(mock_soco)
+    response = mock.MagicMock()
+    response.status_code = 200
+    response.text = (
+        '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">'
+        '<s:Body><u:TestResponse xmlns:u="urn:schemas-upnp-org:service:Service:1">'
+        "<Result>OK</Result></u:TestResponse>"
+        "</s:Body></s:Envelope>"
+    )
+    session = mock.Mock()
+    session.post.return_value = response
+    with mock.patch("soco.services.session_pool") as pool:
+        pool.get.return_value = session
+        assert service.send_command("Test", args=[]) == {"Result": "OK"}
+        pool.get.assert_called_once_with("192.168.1.101")
+        session.post.assert_called_once_with(
+            "http://192.168.1.101:1400/Service/Control",
+            headers=mock.ANY,
+            data=mock.ANY,
+            timeout=config.REQUEST_TIMEOUT,
+        )
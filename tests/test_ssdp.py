@@ -0,0 +1,210 @@
+"""Tests for the ssdp module."""
+
+from unittest import mock
+
+import pytest
+
+from soco import SoCo
+from soco import ssdp
+from soco.ssdp import DeviceRegistry
+
+ALIVE = """NOTIFY * HTTP/1.1
+HOST: 239.255.255.250:1900
+CACHE-CONTROL: max-age = 1800
+LOCATION: http://{ip}:1400/xml/device_description.xml
+NT: {nt}
+NTS: ssdp:alive
+SERVER: Linux UPnP/1.0 Sonos/70.3-35220 (ZPS9)
+USN: uuid:{uid}::{nt}
+X-RINCON-HOUSEHOLD: {household}
+X-RINCON-BOOTSEQ: {bootseq}
+
+"""
+
+BYEBYE = """NOTIFY * HTTP/1.1
+HOST: 239.255.255.250:1900
+NT: urn:schemas-upnp-org:device:ZonePlayer:1
+NTS: ssdp:byebye
+USN: uuid:{uid}::urn:schemas-upnp-org:device:ZonePlayer:1
+
+"""
+
+RESPONSE = """HTTP/1.1 200 OK
+CACHE-CONTROL: max-age = 60
+EXT:
+LOCATION: http://{ip}:1400/xml/device_description.xml
+SERVER: Linux UPnP/1.0 Sonos/70.3-35220 (ZPS9)
+ST: urn:schemas-upnp-org:device:ZonePlayer:1
+USN: uuid:{uid}::urn:schemas-upnp-org:device:ZonePlayer:1
+X-RINCON-HOUSEHOLD: Sonos_H1
+X-RINCON-BOOTSEQ: 12
+
+"""
+
+
+def alive(
+    ip="10.1.0.1",
+    uid="RINCON_1",
+    household="Sonos_H1",
+    bootseq="12",
+    nt=ssdp.ZONE_PLAYER,
+):
+    """Return an ssdp:alive announcement."""
+    return ALIVE.format(
+        ip=ip, uid=uid, household=household, bootseq=bootseq, nt=nt
+    ).encode("utf-8")
+
+
+@pytest.fixture()
+def registry():
+    """A registry which records the changes it makes."""
+    reg = DeviceRegistry()
+    reg.changes = []
+    reg.add_listener(lambda kind, entry: reg.changes.append((kind, entry.uid)))
+    return reg
+
+
+def test_parse_ssdp_message():
+    start_line, headers = ssdp.parse_ssdp_message(alive())
+    assert start_line == "NOTIFY * HTTP/1.1"
+    assert headers["NTS"] == "ssdp:alive"
+    assert headers["USN"] == "uuid:RINCON_1::" + ssdp.ZONE_PLAYER
+    assert ssdp.uid_from_usn(headers["USN"]) == "RINCON_1"
+    assert ssdp.max_age_from_cache_control(headers["CACHE-CONTROL"]) == 1800
+    assert ssdp.max_age_from_cache_control("no-cache") == ssdp.DEFAULT_MAX_AGE
+
+
+def test_alive_and_byebye(registry):
+    registry.handle_message(alive(), ("10.1.0.1", 1900))
+    entry = registry.get("RINCON_1")
+    assert entry.soco is SoCo("10.1.0.1")
+    assert entry.household_id == "Sonos_H1"
+    assert entry.max_age == 1800
+    # pylint: disable=protected-access
+    assert entry.soco._uid == "RINCON_1"
+    assert entry.soco._household_id == "Sonos_H1"
+    # Announcements for other device types, and repeats, change nothing
+    registry.handle_message(alive(nt="upnp:rootdevice"), ("10.1.0.1", 1900))
+    registry.handle_message(alive(), ("10.1.0.1", 1900))
+    assert registry.changes == [("added", "RINCON_1")]
+    # A reboot, and a new address
+    registry.handle_message(alive(bootseq="13"), ("10.1.0.1", 1900))
+    registry.handle_message(alive(ip="10.1.0.9", bootseq="13"), ("10.1.0.9", 1900))
+    assert registry.get("RINCON_1").soco is SoCo("10.1.0.9")
+    registry.handle_message(
+        BYEBYE.format(uid="RINCON_1").encode("utf-8"), ("10.1.0.9", 1900)
+    )
+    assert registry.changes[1:] == [
+        ("updated", "RINCON_1"),
+        ("updated", "RINCON_1"),
+        ("removed", "RINCON_1"),
+    ]
+    assert registry.entries == {}
+
+
+def test_search_responses_and_filters(registry):
+    registry.household_id = "Sonos_H1"
+    registry.handle_message(
+        RESPONSE.format(ip="10.1.0.2", uid="RINCON_2").encode("utf-8"),
+        ("10.1.0.2", 1900),
+    )
+    registry.handle_message(alive(uid="RINCON_3", household="Sonos_H2"), ("x", 1))
+    registry.handle_message(b"M-SEARCH * HTTP/1.1\r\nST: ssdp:all\r\n\r\n", ("x", 1))
+    registry.handle_message(
+        alive(uid="RINCON_4").replace(b"Sonos/", b"Other/"), ("x", 1)
+    )
+    assert set(registry.entries) == {"RINCON_2"}
+    assert registry.zones == {SoCo("10.1.0.2")}
+
+
+def test_entries_expire(registry):
+    with mock.patch("soco.ssdp.time.time", return_value=1000.0):
+        registry.handle_message(
+            RESPONSE.format(ip="10.1.0.2", uid="RINCON_2").encode("utf-8"),
+            ("10.1.0.2", 1900),
+        )
+    with mock.patch("soco.ssdp.time.time", return_value=1059.0):
+        assert registry.get("RINCON_2") is not None
+    with mock.patch("soco.ssdp.time.time", return_value=1061.0):
+        assert registry.get("RINCON_2") is None
+    assert registry.changes == [("added", "RINCON_2"), ("removed", "RINCON_2")]
+
+
+def test_lookups(registry):
+    registry.handle_message(alive(ip="10.1.0.1", uid="RINCON_1"), ("x", 1))
+    registry.handle_message(alive(ip="10.1.0.2", uid="RINCON_2"), ("x", 1))
+    # Nothing is known about the names until the topology is fetched
+    assert registry.by_name("Den") is None
+    assert registry.any_soco() is None
+
+    kitchen, den = SoCo("10.1.0.1"), SoCo("10.1.0.2")
+    # pylint: disable=protected-access
+    kitchen._player_name, den._player_name = "Kitchen", "Den"
+    zgs = mock.Mock(all_zones={kitchen, den}, visible_zones={den})
+    with mock.patch.object(
+        SoCo, "zone_group_state", new_callable=mock.PropertyMock, return_value=zgs
+    ):
+        registry.update_topology()
+        # One request for the household
+        zgs.poll.assert_called_once()
+        registry.update_topology()
+        zgs.poll.assert_called_once()
+    assert registry.changes[2:] == [("updated", "RINCON_1"), ("updated", "RINCON_2")]
+    assert registry.get("RINCON_1").player_name == "Kitchen"
+
+    # Lookups are answered from the entries, without network calls
+    with mock.patch.object(
+        SoCo, "player_name", new_callable=mock.PropertyMock
+    ) as player_name, mock.patch.object(
+        SoCo, "is_visible", new_callable=mock.PropertyMock
+    ) as is_visible:
+        assert registry.by_name("Den") is den
+        # Invisible devices are not returned
+        assert registry.by_name("Kitchen") is None
+        assert registry.by_name("Nowhere") is None
+        assert registry.any_soco() is den
+        assert not player_name.called
+        assert not is_visible.called
+
+    # The name and visibility are kept when the device is seen again
+    registry.handle_message(alive(ip="10.1.0.2", uid="RINCON_2"), ("x", 1))
+    assert registry.by_name("Den") is den
+
+
+def test_search_sends_to_each_socket(registry):
+    sockets = [mock.Mock(), mock.Mock()]
+    sockets[1].sendto.side_effect = OSError
+    registry._search_sockets = sockets  # pylint: disable=protected-access
+    registry.search()
+    # Sent as many times as discover() does, until sending fails
+    call = mock.call(ssdp.PLAYER_SEARCH, (ssdp.MCAST_GRP, ssdp.MCAST_PORT))
+    assert sockets[0].sendto.call_args_list == [call] * ssdp.SEARCH_REPEATS
+    assert sockets[1].sendto.call_args_list == [call]
+    # The registry's sockets are left as they are
+    assert registry._search_sockets == sockets
+
+
+def test_listener_thread(registry):
+    notify_socket = mock.Mock()
+    notify_socket.recvfrom.return_value = (alive(), ("10.1.0.1", 1900))
+    search_socket = mock.Mock()
+    with mock.patch(
+        "soco.ssdp.create_search_socket", return_value=search_socket
+    ), mock.patch(
+        "soco.ssdp.create_notify_socket", return_value=notify_socket
+    ), mock.patch(
+        "soco.ssdp.select.select", return_value=([notify_socket], [], [])
+    ), mock.patch.object(
+        registry, "update_topology"
+    ) as update_topology:
+        registry.interface_addr = "10.1.0.100"
+        registry.start()
+        assert registry.is_running
+        registry.start()
+        registry.stop()
+    assert not registry.is_running
+    assert search_socket.sendto.call_count == ssdp.SEARCH_REPEATS
+    notify_socket.close.assert_called_once()
+    assert registry.changes == [("added", "RINCON_1")]
+    # The names of new devices are fetched on the listener thread
+    update_topology.assert_called()
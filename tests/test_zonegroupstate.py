@@ -0,0 +1,193 @@
+"""Tests for the zonegroupstate module."""
+
+import os
+import queue
+from unittest import mock
+
+import pytest
+
+from soco import SoCo
+from soco.zonegroupstate import (
+    COORDINATOR_CHANGED,
+    GROUP_ADDED,
+    GROUP_REMOVED,
+    MEMBERS_CHANGED,
+    SATELLITE_CHANGED,
+    VISIBILITY_CHANGED,
+    ZONE_ADDED,
+    ZONE_MOVED,
+    ZONE_REMOVED,
+    ZoneGroupState,
+    ZoneGroupStateChange,
+    normalize_zgs_xml,
+)
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "zone_group_state")
+
+MEMBER = (
+    '<ZoneGroupMember UUID="RINCON_{n}" ZoneName="Zone {n}"'
+    ' Location="http://10.0.0.{n}:1400/xml/device_description.xml"{extra}>'
+    "{satellites}</ZoneGroupMember>"
+)
+SATELLITE = (
+    '<Satellite UUID="RINCON_{n}" ZoneName="Zone {n}" Invisible="1"'
+    ' Location="http://10.0.0.{n}:1400/xml/device_description.xml"/>'
+)
+
+
+def member(number, invisible=False, satellites=()):
+    """Return the XML for a ZoneGroupMember."""
+    return MEMBER.format(
+        n=number,
+        extra=' Invisible="1"' if invisible else "",
+        satellites="".join(SATELLITE.format(n=n) for n in satellites),
+    )
+
+
+def payload(*groups):
+    """Return a ZGS payload for ``(group_id, coordinator, members)`` groups,
+    where ``members`` are strings returned by `member`."""
+    return (
+        "<ZoneGroupState><ZoneGroups>"
+        + "".join(
+            '<ZoneGroup Coordinator="RINCON_{}" ID="{}">{}</ZoneGroup>'.format(
+                coordinator, group_id, "".join(members)
+            )
+            for group_id, coordinator, members in groups
+        )
+        + "</ZoneGroups><VanishedDevices/></ZoneGroupState>"
+    )
+
+
+def zone(number):
+    """Return the SoCo instance for a zone number."""
+    return SoCo(f"10.0.0.{number}")
+
+
+@pytest.fixture()
+def zgs():
+    """A ZoneGroupState which records the changes made by each payload."""
+    state = ZoneGroupState()
+    changes = queue.Queue()
+    state.add_listener(changes.put)
+    state.changes = changes
+    state.update = lambda *groups: state.process_payload(
+        payload(*groups), "test", "10.0.0.1"
+    )
+    return state
+
+
+def test_initial_payload_adds_everything(zgs):
+    zgs.update(("A:1", 1, [member(1, satellites=[3]), member(2)]))
+    changes = zgs.changes.get_nowait()
+    group = zgs.groups.copy().pop()
+    assert changes[0] == ZoneGroupStateChange(GROUP_ADDED, "A:1", None, group)
+    assert {(c.kind, c.uid) for c in changes[1:]} == {
+        (ZONE_ADDED, "RINCON_1"),
+        (ZONE_ADDED, "RINCON_2"),
+        (ZONE_ADDED, "RINCON_3"),
+    }
+    assert group.coordinator is zone(1)
+    assert group.members == {zone(1), zone(2), zone(3)}
+    assert zgs.all_zones == {zone(1), zone(2), zone(3)}
+    assert zgs.visible_zones == {zone(1), zone(2)}
+
+
+def test_duplicates_and_reordering_make_no_changes(zgs):
+    zgs.update(("A:1", 1, [member(1), member(2)]), ("B:1", 3, [member(3)]))
+    zgs.changes.get_nowait()
+    zgs.update(("B:1", 3, [member(3)]), ("A:1", 1, [member(2), member(1)]))
+    assert zgs.changes.empty()
+
+
+def test_groups_are_updated_in_place(zgs):
+    zgs.update(("A:1", 1, [member(1), member(2)]), ("B:1", 3, [member(3)]))
+    zgs.changes.get_nowait()
+    group_a = [g for g in zgs.groups if g.uid == "A:1"][0]
+
+    # Zone 2 leaves group A, and zone 3's group is replaced by a new one
+    zgs.update(("A:1", 1, [member(1)]), ("C:1", 3, [member(3), member(2)]))
+    changes = zgs.changes.get_nowait()
+    group_c = [g for g in zgs.groups if g.uid == "C:1"][0]
+    assert set(changes) == {
+        ZoneGroupStateChange(
+            MEMBERS_CHANGED,
+            "A:1",
+            frozenset([zone(1), zone(2)]),
+            frozenset([zone(1)]),
+        ),
+        ZoneGroupStateChange(GROUP_ADDED, "C:1", None, group_c),
+        ZoneGroupStateChange(GROUP_REMOVED, "B:1", changes[0].old, None),
+        ZoneGroupStateChange(ZONE_MOVED, "RINCON_2", "A:1", "C:1"),
+        ZoneGroupStateChange(ZONE_MOVED, "RINCON_3", "B:1", "C:1"),
+    }
+    assert group_a in zgs.groups
+    assert group_a.members == {zone(1)}
+    assert len(zgs.groups) == 2
+
+
+def test_coordinator_visibility_and_satellite_changes(zgs):
+    zgs.update(("A:1", 1, [member(1, satellites=[3]), member(2)]))
+    zgs.changes.get_nowait()
+    zgs.update(("A:1", 2, [member(1), member(2, invisible=True), member(3)]))
+    changes = zgs.changes.get_nowait()
+    assert set(changes) == {
+        ZoneGroupStateChange(COORDINATOR_CHANGED, "A:1", zone(1), zone(2)),
+        ZoneGroupStateChange(VISIBILITY_CHANGED, "RINCON_2", True, False),
+        ZoneGroupStateChange(VISIBILITY_CHANGED, "RINCON_3", False, True),
+        ZoneGroupStateChange(SATELLITE_CHANGED, "RINCON_3", zone(1), None),
+    }
+    assert zgs.visible_zones == {zone(1), zone(3)}
+    # pylint: disable=protected-access
+    assert zone(2)._is_coordinator and not zone(1)._is_coordinator
+
+
+def test_zone_removed(zgs):
+    zgs.update(("A:1", 1, [member(1)]), ("B:1", 2, [member(2)]))
+    zgs.changes.get_nowait()
+    zgs.update(("A:1", 1, [member(1)]))
+    changes = zgs.changes.get_nowait()
+    assert changes[-1] == ZoneGroupStateChange(ZONE_REMOVED, "RINCON_2", zone(2), None)
+    assert zgs.all_zones == zgs.visible_zones == {zone(1)}
+
+
+def test_listener_errors_are_contained(zgs):
+    calls = []
+
+    def broken(changes):
+        raise ValueError("broken")
+
+    zgs.add_listener(broken)
+    zgs.add_listener(calls.append)
+    zgs.update(("A:1", 1, [member(1)]))
+    assert len(calls) == 1
+    zgs.remove_listener(calls.append)
+    zgs.remove_listener(broken)
+    zgs.update(("A:1", 1, [member(1), member(2)]))
+    assert len(calls) == 1
+
+
+def test_duplicates_skip_normalization():
+    with open(os.path.join(DATA_PATH, "large_household.xml"), encoding="utf-8") as f:
+        payload = f.read()
+    # The same state, formatted differently
+    variant = payload.replace("<ZoneGroups>", "<ZoneGroups>\n", 1)
+    zgs = ZoneGroupState()
+    with mock.patch(
+        "soco.zonegroupstate.normalize_zgs_xml", side_effect=normalize_zgs_xml
+    ) as normalize:
+        zgs.process_payload(payload, "event", "10.0.0.1")
+        assert len(zgs.all_zones) == 33
+        for _ in range(3):
+            zgs.process_payload(payload, "event", "10.0.0.2")
+            zgs.process_payload(variant.encode("utf-8"), "event", "10.0.0.3")
+        # The variant is normalized once, to find that it is a duplicate
+        assert normalize.call_count == 2
+        assert zgs.processed_count == 1
+        assert zgs.total_requests == 7
+
+        # Clearing the groups forces the next payload to be processed
+        zgs.clear_zone_groups()
+        zgs.process_payload(payload, "event", "10.0.0.1")
+        assert zgs.processed_count == 2
+        assert len(zgs.all_zones) == 33